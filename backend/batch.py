@@ -0,0 +1,231 @@
+"""
+Batch ingestion and runs: many cases per request (a zip archive or a multipart file list),
+run on a bounded worker pool as a background job (job_queue kind "batch") that clients
+poll or stream.
+
+Files are grouped into cases by patient key: the top-level folder in an archive
+(patient01/lesion.jpg + patient01/wearables.csv), otherwise the file stem
+(patient01.jpg + patient01.csv). Each case needs one image; the CSV is optional.
+
+Env:
+  BATCH_MAX_CASES    cases per batch (default 500)
+  BATCH_MAX_MB       total uncompressed upload size (default 512)
+  BATCH_CONCURRENCY  cases run concurrently per batch (default 8; LLM calls stay capped by LLM_MAX_CONCURRENCY)
+  BATCH_JOBS_KEPT    finished batches kept in memory for streaming (default 100; the job store keeps results)
+  BATCH_JOBS_MAX_AGE_S  drop any in-memory batch older than this, whatever its status (default 21600)
+"""
+import asyncio
+import io
+import os
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from pathlib import PurePosixPath
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+BATCH_MAX_CASES = int(os.environ.get("BATCH_MAX_CASES", "500"))
+BATCH_MAX_BYTES = int(os.environ.get("BATCH_MAX_MB", "512")) * 1024 * 1024
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+BATCH_JOBS_KEPT = int(os.environ.get("BATCH_JOBS_KEPT", "100"))
+BATCH_JOBS_MAX_AGE_S = float(os.environ.get("BATCH_JOBS_MAX_AGE_S", "21600"))
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+CSV_SUFFIXES = {".csv"}
+
+
+def _patient_key(name: str, in_archive: bool) -> tuple[str, str] | None:
+    """(key, suffix) for a file name, or None for files that are not part of a case."""
+    path = PurePosixPath(name.replace("\\", "/"))
+    if any(p.startswith((".", "__MACOSX")) for p in path.parts):
+        return None
+    suffix = path.suffix.lower()
+    if suffix not in IMAGE_SUFFIXES | CSV_SUFFIXES:
+        return None
+    key = path.parts[0] if in_archive and len(path.parts) > 1 else path.stem
+    return key, suffix
+
+
+def group_files(files: list[tuple[str, bytes]], in_archive: bool = False) -> tuple[dict[str, dict], list[dict]]:
+    """
+    Group (name, data) files into {key: {"image": (name, data), "wearables": (name, data) | None}}.
+    Returns (items, errors); keys with no image or with several images / CSVs are reported as errors.
+    """
+    grouped: dict[str, dict[str, list]] = {}
+    for name, data in files:
+        parsed = _patient_key(name, in_archive)
+        if parsed is None:
+            continue
+        key, suffix = parsed
+        slot = "image" if suffix in IMAGE_SUFFIXES else "wearables"
+        grouped.setdefault(key, {"image": [], "wearables": []})[slot].append((name, data))
+
+    items, errors = {}, []
+    for key, found in sorted(grouped.items()):
+        if len(found["image"]) != 1:
+            errors.append({"key": key, "error": f"Expected one image, found {len(found['image'])}"})
+        elif len(found["wearables"]) > 1:
+            errors.append({"key": key, "error": f"Expected at most one CSV, found {len(found['wearables'])}"})
+        else:
+            items[key] = {"image": found["image"][0], "wearables": (found["wearables"] or [None])[0]}
+    if len(items) > BATCH_MAX_CASES:
+        raise ValueError(f"Batch has {len(items)} cases; the limit is {BATCH_MAX_CASES}")
+    return items, errors
+
+
+def read_archive(data: bytes) -> list[tuple[str, bytes]]:
+    """Files in a zip archive. Raises ValueError for invalid or oversized archives."""
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise ValueError("archive must be a zip file")
+    with archive:
+        members = [m for m in archive.infolist() if not m.is_dir()]
+        # Declared sizes are checked up front so a zip bomb is rejected before extraction
+        if sum(m.file_size for m in members) > BATCH_MAX_BYTES:
+            raise ValueError(f"Archive expands to more than {BATCH_MAX_BYTES // (1024 * 1024)} MB")
+        return [(m.filename, archive.read(m)) for m in members if _patient_key(m.filename, True)]
+
+
+class BatchJob:
+    """
+    A batch run: per-case results in completion order, and an event that is set
+    (and replaced) on every update so streaming readers can wait for changes.
+    """
+
+    def __init__(
+        self,
+        case_ids: dict[str, str],
+        params: dict[str, Any],
+        errors: list[dict] | None = None,
+        job_id: str | None = None,
+    ):
+        self.id = job_id or str(uuid.uuid4())
+        self.case_ids = case_ids
+        self.params = params
+        self.ingest_errors = errors or []
+        self.status = "queued"
+        self.created_at = time.time()
+        self.finished_at: float | None = None
+        self.results: list[dict[str, Any]] = []
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def add_result(self, item: dict[str, Any]) -> None:
+        self.results.append(item)
+        self._notify()
+
+    def finish(self, status: str = "done") -> None:
+        self.status = status
+        self.finished_at = time.time()
+        self._notify()
+
+    def snapshot(self) -> dict[str, Any]:
+        failed = sum(1 for r in self.results if r["status"] == "error")
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "total": len(self.case_ids),
+            "completed": len(self.results) - failed,
+            "failed": failed,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "ingest_errors": self.ingest_errors,
+            "results": self.results,
+        }
+
+    async def follow(self) -> AsyncIterator[tuple[str, Any]]:
+        """Yield ("case", result) for every result (past and future), then ("done", snapshot)."""
+        sent = 0
+        while True:
+            changed = self._changed
+            while sent < len(self.results):
+                yield "case", self.results[sent]
+                sent += 1
+            if self.status in ("done", "cancelled"):
+                yield "done", {k: v for k, v in self.snapshot().items() if k != "results"}
+                return
+            await changed.wait()
+
+
+def result_summary(key: str, case_id: str, result: dict[str, Any]) -> dict[str, Any]:
+    """Per-case job entry; the full result is saved on the case."""
+    return {
+        "key": key,
+        "case_id": case_id,
+        "status": "done",
+        "p_health": result.get("p_health"),
+        "p_vision": result.get("p_vision"),
+        "p_fused": result.get("p_fused"),
+        "abstain": result.get("abstain"),
+        "guardrail_reason": result.get("guardrail_reason"),
+        "next_steps": result.get("next_steps", []),
+        "fallbacks": result.get("fallbacks", {}),
+        "prescreen": result.get("prescreen"),
+    }
+
+
+async def run_batch(
+    job: BatchJob,
+    run_case: Callable[[str], Awaitable[dict[str, Any]]],
+    concurrency: int = BATCH_CONCURRENCY,
+    on_progress: Callable[[int, int], None] | None = None,
+) -> None:
+    """
+    Run every case of the job with at most `concurrency` pipelines in flight.
+    Vision calls from all in-flight cases overlap under the shared LLM concurrency cap.
+    A failing case is recorded and does not stop the batch. on_progress(done, total) after each case.
+    """
+    job.status = "running"
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(key: str, case_id: str) -> None:
+        async with semaphore:
+            try:
+                result = await run_case(case_id)
+                job.add_result(result_summary(key, case_id, result))
+            except Exception as e:
+                job.add_result({"key": key, "case_id": case_id, "status": "error", "error": str(e)})
+            if on_progress is not None:
+                on_progress(len(job.results), len(job.case_ids))
+
+    try:
+        await asyncio.gather(*(one(key, case_id) for key, case_id in job.case_ids.items()))
+    except asyncio.CancelledError:
+        job.finish("cancelled")
+        raise
+    job.finish()
+
+
+class BatchJobs:
+    """
+    Live batches of this process, for streaming; keeps the most recent BATCH_JOBS_KEPT finished
+    batches, and drops any batch older than BATCH_JOBS_MAX_AGE_S whatever its status (a batch
+    submitted here but run by another worker stays "queued" in this process forever).
+    Status and results are also persisted by the job queue, which readers fall back to.
+    """
+
+    def __init__(self, max_finished: int = BATCH_JOBS_KEPT, max_age_s: float = BATCH_JOBS_MAX_AGE_S):
+        self.max_finished = max_finished
+        self.max_age_s = max_age_s
+        self._jobs: OrderedDict[str, BatchJob] = OrderedDict()
+
+    def get(self, job_id: str) -> BatchJob | None:
+        return self._jobs.get(job_id)
+
+    def add(self, job: BatchJob) -> None:
+        self._jobs[job.id] = job
+        self._evict()
+
+    def _evict(self) -> None:
+        cutoff = time.time() - self.max_age_s
+        # Insertion order is creation order, so expired batches are at the front
+        while self._jobs and next(iter(self._jobs.values())).created_at < cutoff:
+            self._jobs.popitem(last=False)
+        finished = [j for j in self._jobs.values() if j.status in ("done", "cancelled")]
+        for job in finished[: max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job.id]
@@ -1,54 +1,106 @@
 """
 HAM10000 benchmark: evaluate pipeline on held-out images.
 Reports accuracy, AUC, sensitivity, specificity for binary melanoma vs non-melanoma.
+Also calibrates the local pre-screen (calibrate_prescreen / --calibrate-prescreen).
 """
-import base64
+import asyncio
+import json
 import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
+import numpy as np
+
+from backend import metrics
 from backend.data_loader import load_ham_index
-from backend.pipeline import run_vision_model
+from backend.ham_index import HamIndex
+from backend.lesion_features import lesion_features
+from backend.pipeline import CaseImage, run_vision_model
+from backend.prescreen import DEFAULT_CALIBRATION_PATH, FEATURES, MIN_BAND_SAMPLES, choose_bands, fit_logistic
+
+
+# Max points returned per curve (evenly thinned, endpoints kept)
+MAX_CURVE_POINTS = 201
+
+
+def _level_counts(y_true: np.ndarray, y_prob: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Distinct scores in descending order plus positive / negative counts at each score.
+    Every threshold metric below is a cumulative sum over these levels.
+    """
+    levels, inverse = np.unique(-y_prob, return_inverse=True)
+    pos = np.bincount(inverse, weights=y_true, minlength=len(levels))
+    neg = np.bincount(inverse, weights=1 - y_true, minlength=len(levels))
+    return -levels, pos, neg
 
 
-def compute_metrics(y_true: list[int], y_prob: list[float], threshold: float = 0.5) -> dict[str, float]:
+def _auc_from_counts(pos: np.ndarray, neg: np.ndarray, undefined: float = 0.5) -> np.ndarray:
+    """
+    Tie-aware Mann-Whitney AUC from per-level counts (levels in descending score order).
+    Works on a single row or a (n_boot, n_levels) matrix; rows lacking a class get `undefined`.
+    """
+    n_pos = pos.sum(axis=-1)
+    n_neg = neg.sum(axis=-1)
+    # Negatives strictly below each level = total negatives - cumulative negatives up to and including it
+    neg_below = n_neg[..., None] - np.cumsum(neg, axis=-1)
+    concordant = np.sum(pos * (neg_below + 0.5 * neg), axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        auc = concordant / (n_pos * n_neg)
+    return np.where((n_pos > 0) & (n_neg > 0), auc, undefined)
+
+
+def _thin(*arrays: np.ndarray) -> list[list[float]]:
+    n = len(arrays[0])
+    if n > MAX_CURVE_POINTS:
+        keep = np.unique(np.linspace(0, n - 1, MAX_CURVE_POINTS).round().astype(int))
+        arrays = tuple(a[keep] for a in arrays)
+    return [np.round(a, 4).tolist() for a in arrays]
+
+
+def _confusion(y_true: np.ndarray, y_pred: np.ndarray) -> tuple[int, int, int, int]:
+    tp = int(np.sum((y_true == 1) & (y_pred == 1)))
+    tn = int(np.sum((y_true == 0) & (y_pred == 0)))
+    fp = int(np.sum((y_true == 0) & (y_pred == 1)))
+    fn = int(np.sum((y_true == 1) & (y_pred == 0)))
+    return tp, tn, fp, fn
+
+
+def compute_metrics(
+    y_true: list[int],
+    y_prob: list[float],
+    threshold: float = 0.5,
+    n_bootstrap: int = 200,
+    seed: int | None = 0,
+) -> dict[str, Any]:
     """
     Compute accuracy, sensitivity, specificity, AUC for binary classification.
     y_true: 0 or 1 (1 = melanoma)
     y_prob: predicted probability of melanoma
+    AUC is the rank-based (tie-aware) Mann-Whitney statistic, O(n log n).
+    Also returns ROC / PR curves, best-F1 and Youden thresholds, and percentile
+    bootstrap 95% CIs (n_bootstrap resamples, vectorized over per-level counts).
     """
     n = len(y_true)
     if n == 0:
         return {"accuracy": 0, "sensitivity": 0, "specificity": 0, "auc": 0}
 
-    y_pred = [1 if p >= threshold else 0 for p in y_prob]
-    tp = sum(1 for i in range(n) if y_true[i] == 1 and y_pred[i] == 1)
-    tn = sum(1 for i in range(n) if y_true[i] == 0 and y_pred[i] == 0)
-    fp = sum(1 for i in range(n) if y_true[i] == 0 and y_pred[i] == 1)
-    fn = sum(1 for i in range(n) if y_true[i] == 1 and y_pred[i] == 0)
+    yt = np.asarray(y_true, dtype="float64")
+    yp = np.asarray(y_prob, dtype="float64")
+    y_pred = (yp >= threshold).astype("float64")
+    tp, tn, fp, fn = _confusion(yt, y_pred)
+    n_pos = tp + fn
+    n_neg = tn + fp
 
     accuracy = (tp + tn) / n if n else 0
     sensitivity = tp / (tp + fn) if (tp + fn) > 0 else 0
     specificity = tn / (tn + fp) if (tn + fp) > 0 else 0
 
-    # AUC: count concordant pairs (Mann-Whitney U statistic)
-    pos_indices = [i for i in range(n) if y_true[i] == 1]
-    neg_indices = [i for i in range(n) if y_true[i] == 0]
-    n_pos = len(pos_indices)
-    n_neg = len(neg_indices)
-    if n_pos == 0 or n_neg == 0:
-        auc = 0.5  # undefined, use chance
-    else:
-        concordant = 0
-        for i in pos_indices:
-            for j in neg_indices:
-                if y_prob[i] > y_prob[j]:
-                    concordant += 1
-                elif y_prob[i] == y_prob[j]:
-                    concordant += 0.5
-        auc = concordant / (n_pos * n_neg)
+    levels, pos, neg = _level_counts(yt, yp)
+    auc = float(_auc_from_counts(pos, neg))
 
-    return {
+    report: dict[str, Any] = {
         "accuracy": round(accuracy, 4),
         "sensitivity": round(sensitivity, 4),
         "specificity": round(specificity, 4),
@@ -60,89 +112,450 @@ def compute_metrics(y_true: list[int], y_prob: list[float], threshold: float = 0
         "tn": tn,
         "fp": fp,
         "fn": fn,
+        "threshold": threshold,
     }
+    if n_pos == 0 or n_neg == 0:
+        return report
+
+    # Threshold sweep: predicting positive for score >= levels[k]
+    tps = np.cumsum(pos)
+    fps = np.cumsum(neg)
+    tpr = tps / n_pos
+    fpr = fps / n_neg
+    precision = tps / (tps + fps)
+    f1 = np.where(tps > 0, 2 * tps / (2 * tps + fps + (n_pos - tps)), 0.0)
+    youden = tpr - fpr
+    best_f1 = int(np.argmax(f1))
+    best_j = int(np.argmax(youden))
+    # Average precision: precision weighted by recall increments
+    average_precision = float(np.sum(np.diff(np.concatenate([[0.0], tpr])) * precision))
+
+    roc_fpr, roc_tpr, roc_thr = _thin(np.concatenate([[0.0], fpr]), np.concatenate([[0.0], tpr]), np.concatenate([[1.0], levels]))
+    pr_recall, pr_precision, pr_thr = _thin(tpr, precision, levels)
+    report.update({
+        "average_precision": round(average_precision, 4),
+        "roc_curve": {"fpr": roc_fpr, "tpr": roc_tpr, "thresholds": roc_thr},
+        "pr_curve": {"recall": pr_recall, "precision": pr_precision, "thresholds": pr_thr},
+        "best_f1": {
+            "threshold": round(float(levels[best_f1]), 4),
+            "f1": round(float(f1[best_f1]), 4),
+            "precision": round(float(precision[best_f1]), 4),
+            "recall": round(float(tpr[best_f1]), 4),
+        },
+        "youden": {
+            "threshold": round(float(levels[best_j]), 4),
+            "j": round(float(youden[best_j]), 4),
+            "sensitivity": round(float(tpr[best_j]), 4),
+            "specificity": round(float(1 - fpr[best_j]), 4),
+        },
+    })
+
+    if n_bootstrap > 0:
+        rng = np.random.default_rng(seed)
+        idx = rng.integers(0, n, size=(n_bootstrap, n))
+        # Map each sample to its score level once, then count per (resample, level)
+        level_of = np.searchsorted(-levels, -yp)
+        flat = (np.arange(n_bootstrap)[:, None] * len(levels) + level_of[idx]).ravel()
+        bt = yt[idx].ravel()
+        size = n_bootstrap * len(levels)
+        b_pos = np.bincount(flat, weights=bt, minlength=size).reshape(n_bootstrap, -1)
+        b_neg = np.bincount(flat, weights=1 - bt, minlength=size).reshape(n_bootstrap, -1)
+        b_auc = _auc_from_counts(b_pos, b_neg, undefined=np.nan)
+
+        b_true = yt[idx]
+        b_hit = y_pred[idx] == b_true
+        b_npos = b_true.sum(axis=1)
+        b_nneg = n - b_npos
+        with np.errstate(invalid="ignore", divide="ignore"):
+            b_acc = b_hit.mean(axis=1)
+            b_sens = (b_hit & (b_true == 1)).sum(axis=1) / b_npos
+            b_spec = (b_hit & (b_true == 0)).sum(axis=1) / b_nneg
+
+        def ci(values: np.ndarray) -> list[float] | None:
+            values = values[np.isfinite(values)]
+            if len(values) == 0:
+                return None
+            lo, hi = np.percentile(values, [2.5, 97.5])
+            return [round(float(lo), 4), round(float(hi), 4)]
+
+        report["ci95"] = {
+            "auc": ci(b_auc),
+            "accuracy": ci(b_acc),
+            "sensitivity": ci(b_sens),
+            "specificity": ci(b_spec),
+            "n_bootstrap": n_bootstrap,
+        }
+
+    return report
 
 
 def run_ham_benchmark(
     n_sample: int = 30,
     lambda_: float = 0.0,
     seed: int | None = 42,
+    index: HamIndex | None = None,
+    concurrency: int = 4,
+    max_rps: float | None = None,
+    stratified: bool = True,
+    on_progress: Callable[[int, int], None] | None = None,
 ) -> dict[str, Any]:
-    """
-    Run vision pipeline on a random sample of HAM10000 images.
-    lambda_=0 means vision-only (no wearables). Uses p_vision for prediction.
-    """
-    ham_index, error = load_ham_index()
-    if error:
-        return {"error": error, "metrics": None, "samples": []}
+    """Synchronous wrapper around run_ham_benchmark_async (for scripts; no running event loop)."""
+    return asyncio.run(run_ham_benchmark_async(
+        n_sample=n_sample,
+        lambda_=lambda_,
+        seed=seed,
+        index=index,
+        concurrency=concurrency,
+        max_rps=max_rps,
+        stratified=stratified,
+        on_progress=on_progress,
+    ))
+
+
+class _RatePacer:
+    """Spaces call starts at least 1/max_rps seconds apart (no-op when max_rps is None)."""
+
+    def __init__(self, max_rps: float | None):
+        self.interval = 1.0 / max_rps if max_rps else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def _select_entries(index: HamIndex, n_sample: int, seed: int | None, stratified: bool) -> list[dict] | str:
+    """Pick benchmark rows, or return an error message."""
+    rng = random.Random(seed)
+    if not stratified:
+        rows = index.candidates()
+        if n_sample <= 0 or n_sample >= len(rows):
+            sample_entries = list(rows)
+            rng.shuffle(sample_entries)
+            return sample_entries
+        return rng.sample(rows, n_sample)
 
     # Stratified sample: half mel, half non-mel
-    mel_entries = [e for e in ham_index if e.get("binary_label_mel") == 1]
-    non_mel_entries = [e for e in ham_index if e.get("binary_label_mel") == 0]
+    mel_entries = index.candidates(binary_label=1)
+    non_mel_entries = index.candidates(binary_label=0)
 
     if not mel_entries or not non_mel_entries:
-        return {"error": "Insufficient mel/non-mel samples in index", "metrics": None, "samples": []}
+        return "Insufficient mel/non-mel samples in index"
 
-    rng = random.Random(seed)
     n_each = min(n_sample // 2, len(mel_entries), len(non_mel_entries))
     sample_entries = rng.sample(mel_entries, n_each) + rng.sample(non_mel_entries, n_each)
     rng.shuffle(sample_entries)
+    return sample_entries
 
-    y_true: list[int] = []
-    y_prob: list[float] = []
-    samples: list[dict] = []
-
-    for entry in sample_entries:
-        filepath = Path(entry.get("filepath", ""))
-        if not filepath.exists():
-            continue
 
+def _load_image(entry: dict) -> CaseImage | None:
+    """Read and hash an indexed image; None (recorded as an error) if the file is missing or unreadable."""
+    filepath = Path(entry.get("filepath", ""))
+    try:
         with open(filepath, "rb") as f:
-            image_bytes = f.read()
-        image_base64 = base64.b64encode(image_bytes).decode("utf-8")
+            return CaseImage(f.read())
+    except OSError as e:
+        metrics.error("benchmark_image", e)
+        return None
+
+
+async def _evaluate_entry(entry: dict, image: CaseImage, lambda_: float) -> dict[str, Any]:
+    patient_context = {
+        "age": entry.get("age"),
+        "sex": entry.get("sex"),
+        "localization": entry.get("localization"),
+    }
 
-        patient_context = {
-            "age": entry.get("age"),
-            "sex": entry.get("sex"),
-            "localization": entry.get("localization"),
+    try:
+        vision_result = await run_vision_model(image, patient_context)
+    except Exception as e:
+        return {
+            "image_id": entry.get("image_id"),
+            "dx": entry.get("dx"),
+            "ground_truth": entry.get("binary_label_mel"),
+            "p_vision": None,
+            "error": str(e),
         }
 
-        try:
-            vision_result = run_vision_model(image_base64, patient_context)
-        except Exception as e:
-            samples.append({
-                "image_id": entry.get("image_id"),
-                "dx": entry.get("dx"),
-                "ground_truth": entry.get("binary_label_mel"),
-                "p_vision": None,
-                "error": str(e),
-            })
-            continue
-
-        p_vision = vision_result.get("p_vision", 0.5)
-        # With lambda_=0, p_fused = p_vision; with wearables missing, p_health=0.5 so p_fused = lambda_*0.5 + (1-lambda_)*p_vision
-        p_fused = lambda_ * 0.5 + (1 - lambda_) * p_vision
-
-        gt = entry.get("binary_label_mel", 0)
-        y_true.append(gt)
-        y_prob.append(p_fused)
-
-        samples.append({
+    fallback = vision_result.get("fallback")
+    if fallback:
+        # Mock scores must not be scored as model output; report the sample as failed instead
+        return {
             "image_id": entry.get("image_id"),
             "dx": entry.get("dx"),
-            "ground_truth": gt,
-            "p_vision": round(p_vision, 4),
-            "p_fused": round(p_fused, 4),
-            "predicted": 1 if p_fused >= 0.5 else 0,
-            "correct": (1 if p_fused >= 0.5 else 0) == gt,
-        })
+            "ground_truth": entry.get("binary_label_mel"),
+            "p_vision": None,
+            "fallback": fallback["reason"],
+            "error": f"Vision fallback ({fallback['reason']})" + (f": {fallback['error']}" if fallback.get("error") else ""),
+        }
+
+    p_vision = vision_result.get("p_vision", 0.5)
+    # With lambda_=0, p_fused = p_vision; with wearables missing, p_health=0.5 so p_fused = lambda_*0.5 + (1-lambda_)*p_vision
+    p_fused = lambda_ * 0.5 + (1 - lambda_) * p_vision
+
+    gt = entry.get("binary_label_mel", 0)
+    sample = {
+        "image_id": entry.get("image_id"),
+        "dx": entry.get("dx"),
+        "ground_truth": gt,
+        "p_vision": round(p_vision, 4),
+        "p_fused": round(p_fused, 4),
+        "predicted": 1 if p_fused >= 0.5 else 0,
+        "correct": (1 if p_fused >= 0.5 else 0) == gt,
+    }
+    if vision_result.get("prescreen"):
+        # Resolved by the local pre-screen (no model call); scored like any other sample
+        sample["prescreen"] = vision_result["prescreen"]["decision"]
+    return sample
+
+
+async def run_ham_benchmark_async(
+    n_sample: int = 30,
+    lambda_: float = 0.0,
+    seed: int | None = 42,
+    index: HamIndex | None = None,
+    concurrency: int = 4,
+    max_rps: float | None = None,
+    stratified: bool = True,
+    on_progress: Callable[[int, int], None] | None = None,
+) -> dict[str, Any]:
+    """
+    Run vision pipeline on a random sample of HAM10000 images.
+    lambda_=0 means vision-only (no wearables). Uses p_vision for prediction.
+    index: prebuilt HamIndex (e.g. the server's); loaded from disk if omitted.
+    concurrency: vision calls in flight; max_rps: optional cap on call starts per second.
+    stratified: half mel / half non-mel; otherwise a uniform sample (n_sample <= 0 = whole index).
+    Images are read and hashed by a prefetcher that stays up to 2 * concurrency ahead of the workers.
+    on_progress(done, total) is called after each image.
+    """
+    if index is None:
+        entries, error = load_ham_index()
+        if error:
+            return {"error": error, "metrics": None, "samples": []}
+        index = HamIndex(entries)
+
+    sample_entries = _select_entries(index, n_sample, seed, stratified)
+    if isinstance(sample_entries, str):
+        return {"error": sample_entries, "metrics": None, "samples": []}
+
+    concurrency = max(1, concurrency)
+    total = len(sample_entries)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2 * concurrency)
+    results: list[dict | None] = [None] * total
+    pacer = _RatePacer(max_rps)
+    done = 0
+    started = time.perf_counter()
+
+    async def prefetch():
+        for i, entry in enumerate(sample_entries):
+            image = await asyncio.to_thread(_load_image, entry)
+            await queue.put((i, entry, image))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def worker():
+        nonlocal done
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            i, entry, image = item
+            if image is not None:
+                await pacer.wait()
+                results[i] = await _evaluate_entry(entry, image, lambda_)
+            else:
+                results[i] = {
+                    "image_id": entry.get("image_id"),
+                    "dx": entry.get("dx"),
+                    "ground_truth": entry.get("binary_label_mel"),
+                    "p_vision": None,
+                    "skipped": True,
+                    "error": "Image file missing or unreadable",
+                }
+            done += 1
+            if on_progress:
+                on_progress(done, total)
+
+    await asyncio.gather(prefetch(), *(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    samples = [r for r in results if r is not None]
+    scored = [r for r in samples if r.get("p_vision") is not None]
+    y_true = [r["ground_truth"] for r in scored]
+    y_prob = [r["p_fused"] for r in scored]
 
-    metrics = compute_metrics(y_true, y_prob) if y_true else None
+    summary = compute_metrics(y_true, y_prob) if y_true else None
 
     return {
         "error": None,
-        "metrics": metrics,
+        "metrics": summary,
         "samples": samples,
         "n_requested": n_sample,
         "n_evaluated": len(y_true),
+        # Samples whose vision call fell back to a mock score (excluded from metrics)
+        "n_fallback": sum(1 for r in samples if r.get("fallback")),
+        # Samples whose image could not be read (not evaluated; excluded from metrics)
+        "n_skipped": sum(1 for r in samples if r.get("skipped")),
+        # Samples resolved by the local pre-screen without a vision call
+        "n_prescreened": sum(1 for r in samples if r.get("prescreen")),
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "images_per_s": round(total / elapsed, 3) if elapsed > 0 else None,
     }
+
+
+def _entry_features(entry: dict) -> dict[str, float] | None:
+    image = _load_image(entry)
+    if image is None:
+        return None
+    try:
+        return lesion_features(image.pil())
+    except Exception:
+        return None
+
+
+def calibrate_prescreen(
+    n_sample: int = 0,
+    seed: int | None = 42,
+    max_missed: float = 0.02,
+    min_ppv: float = 0.8,
+    index: HamIndex | None = None,
+    workers: int = 8,
+    output: Path | None = DEFAULT_CALIBRATION_PATH,
+    on_progress: Callable[[int, int], None] | None = None,
+) -> dict[str, Any]:
+    """
+    Fit the local pre-screen on HAM images and choose its confidence bands.
+    Uses a uniform sample (n_sample <= 0: whole index) so band precision reflects the
+    dataset's prevalence. Weights are fitted on one half; bands are chosen and reported on
+    the other (max_missed: share of melanomas allowed in the benign band; min_ppv: precision
+    required in the suspicious band). Writes the calibration JSON to output unless None.
+    """
+    if index is None:
+        entries, error = load_ham_index()
+        if error:
+            return {"error": error}
+        index = HamIndex(entries)
+    sample_entries = _select_entries(index, n_sample, seed, stratified=False)
+
+    features: list[dict[str, float] | None] = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for f in pool.map(_entry_features, sample_entries):
+            features.append(f)
+            if on_progress:
+                on_progress(len(features), len(sample_entries))
+
+    rows = [(e, f) for e, f in zip(sample_entries, features) if f is not None]
+    if len(rows) < 4 * MIN_BAND_SAMPLES:
+        return {"error": f"Only {len(rows)} readable images; need at least {4 * MIN_BAND_SAMPLES}"}
+    x = np.array([[f[k] for k in FEATURES] for _, f in rows])
+    y = np.array([float(e.get("binary_label_mel", 0)) for e, _ in rows])
+
+    order = np.random.default_rng(seed).permutation(len(rows))
+    train, val = order[: len(rows) // 2], order[len(rows) // 2:]
+    if len(np.unique(y[train])) < 2 or len(np.unique(y[val])) < 2:
+        return {"error": "Calibration sample needs melanoma and non-melanoma images in both halves"}
+
+    intercept, weights = fit_logistic(x[train], y[train])
+    p_val = 1 / (1 + np.exp(-(intercept + x[val] @ weights)))
+    y_val = y[val]
+    low, high = choose_bands(y_val, p_val, max_missed, min_ppv)
+
+    benign = p_val <= low if low is not None else np.zeros(len(val), dtype=bool)
+    suspicious = p_val >= high if high is not None else np.zeros(len(val), dtype=bool)
+    calibration = {
+        "intercept": round(intercept, 6),
+        "weights": {k: round(float(w), 6) for k, w in zip(FEATURES, weights)},
+        "low": None if low is None else round(low, 6),
+        "high": None if high is None else round(high, 6),
+        "max_missed": max_missed,
+        "min_ppv": min_ppv,
+        "n_train": len(train),
+        "n_validation": len(val),
+        "validation": {
+            "auc": round(float(_auc_from_counts(*_level_counts(y_val, p_val)[1:])), 4),
+            # Share of cases resolved without a vision call
+            "resolved": round(float((benign | suspicious).mean()), 4),
+            "benign": int(benign.sum()),
+            "suspicious": int(suspicious.sum()),
+            "melanomas_in_benign_band": int(y_val[benign].sum()),
+            "suspicious_ppv": round(float(y_val[suspicious].mean()), 4) if suspicious.any() else None,
+        },
+        "created_at": time.time(),
+    }
+    if output is not None:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(calibration, indent=2))
+    return {"error": None, **calibration}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the HAM10000 vision benchmark.")
+    parser.add_argument("--n-sample", type=int, default=None, help="images to evaluate, default 30 (<= 0 with --all-classes: whole index)")
+    parser.add_argument("--lambda", dest="lambda_", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-rps", type=float, default=None)
+    parser.add_argument("--all-classes", action="store_true", help="uniform sample instead of mel/non-mel stratified")
+    parser.add_argument(
+        "--calibrate-prescreen", action="store_true",
+        help="fit the local pre-screen and write its calibration (default sample: whole index)",
+    )
+    parser.add_argument("--max-missed", type=float, default=0.02, help="pre-screen: melanoma share allowed in the benign band")
+    parser.add_argument("--min-ppv", type=float, default=0.8, help="pre-screen: precision required in the suspicious band")
+    parser.add_argument("--output", type=Path, default=DEFAULT_CALIBRATION_PATH, help="pre-screen calibration file")
+    args = parser.parse_args()
+
+    def progress(done: int, total: int) -> None:
+        print(f"\r{done}/{total}", end="", flush=True)
+
+    if args.calibrate_prescreen:
+        result = calibrate_prescreen(
+            n_sample=args.n_sample if args.n_sample is not None else 0,
+            seed=args.seed,
+            max_missed=args.max_missed,
+            min_ppv=args.min_ppv,
+            workers=args.concurrency,
+            output=args.output,
+            on_progress=progress,
+        )
+        print()
+        if result["error"]:
+            print(f"Error: {result['error']}")
+            return
+        print(f"Bands: benign <= {result['low']}, suspicious >= {result['high']}; wrote {args.output}")
+        print(result["validation"])
+        return
+
+    result = run_ham_benchmark(
+        n_sample=args.n_sample if args.n_sample is not None else 30,
+        lambda_=args.lambda_,
+        seed=args.seed,
+        concurrency=args.concurrency,
+        max_rps=args.max_rps,
+        stratified=not args.all_classes,
+        on_progress=progress,
+    )
+    print()
+    if result["error"]:
+        print(f"Error: {result['error']}")
+        return
+    print(f"Evaluated {result['n_evaluated']} images in {result['elapsed_s']}s ({result['images_per_s']}/s)")
+    if result["n_fallback"]:
+        print(f"Warning: {result['n_fallback']} images fell back to mock vision scores and were excluded")
+    if result["n_prescreened"]:
+        print(f"{result['n_prescreened']} images were resolved by the local pre-screen")
+    print(result["metrics"])
+
+
+if __name__ == "__main__":
+    main()
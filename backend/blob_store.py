@@ -0,0 +1,150 @@
+"""
+Content-addressed blob store for case images (raw bytes, keyed by sha256 hex).
+Identical uploads / dataset images are stored once and shared across cases.
+Blobs live as long as a case references them: the case store deletes a blob once
+the last case using it is deleted or expires (see case_store.py).
+
+Env:
+  BLOB_STORE         memory | file (default: file when CASE_STORE=sqlite, else memory)
+  BLOB_STORE_PATH    directory for the file store (default backend/data/blobs)
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+DEFAULT_BLOB_DIR = Path(__file__).resolve().parent / "data" / "blobs"
+
+
+def blob_ref(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore(ABC):
+    """put returns the content hash; get returns bytes or None."""
+
+    @abstractmethod
+    def put(self, data: bytes) -> str:
+        """Store data (or refresh an identical blob's age) and return its ref."""
+
+    @abstractmethod
+    def get(self, ref: str) -> bytes | None:
+        """Blob bytes, or None if it is not stored."""
+
+    @abstractmethod
+    def delete(self, ref: str, min_age_s: float = 0) -> bool:
+        """
+        Remove a blob no case references any more. A blob put within min_age_s is kept
+        (returns False): a concurrent upload of the same content may not have saved its case yet.
+        Returns True if the blob is gone.
+        """
+
+
+class MemoryBlobStore(BlobStore):
+    """In-process store; its size is bounded by the cases referencing it (MemoryCaseStore capacity)."""
+
+    def __init__(self):
+        self._blobs: dict[str, tuple[float, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, data: bytes) -> str:
+        ref = blob_ref(data)
+        with self._lock:
+            item = self._blobs.get(ref)
+            self._blobs[ref] = (time.time(), item[1] if item else data)
+        return ref
+
+    def get(self, ref: str) -> bytes | None:
+        with self._lock:
+            item = self._blobs.get(ref)
+        return item[1] if item else None
+
+    def delete(self, ref: str, min_age_s: float = 0) -> bool:
+        with self._lock:
+            item = self._blobs.get(ref)
+            if item is not None:
+                if time.time() - item[0] < min_age_s:
+                    return False
+                del self._blobs[ref]
+        return True
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+
+class FileBlobStore(BlobStore):
+    """Sharded files (<dir>/ab/abcdef...) shared by every worker on the host; writes are atomic."""
+
+    def __init__(self, root: Path = DEFAULT_BLOB_DIR):
+        self.root = root
+
+    def _path(self, ref: str) -> Path:
+        if len(ref) != 64 or any(c not in "0123456789abcdef" for c in ref):
+            raise ValueError(f"Invalid blob ref: {ref!r}")
+        return self.root / ref[:2] / ref
+
+    def put(self, data: bytes) -> str:
+        ref = blob_ref(data)
+        path = self._path(ref)
+        try:
+            # Already stored: the mtime marks it as in use for delete()'s min_age_s
+            os.utime(path)
+            return ref
+        except FileNotFoundError:
+            pass
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        return ref
+
+    def get(self, ref: str) -> bytes | None:
+        try:
+            return self._path(ref).read_bytes()
+        except (OSError, ValueError):
+            return None
+
+    def delete(self, ref: str, min_age_s: float = 0) -> bool:
+        path = self._path(ref)
+        try:
+            if time.time() - path.stat().st_mtime < min_age_s:
+                return False
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        return True
+
+
+def blob_store_kind() -> str:
+    """"file" or "memory", as configured by BLOB_STORE (defaulting from CASE_STORE)."""
+    default = "file" if os.environ.get("CASE_STORE", "memory").lower() == "sqlite" else "memory"
+    return os.environ.get("BLOB_STORE", default).lower()
+
+
+def _blob_store_from_env() -> BlobStore:
+    if blob_store_kind() == "file":
+        path = os.environ.get("BLOB_STORE_PATH")
+        return FileBlobStore(Path(path) if path else DEFAULT_BLOB_DIR)
+    return MemoryBlobStore()
+
+
+_blob_store: BlobStore | None = None
+_init_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """Process-wide blob store configured from env on first use."""
+    global _blob_store
+    if _blob_store is None:
+        with _init_lock:
+            if _blob_store is None:
+                _blob_store = _blob_store_from_env()
+    return _blob_store
@@ -0,0 +1,339 @@
+"""
+Case storage for the /cases endpoints.
+MemoryCaseStore: bounded in-process LRU with TTL (single worker).
+SQLiteCaseStore: WAL-mode SQLite shared by all workers on a host; a save writes only
+the fields that changed, so concurrent updates of one case (a run and a chat turn) merge.
+Both own the lifetime of case images in the blob store: an image_ref blob is deleted
+once no stored case references it (after delete, LRU eviction or TTL expiry).
+
+Env:
+  CASE_STORE            memory (default) | sqlite
+  CASE_STORE_PATH       SQLite file (default backend/data/cases.sqlite)
+  CASE_STORE_MAX_ITEMS  LRU capacity for the memory store (default 1000)
+  CASE_STORE_TTL_S      evict cases idle for longer than this (default 86400, 0 = never)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+from backend.blob_store import BlobStore, get_blob_store
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent / "data" / "cases.sqlite"
+
+# Legacy only: cases created before the blob store kept the image (base64) and raw CSV text
+# in the case_blobs table. They are still read back into the case but never written.
+LEGACY_BLOB_FIELDS = ("image_data", "wearables_csv")
+# Unreferenced blobs put more recently than this are kept for now (and retried later):
+# a concurrent create may have stored the same image and not saved its case yet
+BLOB_GRACE_S = 300.0
+
+
+class CaseStore(ABC):
+    """Cases are plain dicts keyed by case["id"]."""
+
+    @abstractmethod
+    def get(self, case_id: str) -> dict | None:
+        """The case, or None if unknown or expired."""
+
+    @abstractmethod
+    def put(self, case: dict) -> None:
+        """Save a new case, or the changes made to a case returned by get()."""
+
+    @abstractmethod
+    def delete(self, case_id: str) -> None:
+        """Remove a case and its chat archive."""
+
+    @abstractmethod
+    def archive_chat(self, case_id: str, messages: list[dict]) -> None:
+        """Append chat messages trimmed from the case's chat_history."""
+
+    @abstractmethod
+    def chat_archive(self, case_id: str) -> list[dict]:
+        """Archived chat messages, oldest first."""
+
+    def __contains__(self, case_id: str) -> bool:
+        return self.get(case_id) is not None
+
+
+class MemoryCaseStore(CaseStore):
+    """
+    LRU + TTL dict. get() returns the stored dict itself, so in-place edits are visible.
+    Image blobs are reference-counted per case; orphans are deleted on delete() and every
+    _SWEEP_EVERY writes (covering LRU evictions and expiries).
+    """
+
+    _SWEEP_EVERY = 100
+
+    def __init__(self, max_items: int = 1000, ttl_s: float = 86400, blobs: BlobStore | None = None):
+        self.max_items = max_items
+        self.ttl_s = ttl_s
+        self.blobs = blobs
+        self._cases: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._archives: dict[str, list[dict]] = {}
+        self._case_refs: dict[str, str] = {}
+        self._refs: Counter[str] = Counter()
+        # Blobs whose last case is gone but that are not deleted yet
+        self._orphans: set[str] = set()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _set_ref(self, case_id: str, ref: str | None) -> None:
+        """Point a case at an image blob (None: the case is gone). Caller holds the lock."""
+        if self.blobs is None:
+            return
+        old = self._case_refs.pop(case_id, None)
+        if ref:
+            self._case_refs[case_id] = ref
+            self._refs[ref] += 1
+            self._orphans.discard(ref)
+        if old:
+            self._refs[old] -= 1
+            if self._refs[old] <= 0:
+                del self._refs[old]
+                self._orphans.add(old)
+
+    def _release_blobs(self) -> None:
+        """Delete orphaned blobs (outside the lock: the file store touches disk)."""
+        with self._lock:
+            orphans = list(self._orphans)
+        for ref in orphans:
+            if self.blobs.delete(ref, min_age_s=BLOB_GRACE_S):
+                with self._lock:
+                    self._orphans.discard(ref)
+
+    def get(self, case_id: str) -> dict | None:
+        with self._lock:
+            item = self._cases.get(case_id)
+            if item is None:
+                return None
+            touched, case = item
+            if self.ttl_s and time.time() - touched > self.ttl_s:
+                del self._cases[case_id]
+                self._set_ref(case_id, None)
+                return None
+            self._cases[case_id] = (time.time(), case)
+            self._cases.move_to_end(case_id)
+            return case
+
+    def put(self, case: dict) -> None:
+        with self._lock:
+            self._cases[case["id"]] = (time.time(), case)
+            self._cases.move_to_end(case["id"])
+            self._set_ref(case["id"], case.get("image_ref"))
+            while len(self._cases) > self.max_items:
+                evicted, _ = self._cases.popitem(last=False)
+                self._archives.pop(evicted, None)
+                self._set_ref(evicted, None)
+            self._writes += 1
+            sweep = bool(self._orphans) and self._writes % self._SWEEP_EVERY == 0
+        if sweep:
+            self._release_blobs()
+
+    def delete(self, case_id: str) -> None:
+        with self._lock:
+            self._cases.pop(case_id, None)
+            self._archives.pop(case_id, None)
+            self._set_ref(case_id, None)
+            sweep = bool(self._orphans)
+        if sweep:
+            self._release_blobs()
+
+    def archive_chat(self, case_id: str, messages: list[dict]) -> None:
+        with self._lock:
+            self._archives.setdefault(case_id, []).extend(messages)
+
+    def chat_archive(self, case_id: str) -> list[dict]:
+        with self._lock:
+            return list(self._archives.get(case_id, []))
+
+    def __len__(self) -> int:
+        return len(self._cases)
+
+
+class _LoadedCase(dict):
+    """A case as read by SQLiteCaseStore.get(), with each field's stored JSON for diffing on put()."""
+
+    stored: dict[str, str]
+
+
+class SQLiteCaseStore(CaseStore):
+    """
+    SQLite (WAL) store. get() returns a fresh dict; call put() after modifying it.
+    put() of a loaded case only sets (json_set) or removes the top-level fields that differ
+    from what get() read, so another worker's concurrent changes to other fields survive;
+    concurrent writes to the same field are last-writer-wins.
+    image_ref is kept in its own indexed column; refs of removed cases are queued in blob_gc
+    and their blobs deleted (by whichever worker purges next) once no case uses them.
+    """
+
+    # Purge expired cases and orphaned blobs every this many writes
+    _PURGE_EVERY = 100
+
+    def __init__(self, db_path: Path = DEFAULT_DB_PATH, ttl_s: float = 86400, blobs: BlobStore | None = None):
+        self.ttl_s = ttl_s
+        self.blobs = blobs
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False, timeout=10)
+        self._lock = threading.Lock()
+        self._writes = 0
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("PRAGMA foreign_keys=ON")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cases ("
+                "id TEXT PRIMARY KEY, meta TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS case_blobs ("
+                "case_id TEXT NOT NULL REFERENCES cases(id) ON DELETE CASCADE, "
+                "name TEXT NOT NULL, data BLOB NOT NULL, PRIMARY KEY (case_id, name))"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chat_archive ("
+                "case_id TEXT NOT NULL REFERENCES cases(id) ON DELETE CASCADE, "
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, role TEXT NOT NULL, content TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS blob_gc (ref TEXT PRIMARY KEY)")
+            self._add_image_ref_column()
+            self._db.execute("CREATE INDEX IF NOT EXISTS cases_updated ON cases(updated_at)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS cases_image_ref ON cases(image_ref)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS chat_archive_case ON chat_archive(case_id, seq)")
+            self._db.commit()
+
+    def _add_image_ref_column(self) -> None:
+        """Migrate databases created before image_ref had its own column."""
+        if any(row[1] == "image_ref" for row in self._db.execute("PRAGMA table_info(cases)")):
+            return
+        try:
+            self._db.execute("ALTER TABLE cases ADD COLUMN image_ref TEXT")
+        except sqlite3.OperationalError as e:
+            if "duplicate column" not in str(e):  # Another worker migrated first
+                raise
+            return
+        self._db.execute("UPDATE cases SET image_ref = json_extract(meta, '$.image_ref')")
+
+    def _remove_cases(self, where: str, params: tuple) -> None:
+        """Delete matching cases, queueing their image refs for blob cleanup. Caller holds the lock."""
+        if self.blobs is not None:
+            self._db.execute(
+                f"INSERT OR IGNORE INTO blob_gc (ref) SELECT image_ref FROM cases WHERE image_ref IS NOT NULL AND {where}",
+                params,
+            )
+        self._db.execute(f"DELETE FROM cases WHERE {where}", params)
+
+    def _release_blobs(self) -> None:
+        """Delete queued blobs no case references any more (unlinks happen outside the lock)."""
+        in_use = "EXISTS (SELECT 1 FROM cases WHERE cases.image_ref = blob_gc.ref)"
+        with self._lock:
+            self._db.execute(f"DELETE FROM blob_gc WHERE {in_use}")
+            refs = [ref for (ref,) in self._db.execute(f"SELECT ref FROM blob_gc WHERE NOT {in_use}")]
+            self._db.commit()
+        deleted = [(ref,) for ref in refs if self.blobs.delete(ref, min_age_s=BLOB_GRACE_S)]
+        if deleted:
+            with self._lock:
+                self._db.executemany("DELETE FROM blob_gc WHERE ref = ?", deleted)
+                self._db.commit()
+
+    def get(self, case_id: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute("SELECT meta, updated_at FROM cases WHERE id = ?", (case_id,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl_s and time.time() - row[1] > self.ttl_s:
+                self._remove_cases("id = ?", (case_id,))
+                self._db.commit()
+                return None
+            case = _LoadedCase(json.loads(row[0]))
+            case.stored = {k: _dumps(v) for k, v in case.items()}
+            for name, data in self._db.execute(
+                "SELECT name, data FROM case_blobs WHERE case_id = ?", (case_id,)
+            ):
+                case[name] = bytes(data).decode("utf-8")
+            return case
+
+    def put(self, case: dict) -> None:
+        fields = {k: _dumps(v) for k, v in case.items() if k not in LEGACY_BLOB_FIELDS}
+        now = time.time()
+        with self._lock:
+            if not (isinstance(case, _LoadedCase) and self._update(case, fields, now)):
+                meta = "{" + ",".join(f"{json.dumps(k)}:{v}" for k, v in fields.items()) + "}"
+                self._db.execute(
+                    "INSERT INTO cases (id, meta, image_ref, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET meta = excluded.meta, image_ref = excluded.image_ref, "
+                    "updated_at = excluded.updated_at",
+                    (case["id"], meta, case.get("image_ref"), now, now),
+                )
+            if isinstance(case, _LoadedCase):
+                case.stored = fields
+            self._writes += 1
+            purge = self._writes % self._PURGE_EVERY == 0
+            if purge and self.ttl_s:
+                self._remove_cases("updated_at < ?", (now - self.ttl_s,))
+            self._db.commit()
+        if purge and self.blobs is not None:
+            self._release_blobs()
+
+    def _update(self, case: _LoadedCase, fields: dict[str, str], now: float) -> bool:
+        """Write only the fields changed since get(); False if the case is gone. Caller holds the lock."""
+        changed = [(k, v) for k, v in fields.items() if case.stored.get(k) != v]
+        removed = [k for k in case.stored if k not in fields]
+        meta = "meta"
+        params: list = []
+        if removed:
+            meta = f"json_remove({meta}, {', '.join('?' * len(removed))})"
+            params += [_path(k) for k in removed]
+        if changed:
+            meta = f"json_set({meta}, {', '.join('?, json(?)' for _ in changed)})"
+            params += [x for k, v in changed for x in (_path(k), v)]
+        cursor = self._db.execute(
+            f"UPDATE cases SET meta = {meta}, image_ref = ?, updated_at = ? WHERE id = ?",
+            (*params, case.get("image_ref"), now, case["id"]),
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, case_id: str) -> None:
+        with self._lock:
+            self._remove_cases("id = ?", (case_id,))
+            self._db.commit()
+        if self.blobs is not None:
+            self._release_blobs()
+
+    def archive_chat(self, case_id: str, messages: list[dict]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO chat_archive (case_id, role, content) VALUES (?, ?, ?)",
+                [(case_id, m["role"], m["content"]) for m in messages],
+            )
+            self._db.commit()
+
+    def chat_archive(self, case_id: str) -> list[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT role, content FROM chat_archive WHERE case_id = ? ORDER BY seq", (case_id,)
+            ).fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, default=str)
+
+
+def _path(key: str) -> str:
+    """JSON path of a top-level field."""
+    return "$." + json.dumps(key)
+
+
+def case_store_from_env() -> CaseStore:
+    ttl_s = float(os.environ.get("CASE_STORE_TTL_S", "86400"))
+    if os.environ.get("CASE_STORE", "memory").lower() == "sqlite":
+        db_path = os.environ.get("CASE_STORE_PATH")
+        return SQLiteCaseStore(Path(db_path) if db_path else DEFAULT_DB_PATH, ttl_s=ttl_s, blobs=get_blob_store())
+    return MemoryCaseStore(
+        max_items=int(os.environ.get("CASE_STORE_MAX_ITEMS", "1000")), ttl_s=ttl_s, blobs=get_blob_store()
+    )
@@ -0,0 +1,170 @@
+"""
+Bounded chat context for case Q&A.
+The static case summary is built once per result version and cached on the case.
+History in the prompt is a rolling summary of older turns plus the most recent turns
+verbatim, kept under a token budget; stored chat_history is capped and older
+messages (already folded into the summary) are handed off for archival.
+
+Env:
+  CHAT_CONTEXT_TOKENS        token budget for history in the prompt (default 1500)
+  CHAT_HISTORY_MAX_MESSAGES  messages kept on the case before archival (default 40)
+"""
+import os
+from typing import Any, Awaitable, Callable
+
+CHAT_CONTEXT_TOKENS = int(os.environ.get("CHAT_CONTEXT_TOKENS", "1500"))
+CHAT_HISTORY_MAX_MESSAGES = int(os.environ.get("CHAT_HISTORY_MAX_MESSAGES", "40"))
+
+# Fold older turns once verbatim history exceeds this share of the budget, down to FOLD_TARGET;
+# the rolling summary gets the rest
+FOLD_TRIGGER = 0.75
+FOLD_TARGET = 0.5
+SUMMARY_SHARE = 0.25
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token); good enough for budgeting."""
+    return (len(text) + 3) // 4
+
+
+def _state(case: dict) -> dict[str, Any]:
+    """
+    Per-case bookkeeping. Counts are absolute message indexes over the whole conversation:
+    archived = messages moved out of chat_history, summarized = messages folded into summary.
+    """
+    return case.setdefault("chat_context", {
+        "result_version": None,
+        "case_summary": "",
+        "summary": "",
+        "summarized": 0,
+        "archived": 0,
+    })
+
+
+def case_summary(case: dict) -> str:
+    """Static case context for the chat prompt, rebuilt only when result_version changes."""
+    state = _state(case)
+    version = case.get("result_version", 0)
+    if state["result_version"] != version or not state["case_summary"]:
+        state["case_summary"] = _build_case_summary(case)
+        state["result_version"] = version
+    return state["case_summary"]
+
+
+def _build_case_summary(case: dict) -> str:
+    result = case.get("result", {})
+    context = f"""Case analysis summary:
+- p_health: {result.get('p_health')}, p_vision: {result.get('p_vision')}, p_fused: {result.get('p_fused')}
+- Guardrails: {result.get('guardrail_reason')}
+- Next steps: {result.get('next_steps', [])}
+- Clinician report: {result.get('clinician_report', '')}
+- Patient summary: {result.get('patient_summary', '')}
+- Vision findings: {result.get('vision_findings', '')}
+"""
+    abcde = result.get("abcde", {})
+    if abcde:
+        context += f"- ABCDE: asymmetry={abcde.get('asymmetry')}, border={abcde.get('border')}, color={abcde.get('color')}, diameter={abcde.get('diameter')}\n"
+    diff = result.get("differential_diagnosis", [])[:5]
+    if diff:
+        context += "- Differential diagnosis: " + ", ".join(f"{d.get('name')}({d.get('probability', 0)*100:.0f}%)" for d in diff) + "\n"
+    patient_ctx = case.get("dataset_metadata") or {}
+    if patient_ctx:
+        context += f"\nPatient/dataset context: age={patient_ctx.get('age')}, sex={patient_ctx.get('sex')}, localization={patient_ctx.get('localization')}"
+    return context
+
+
+def format_messages(messages: list[dict]) -> str:
+    return "\n".join(
+        f"{'Clinician' if m['role'] == 'user' else 'Assistant'}: {m['content']}" for m in messages
+    )
+
+
+def _verbatim(case: dict) -> list[dict]:
+    """Messages not yet folded into the rolling summary."""
+    state = _state(case)
+    history = case.get("chat_history", [])
+    return history[max(0, state["summarized"] - state["archived"]):]
+
+
+def history_context(case: dict) -> str:
+    """Rolling summary plus recent turns verbatim, for the prompt."""
+    state = _state(case)
+    parts = []
+    if state["summary"]:
+        parts.append(f"Earlier conversation (summary):\n{state['summary']}")
+    recent = format_messages(_verbatim(case))
+    if recent:
+        parts.append(f"Recent conversation:\n{recent}")
+    return "\n\n".join(parts)
+
+
+def add_turn(case: dict, message: str, reply: str) -> None:
+    case.setdefault("chat_history", []).append({"role": "user", "content": message})
+    case["chat_history"].append({"role": "assistant", "content": reply})
+
+
+async def fold_history(
+    case: dict,
+    summarize: Callable[[str, list[dict], int], Awaitable[str]],
+    budget: int = CHAT_CONTEXT_TOKENS,
+) -> bool:
+    """
+    If verbatim history exceeds FOLD_TRIGGER of the budget, fold the oldest turns into the
+    rolling summary via summarize(previous_summary, messages, max_tokens) until it is under
+    FOLD_TARGET. Folding in batches keeps summarization calls to one every few turns.
+    Returns True if a fold happened.
+    """
+    verbatim = _verbatim(case)
+    tokens = [estimate_tokens(m["content"]) + 2 for m in verbatim]
+    if sum(tokens) <= budget * FOLD_TRIGGER:
+        return False
+    # Fold whole turns (pairs), always leaving the latest turn verbatim
+    n_fold, remaining = 0, sum(tokens)
+    while remaining > budget * FOLD_TARGET and n_fold + 2 < len(verbatim):
+        remaining -= tokens[n_fold] + tokens[n_fold + 1]
+        n_fold += 2
+    if n_fold == 0:
+        return False
+    state = _state(case)
+    max_tokens = int(budget * SUMMARY_SHARE)
+    summary = await summarize(state["summary"], verbatim[:n_fold], max_tokens)
+    # Hard cap in case the summarizer overshoots: keep the most recent part
+    state["summary"] = _clip_tail(summary, max_tokens)
+    state["summarized"] += n_fold
+    return True
+
+
+def trim_history(case: dict, max_messages: int = CHAT_HISTORY_MAX_MESSAGES) -> list[dict]:
+    """
+    Cap stored chat_history. Only messages already folded into the summary are removed,
+    so the prompt never loses context. Returns the removed messages for archival.
+    """
+    state = _state(case)
+    history = case.get("chat_history", [])
+    overflow = len(history) - max_messages
+    folded = state["summarized"] - state["archived"]
+    n = min(overflow, folded)
+    if n <= 0:
+        return []
+    archived, case["chat_history"] = history[:n], history[n:]
+    state["archived"] += n
+    return archived
+
+
+def local_summary(previous: str, messages: list[dict], max_tokens: int) -> str:
+    """Extractive fallback summarizer: one clipped line per message appended to the previous summary."""
+    lines = [previous] if previous else []
+    for m in messages:
+        text = " ".join(m["content"].split())
+        if len(text) > 160:
+            text = text[:157] + "..."
+        lines.append(f"{'Clinician' if m['role'] == 'user' else 'Assistant'}: {text}")
+    return _clip_tail("\n".join(lines), max_tokens)
+
+
+def _clip_tail(text: str, max_tokens: int) -> str:
+    """Keep the last ~max_tokens of text, starting at a line boundary when possible."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    tail = text[-max_tokens * 4:]
+    return tail.split("\n", 1)[1] if "\n" in tail else tail
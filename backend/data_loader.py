@@ -1,16 +1,204 @@
 """Load HAM index on startup."""
 import json
+import mmap
+import struct
+from array import array
+from collections.abc import Sequence
 from pathlib import Path
 
 INDEX_PATH = Path(__file__).resolve().parent / "data" / "ham_index.json"
+INDEX_BIN_PATH = Path(__file__).resolve().parent / "data" / "ham_index.bin"
 ERROR_MSG = "HAM index not built. Run: python tools/build_ham_index.py"
 
+# Binary index layout (little-endian, all sections 4-byte aligned):
+#   header     magic, n_rows, n_strings, strings_len, ids_len, paths_len
+#   uint32     string offsets (n_strings + 1), id offsets (n_rows + 1), path offsets (n_rows + 1)
+#   uint32     row positions ordered by image_id (UTF-8 bytes), for binary search (n_rows)
+#   uint16     dx, age, sex, localization codes into the string table; binary_label_mel (n_rows each)
+#   utf-8      string table blob, image_id blob, filepath blob
+# NONE_CODE in a uint16 column stands for None (a missing value), distinct from "".
+BIN_MAGIC = b"OLHAMIX2"
+_HEADER = struct.Struct("<8sIIIII")
+_STRING_COLUMNS = ("dx", "age", "sex", "localization")
+NONE_CODE = 0xFFFF
 
-def load_ham_index() -> tuple[list[dict], str | None]:
+
+def _pad4(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def write_ham_index_bin(entries: list[dict], path: Path = INDEX_BIN_PATH) -> None:
+    """Write entries as a compact columnar file readable by HamIndexFile."""
+    strings: list[str] = []
+    string_codes: dict[str, int] = {}
+
+    def intern(value) -> int:
+        if value is None:
+            return NONE_CODE
+        value = str(value)
+        code = string_codes.get(value)
+        if code is None:
+            if len(strings) == NONE_CODE:
+                raise ValueError(f"Too many distinct values for the binary index (max {NONE_CODE})")
+            code = string_codes[value] = len(strings)
+            strings.append(value)
+        return code
+
+    columns = {key: array("H", (intern(e.get(key)) for e in entries)) for key in _STRING_COLUMNS}
+    labels = array("H", (
+        NONE_CODE if e.get("binary_label_mel") is None else int(e["binary_label_mel"]) for e in entries
+    ))
+
+    def pack_blob(values) -> tuple[array, bytes]:
+        offsets = array("I", [0])
+        chunks = []
+        for v in values:
+            encoded = str(v or "").encode("utf-8")
+            chunks.append(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+        return offsets, b"".join(chunks)
+
+    str_offsets, str_blob = pack_blob(strings)
+    id_offsets, id_blob = pack_blob(e.get("image_id") for e in entries)
+    path_offsets, path_blob = pack_blob(e.get("filepath") for e in entries)
+
+    n = len(entries)
+    id_keys = [str(e.get("image_id") or "").encode("utf-8") for e in entries]
+    id_order = array("I", sorted(range(n), key=id_keys.__getitem__))
+    parts = [
+        _HEADER.pack(BIN_MAGIC, n, len(strings), len(str_blob), len(id_blob), len(path_blob)),
+        str_offsets.tobytes(),
+        id_offsets.tobytes(),
+        path_offsets.tobytes(),
+        id_order.tobytes(),
+    ]
+    u16 = b"".join(columns[key].tobytes() for key in _STRING_COLUMNS) + labels.tobytes()
+    parts.append(u16 + b"\0" * (_pad4(len(u16)) - len(u16)))
+    parts.extend([str_blob, id_blob, path_blob])
+
+    tmp_path = path.with_suffix(".bin.tmp")
+    with open(tmp_path, "wb") as f:
+        for part in parts:
+            f.write(part)
+    tmp_path.replace(path)
+
+
+class HamIndexFile(Sequence):
+    """
+    Read-only, memory-mapped HAM index. Rows are materialized as dicts on access;
+    the mapping is shared between processes by the OS page cache.
+    """
+
+    def __init__(self, path: Path = INDEX_BIN_PATH):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+        magic, n, n_strings, strings_len, ids_len, paths_len = _HEADER.unpack_from(buf, 0)
+        if magic != BIN_MAGIC:
+            raise ValueError(f"bad magic {magic!r}")
+        self._n = n
+
+        pos = _HEADER.size
+
+        def take(nbytes: int, fmt: str | None = None):
+            nonlocal pos
+            view = buf[pos:pos + nbytes]
+            if len(view) != nbytes:
+                raise ValueError("truncated index file")
+            pos += nbytes
+            return view.cast(fmt) if fmt else view
+
+        str_offsets = take(4 * (n_strings + 1), "I")
+        self._id_offsets = take(4 * (n + 1), "I")
+        self._path_offsets = take(4 * (n + 1), "I")
+        self._id_order = take(4 * n, "I")
+        u16_len = 2 * n * (len(_STRING_COLUMNS) + 1)
+        u16 = take(u16_len)
+        take(_pad4(u16_len) - u16_len)
+        self._columns = {
+            key: u16[2 * n * i:2 * n * (i + 1)].cast("H") for i, key in enumerate(_STRING_COLUMNS)
+        }
+        self._labels = u16[2 * n * len(_STRING_COLUMNS):].cast("H")
+        str_blob = take(strings_len)
+        self._id_blob = take(ids_len)
+        self._path_blob = take(paths_len)
+
+        # The string table is tiny (a few dozen distinct values); decode it once
+        self._strings = [
+            str(str_blob[str_offsets[i]:str_offsets[i + 1]], "utf-8") for i in range(n_strings)
+        ]
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._n))]
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError("HAM index row out of range")
+        row = {"image_id": self.image_id(i)}
+        for key in _STRING_COLUMNS:
+            row[key] = self._string(self._columns[key][i])
+        row["filepath"] = str(self._path_blob[self._path_offsets[i]:self._path_offsets[i + 1]], "utf-8")
+        label = self._labels[i]
+        row["binary_label_mel"] = None if label == NONE_CODE else label
+        return row
+
+    def _string(self, code: int) -> str | None:
+        return None if code == NONE_CODE else self._strings[code]
+
+    def _id_bytes(self, i: int) -> bytes:
+        return bytes(self._id_blob[self._id_offsets[i]:self._id_offsets[i + 1]])
+
+    def image_id(self, i: int) -> str:
+        return self._id_bytes(i).decode("utf-8")
+
+    def find(self, image_id: str) -> int | None:
+        """Row position of image_id (binary search over the sorted id order), or None."""
+        if not image_id:
+            return None
+        target = image_id.encode("utf-8")
+        order = self._id_order
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._id_bytes(order[mid]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n and self._id_bytes(order[lo]) == target:
+            return order[lo]
+        return None
+
+    def dx_values(self) -> list[str | None]:
+        return [self._string(c) for c in self._columns["dx"]]
+
+    def binary_labels(self) -> list[int | None]:
+        return [None if label == NONE_CODE else label for label in self._labels]
+
+
+def _load_ham_index_bin() -> HamIndexFile | None:
+    """Open the binary index if present and not older than the JSON index."""
+    if not INDEX_BIN_PATH.exists():
+        return None
+    if INDEX_PATH.exists() and INDEX_PATH.stat().st_mtime > INDEX_BIN_PATH.stat().st_mtime:
+        return None
+    try:
+        return HamIndexFile(INDEX_BIN_PATH)
+    except Exception:
+        return None
+
+
+def load_ham_index() -> tuple[Sequence[dict], str | None]:
     """
-    Load ham_index.json. Returns (index_list, error_message).
-    If error_message is not None, index is empty.
+    Load the HAM index. Prefers the memory-mapped ham_index.bin, falls back to ham_index.json.
+    Returns (index_rows, error_message). If error_message is not None, index is empty.
     """
+    index_file = _load_ham_index_bin()
+    if index_file is not None:
+        return index_file, None
     if not INDEX_PATH.exists():
         return [], ERROR_MSG
     try:
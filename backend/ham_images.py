@@ -0,0 +1,72 @@
+"""
+HAM10000 image files for /dataset/ham/images: HTTP cache validators and
+on-demand thumbnails cached on disk under backend/data/thumbs/.
+"""
+import os
+import tempfile
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+from backend import metrics
+
+DEFAULT_THUMB_DIR = Path(__file__).resolve().parent / "data" / "thumbs"
+
+# Named thumbnail sizes (longest edge in px)
+THUMBNAIL_SIZES = {"thumb": 128, "small": 256, "medium": 512}
+THUMBNAIL_QUALITY = 85
+
+# Dataset files never change under a given image_id; let browsers and CDNs keep them for a week
+CACHE_CONTROL = "public, max-age=604800"
+
+
+def media_type_for(path: Path) -> str:
+    return "image/png" if path.suffix.lower() == ".png" else "image/jpeg"
+
+
+def validators(path: Path) -> tuple[str, str]:
+    """(ETag, Last-Modified) for a file, derived from its mtime and size."""
+    st = path.stat()
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"', formatdate(st.st_mtime, usegmt=True)
+
+
+def is_not_modified(if_none_match: str | None, if_modified_since: str | None, etag: str, last_modified: str) -> bool:
+    """Evaluate conditional request headers (If-None-Match takes precedence, RFC 9110)."""
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if if_modified_since is not None:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def thumbnail_path(source: Path, image_id: str, size: str, root: Path = DEFAULT_THUMB_DIR) -> Path:
+    """
+    Path of the JPEG thumbnail for source at a named size, generating it if missing or
+    older than the source. Writes are atomic, so concurrent requests never see partial files.
+    """
+    edge = THUMBNAIL_SIZES[size]
+    dest = root / size / f"{image_id}.jpg"
+    try:
+        if dest.stat().st_mtime >= source.stat().st_mtime:
+            return dest
+    except FileNotFoundError:
+        pass
+
+    from PIL import Image
+
+    with metrics.IO_SECONDS.time(op="thumbnail"), Image.open(source) as img:
+        thumb = img.convert("RGB")
+        thumb.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dest.parent, prefix=".tmp-", suffix=".jpg")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            thumb.save(f, format="JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+        os.replace(tmp, dest)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return dest
@@ -0,0 +1,106 @@
+"""
+In-memory HAM index with prebuilt lookups.
+Built once on startup so request handlers never rescan the entry list.
+"""
+import random
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+
+from backend.data_loader import HamIndexFile
+
+
+class _Rows(Sequence):
+    """Lazy view of selected rows (by position) of the underlying index."""
+
+    def __init__(self, entries: Sequence[dict], positions: array):
+        self._entries = entries
+        self._positions = positions
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._entries[p] for p in self._positions[i]]
+        return self._entries[self._positions[i]]
+
+
+class HamIndex:
+    """
+    Read-only view over HAM index rows (a list of dicts or a memory-mapped HamIndexFile).
+    Holds per-dx and per-binary-label row positions and class counts. image_id lookups use the
+    file's sorted id order (binary search); a list of dicts gets an image_id -> row position map.
+    """
+
+    def __init__(self, entries: Sequence[dict] | None = None):
+        self.entries: Sequence[dict] = entries if entries is not None else []
+        self._by_id: dict[str, int] | None = None
+        if isinstance(self.entries, HamIndexFile):
+            # The file cannot tell a missing dx from None; missing means "unknown" as for dict rows
+            dxs = ["unknown" if dx is None else dx for dx in self.entries.dx_values()]
+            labels = self.entries.binary_labels()
+        else:
+            self._by_id = {e["image_id"]: i for i, e in enumerate(self.entries) if e.get("image_id")}
+            dxs = [e.get("dx", "unknown") for e in self.entries]
+            labels = [e.get("binary_label_mel") for e in self.entries]
+
+        by_dx: dict[str, array] = {}
+        by_label: dict[int, array] = {}
+        for i, (dx, label) in enumerate(zip(dxs, labels)):
+            by_dx.setdefault(dx, array("I")).append(i)
+            if label is not None:
+                by_label.setdefault(int(label), array("I")).append(i)
+        self.by_dx: dict[str, Sequence[dict]] = {dx: _Rows(self.entries, pos) for dx, pos in by_dx.items()}
+        self.by_binary_label: dict[int, Sequence[dict]] = {
+            label: _Rows(self.entries, pos) for label, pos in by_label.items()
+        }
+        self.counts_by_class: dict[str, int] = {dx: len(pos) for dx, pos in by_dx.items()}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __bool__(self) -> bool:
+        return len(self.entries) > 0
+
+    def get(self, image_id: str) -> dict | None:
+        """Return the row for image_id, or None."""
+        pos = self._by_id.get(image_id) if self._by_id is not None else self.entries.find(image_id)
+        return None if pos is None else self.entries[pos]
+
+    def candidates(
+        self,
+        dx: str | None = None,
+        label: str | None = None,
+        binary_label: int | None = None,
+    ) -> Sequence[dict]:
+        """Rows matching dx, label (mel / non-mel) or binary_label, in that precedence."""
+        if dx:
+            return self.by_dx.get(dx.lower(), [])
+        if label:
+            return self.by_binary_label.get(1 if label.lower() == "mel" else 0, [])
+        if binary_label is not None:
+            return self.by_binary_label.get(int(binary_label), [])
+        return self.entries
+
+    def random_entry(
+        self,
+        dx: str | None = None,
+        label: str | None = None,
+        binary_label: int | None = None,
+        rng: random.Random | None = None,
+    ) -> dict | None:
+        """Pick a random matching row, or None if nothing matches."""
+        rows = self.candidates(dx=dx, label=label, binary_label=binary_label)
+        if not rows:
+            return None
+        return (rng or random).choice(rows)
+
+    def dataset_dir(self) -> str | None:
+        """Directory of the first indexed image, if it exists on this machine."""
+        if not self:
+            return None
+        first_path = Path(self.entries[0].get("filepath", ""))
+        if first_path.exists():
+            return str(first_path.parent)
+        return None
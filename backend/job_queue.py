@@ -0,0 +1,463 @@
+"""
+In-process background job queue for long-running work (pipeline runs, benchmarks, batches).
+Jobs are persisted in a job store; no external broker is needed. Store calls run in
+worker threads so SQLite I/O never blocks the event loop.
+MemoryJobStore: in-process dict (single worker, lost on restart).
+SQLiteJobStore: WAL-mode SQLite; jobs are claimed atomically, so several processes can
+run workers against the same file. A job may then run in any process, so its cases and
+images must be shared too: it requires CASE_STORE=sqlite and a file blob store.
+
+Env:
+  JOB_STORE        memory | sqlite (default: sqlite when cases and blobs are shared, else memory)
+  JOB_STORE_PATH   SQLite file (default backend/data/jobs.sqlite)
+  JOB_WORKERS      jobs run concurrently per process (default 2)
+  JOB_RETENTION_S  finished jobs (and their results) are purged after this (default 86400)
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent / "data" / "jobs.sqlite"
+
+FINISHED = ("done", "failed", "cancelled")
+
+# A running job whose heartbeat is older than this is treated as orphaned (its process died)
+STALE_AFTER_S = 30.0
+
+# handler(job_id, params, progress) -> JSON-serializable result; progress(done, total)
+JobHandler = Callable[[str, dict[str, Any], Callable[[int, int], None]], Awaitable[Any]]
+
+
+def _new_job(kind: str, params: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "id": str(uuid.uuid4()),
+        "kind": kind,
+        "params": params,
+        "status": "queued",
+        "progress": {"done": 0, "total": 0},
+        "result": None,
+        "error": None,
+        "cancel_requested": False,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+    }
+
+
+class JobStore(ABC):
+    """Job persistence. Jobs are plain dicts (see _new_job)."""
+
+    @abstractmethod
+    def create(self, kind: str, params: dict[str, Any]) -> dict[str, Any]:
+        """Persist a new queued job and return it."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        """The job with its result, or None if unknown or purged."""
+
+    @abstractmethod
+    def recent(self, kind: str | None = None, status: str | None = None, limit: int = 50) -> list[dict[str, Any]]:
+        """Most recent first, without results."""
+
+    @abstractmethod
+    def claim_next(self, kinds: list[str]) -> dict[str, Any] | None:
+        """Atomically move the oldest queued job of one of kinds to running and return it."""
+
+    @abstractmethod
+    def update_progress(self, job_id: str, done: int, total: int) -> None:
+        """Record progress (also counts as a heartbeat)."""
+
+    @abstractmethod
+    def heartbeat(self, job_id: str) -> None:
+        """Mark a running job as still alive."""
+
+    @abstractmethod
+    def finish(self, job_id: str, status: str, result: Any = None, error: str | None = None) -> None:
+        """Move a job to a finished status with its result or error."""
+
+    @abstractmethod
+    def request_cancel(self, job_id: str) -> dict[str, Any] | None:
+        """Cancel a queued job outright; flag a running one for its worker. Returns the job."""
+
+    @abstractmethod
+    def fail_stale(self, heartbeat_before: float) -> int:
+        """Fail running jobs whose last heartbeat is older than heartbeat_before; returns the count."""
+
+    @abstractmethod
+    def purge(self, finished_before: float) -> int:
+        """Delete jobs finished before finished_before; returns the count."""
+
+
+class MemoryJobStore(JobStore):
+    def __init__(self):
+        self._jobs: dict[str, dict[str, Any]] = {}
+        self._heartbeats: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def create(self, kind: str, params: dict[str, Any]) -> dict[str, Any]:
+        job = _new_job(kind, params)
+        with self._lock:
+            self._jobs[job["id"]] = job
+            return dict(job)
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def recent(self, kind: str | None = None, status: str | None = None, limit: int = 50) -> list[dict[str, Any]]:
+        with self._lock:
+            jobs = [
+                {k: v for k, v in j.items() if k != "result"}
+                for j in self._jobs.values()
+                if (kind is None or j["kind"] == kind) and (status is None or j["status"] == status)
+            ]
+        return sorted(jobs, key=lambda j: j["created_at"], reverse=True)[:limit]
+
+    def claim_next(self, kinds: list[str]) -> dict[str, Any] | None:
+        with self._lock:
+            queued = [j for j in self._jobs.values() if j["status"] == "queued" and j["kind"] in kinds]
+            if not queued:
+                return None
+            job = min(queued, key=lambda j: j["created_at"])
+            job["status"] = "running"
+            job["started_at"] = self._heartbeats[job["id"]] = time.time()
+            return dict(job)
+
+    def update_progress(self, job_id: str, done: int, total: int) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]["progress"] = {"done": done, "total": total}
+                self._heartbeats[job_id] = time.time()
+
+    def heartbeat(self, job_id: str) -> None:
+        with self._lock:
+            self._heartbeats[job_id] = time.time()
+
+    def finish(self, job_id: str, status: str, result: Any = None, error: str | None = None) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(status=status, result=result, error=error, finished_at=time.time())
+                self._heartbeats.pop(job_id, None)
+
+    def request_cancel(self, job_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] == "queued":
+                job.update(status="cancelled", finished_at=time.time())
+            elif job["status"] == "running":
+                job["cancel_requested"] = True
+            return dict(job)
+
+    def fail_stale(self, heartbeat_before: float) -> int:
+        with self._lock:
+            stale = [
+                j for j in self._jobs.values()
+                if j["status"] == "running" and self._heartbeats.get(j["id"], 0) < heartbeat_before
+            ]
+            for job in stale:
+                job.update(status="failed", error="Interrupted: worker stopped", finished_at=time.time())
+            return len(stale)
+
+    def purge(self, finished_before: float) -> int:
+        with self._lock:
+            old = [
+                k for k, j in self._jobs.items()
+                if j["status"] in FINISHED and (j["finished_at"] or 0) < finished_before
+            ]
+            for k in old:
+                del self._jobs[k]
+            return len(old)
+
+
+class SQLiteJobStore(JobStore):
+    _COLUMNS = (
+        "id, kind, params, status, progress_done, progress_total, result, error, "
+        "cancel_requested, created_at, started_at, finished_at"
+    )
+
+    def __init__(self, db_path: Path = DEFAULT_DB_PATH):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False, timeout=10, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, status TEXT NOT NULL, "
+                "progress_done INTEGER NOT NULL DEFAULT 0, progress_total INTEGER NOT NULL DEFAULT 0, "
+                "result TEXT, error TEXT, cancel_requested INTEGER NOT NULL DEFAULT 0, "
+                "created_at REAL NOT NULL, started_at REAL, finished_at REAL, heartbeat_at REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created_at)")
+
+    @staticmethod
+    def _row(row: tuple, with_result: bool = True) -> dict[str, Any]:
+        (job_id, kind, params, status, done, total, result, error, cancel, created, started, finished) = row
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "params": json.loads(params),
+            "status": status,
+            "progress": {"done": done, "total": total},
+            "error": error,
+            "cancel_requested": bool(cancel),
+            "created_at": created,
+            "started_at": started,
+            "finished_at": finished,
+        }
+        if with_result:
+            job["result"] = json.loads(result) if result is not None else None
+        return job
+
+    def create(self, kind: str, params: dict[str, Any]) -> dict[str, Any]:
+        job = _new_job(kind, params)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, params, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job["id"], kind, json.dumps(params, default=str), job["status"], job["created_at"]),
+            )
+        return job
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._db.execute(f"SELECT {self._COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row is not None else None
+
+    def recent(self, kind: str | None = None, status: str | None = None, limit: int = 50) -> list[dict[str, Any]]:
+        where, args = [], []
+        if kind is not None:
+            where.append("kind = ?")
+            args.append(kind)
+        if status is not None:
+            where.append("status = ?")
+            args.append(status)
+        sql = f"SELECT {self._COLUMNS} FROM jobs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            rows = self._db.execute(sql + " ORDER BY created_at DESC LIMIT ?", (*args, limit)).fetchall()
+        return [self._row(r, with_result=False) for r in rows]
+
+    def claim_next(self, kinds: list[str]) -> dict[str, Any] | None:
+        if not kinds:
+            return None
+        now = time.time()
+        marks = ",".join("?" * len(kinds))
+        with self._lock:
+            # Conditional update: only one process can move a given job out of "queued"
+            while True:
+                row = self._db.execute(
+                    f"SELECT id FROM jobs WHERE status = 'queued' AND kind IN ({marks}) ORDER BY created_at LIMIT 1",
+                    kinds,
+                ).fetchone()
+                if row is None:
+                    return None
+                claimed = self._db.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ? "
+                    "WHERE id = ? AND status = 'queued'",
+                    (now, now, row[0]),
+                ).rowcount
+                if claimed:
+                    row = self._db.execute(f"SELECT {self._COLUMNS} FROM jobs WHERE id = ?", (row[0],)).fetchone()
+                    return self._row(row)
+
+    def update_progress(self, job_id: str, done: int, total: int) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET progress_done = ?, progress_total = ?, heartbeat_at = ? WHERE id = ?",
+                (done, total, time.time(), job_id),
+            )
+
+    def heartbeat(self, job_id: str) -> None:
+        with self._lock:
+            self._db.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def finish(self, job_id: str, status: str, result: Any = None, error: str | None = None) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result, default=str) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id,
+                ),
+            )
+
+    def request_cancel(self, job_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+            self._db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def fail_stale(self, heartbeat_before: float) -> int:
+        with self._lock:
+            return self._db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Interrupted: worker stopped', finished_at = ? "
+                "WHERE status = 'running' AND heartbeat_at < ?",
+                (time.time(), heartbeat_before),
+            ).rowcount
+
+    def purge(self, finished_before: float) -> int:
+        with self._lock:
+            return self._db.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND finished_at < ?",
+                (finished_before,),
+            ).rowcount
+
+
+class JobQueue:
+    """
+    Runs registered job kinds on `workers` asyncio worker tasks. Workers claim queued jobs from
+    the store (woken on submit, and polling for jobs submitted by other processes). While a job
+    runs, its worker heartbeats and watches for cancellation requests.
+    """
+
+    def __init__(self, store: JobStore, workers: int = 2, retention_s: float = 86400, poll_s: float = 1.0):
+        self.store = store
+        self.workers = max(1, workers)
+        self.retention_s = retention_s
+        self.poll_s = poll_s
+        self.handlers: dict[str, JobHandler] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._wake: asyncio.Event | None = None
+        self._stopping = False
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self.handlers[kind] = handler
+
+    async def submit(self, kind: str, params: dict[str, Any]) -> dict[str, Any]:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = await asyncio.to_thread(self.store.create, kind, params)
+        if self._wake is not None:
+            self._wake.set()
+        return job
+
+    async def get(self, job_id: str) -> dict[str, Any] | None:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def recent(self, kind: str | None = None, status: str | None = None, limit: int = 50) -> list[dict[str, Any]]:
+        return await asyncio.to_thread(self.store.recent, kind, status, limit)
+
+    async def cancel(self, job_id: str) -> dict[str, Any] | None:
+        return await asyncio.to_thread(self.store.request_cancel, job_id)
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._wake = asyncio.Event()
+        await asyncio.to_thread(self.store.fail_stale, time.time() - STALE_AFTER_S)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self) -> None:
+        while True:
+            job = await asyncio.to_thread(self.store.claim_next, list(self.handlers))
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_s)
+                    self._wake.clear()
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(job)
+
+    async def _execute(self, job: dict[str, Any]) -> None:
+        job_id = job["id"]
+        # Handlers report progress synchronously; the latest value is persisted on each poll
+        latest: tuple[int, int] | None = None
+        saved: tuple[int, int] | None = None
+
+        def progress(done: int, total: int) -> None:
+            nonlocal latest
+            latest = (done, total)
+
+        async def persist_progress() -> None:
+            nonlocal saved
+            if latest is not None and latest != saved:
+                saved = latest
+                await asyncio.to_thread(self.store.update_progress, job_id, *saved)
+            else:
+                await asyncio.to_thread(self.store.heartbeat, job_id)
+
+        task = asyncio.create_task(self.handlers[job["kind"]](job_id, job["params"], progress))
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.poll_s)
+                if done:
+                    break
+                await persist_progress()
+                current = await asyncio.to_thread(self.store.get, job_id)
+                if current is None or current["cancel_requested"]:
+                    task.cancel()
+            result = task.result()
+            await persist_progress()
+            await asyncio.to_thread(self.store.finish, job_id, "done", result)
+        except asyncio.CancelledError:
+            task.cancel()
+            if self._stopping:
+                # Shielded: this task is being cancelled, but the job must still be marked
+                await asyncio.shield(asyncio.to_thread(
+                    self.store.finish, job_id, "failed", None, "Interrupted: worker stopped"
+                ))
+                raise
+            await asyncio.to_thread(self.store.finish, job_id, "cancelled")
+        except Exception as e:
+            await asyncio.to_thread(self.store.finish, job_id, "failed", None, str(e))
+
+    async def _maintain(self) -> None:
+        while True:
+            await asyncio.sleep(60)
+            now = time.time()
+            await asyncio.to_thread(self.store.fail_stale, now - STALE_AFTER_S)
+            if self.retention_s:
+                await asyncio.to_thread(self.store.purge, now - self.retention_s)
+
+
+def job_queue_from_env() -> JobQueue:
+    """
+    Queue configured from env. The SQLite store lets any worker process claim a job, which is
+    only safe when every process sees the same cases and images; per-process stores are refused.
+    """
+    from backend.blob_store import blob_store_kind
+
+    shared = os.environ.get("CASE_STORE", "memory").lower() == "sqlite" and blob_store_kind() == "file"
+    kind = os.environ.get("JOB_STORE", "sqlite" if shared else "memory").lower()
+    if kind == "memory":
+        store: JobStore = MemoryJobStore()
+    elif not shared:
+        raise RuntimeError(
+            "JOB_STORE=sqlite shares jobs across processes and requires CASE_STORE=sqlite and BLOB_STORE=file; "
+            "with per-process cases a job claimed by another worker could not find its cases"
+        )
+    else:
+        db_path = os.environ.get("JOB_STORE_PATH")
+        store = SQLiteJobStore(Path(db_path) if db_path else DEFAULT_DB_PATH)
+    return JobQueue(
+        store,
+        workers=int(os.environ.get("JOB_WORKERS", "2")),
+        retention_s=float(os.environ.get("JOB_RETENTION_S", "86400")),
+    )
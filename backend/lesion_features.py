@@ -0,0 +1,107 @@
+"""
+Cheap ABCDE-style image statistics for dermatoscopic images (Pillow + NumPy, no model).
+The image is downscaled, the lesion is segmented with an Otsu threshold on grayscale
+(lesions are darker than the surrounding skin), and asymmetry, border irregularity,
+color variegation and relative size are measured on the mask. Deterministic for a
+given image; used by the local pre-screen (prescreen.py) and the fake LLM backend.
+"""
+import io
+import math
+from typing import Any
+
+import numpy as np
+
+# Longest edge the image is reduced to before measuring (keeps this to a few ms)
+ANALYSIS_SIZE = 128
+# Masks covering less / more of the image than this are treated as failed segmentation
+MIN_LESION_FRACTION = 0.01
+MAX_LESION_FRACTION = 0.9
+# Per-channel standard deviation (0-255) that maps to color = 1.0
+COLOR_STD_SCALE = 60.0
+# Logistic proxy for melanoma risk from the features: intercept, then per-feature weights
+PROXY_INTERCEPT = -3.0
+PROXY_WEIGHTS = {"asymmetry": 2.0, "border": 1.5, "color": 2.5, "diameter": 1.0}
+
+
+def _otsu_threshold(gray: np.ndarray) -> float:
+    """Otsu's threshold for a 0-255 grayscale array."""
+    hist = np.bincount(gray.astype(np.uint8).ravel(), minlength=256).astype("float64")
+    prob = hist / hist.sum()
+    omega = np.cumsum(prob)
+    mu = np.cumsum(prob * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mu[-1] * omega - mu) ** 2 / (omega * (1 - omega))
+    # A single-valued image has no split (all NaN); threshold 0 then yields an empty mask
+    return float(np.argmax(np.nan_to_num(between)))
+
+
+def _lesion_mask(gray: np.ndarray) -> np.ndarray:
+    """Pixels darker than the Otsu threshold; falls back to a centered ellipse if that fails."""
+    mask = gray < _otsu_threshold(gray)
+    fraction = mask.mean()
+    if MIN_LESION_FRACTION <= fraction <= MAX_LESION_FRACTION:
+        return mask
+    h, w = gray.shape
+    yy, xx = np.mgrid[:h, :w]
+    return ((yy - h / 2) / (h / 4)) ** 2 + ((xx - w / 2) / (w / 4)) ** 2 <= 1
+
+
+def _asymmetry(mask: np.ndarray) -> float:
+    """Share of lesion pixels whose mirror image about the centroid (either axis) is not lesion."""
+    ys, xs = np.nonzero(mask)
+    cy, cx = ys.mean(), xs.mean()
+    h, w = mask.shape
+    scores = []
+    for my, mx in ((ys, np.rint(2 * cx - xs)), (np.rint(2 * cy - ys), xs)):
+        my, mx = my.astype(int), mx.astype(int)
+        inside = (my >= 0) & (my < h) & (mx >= 0) & (mx < w)
+        mirrored = np.zeros_like(inside)
+        mirrored[inside] = mask[my[inside], mx[inside]]
+        scores.append(1.0 - mirrored.mean())
+    return float(np.mean(scores))
+
+
+def _border_irregularity(mask: np.ndarray) -> float:
+    """Compactness (perimeter² / 4π·area) above that of a disc, scaled to 0-1."""
+    padded = np.pad(mask, 1)
+    interior = padded[:-2, 1:-1] & padded[2:, 1:-1] & padded[1:-1, :-2] & padded[1:-1, 2:]
+    perimeter = float((mask & ~interior).sum())
+    area = float(mask.sum())
+    # A digitized disc has compactness ~1 by this edge-pixel count; ragged or fragmented masks go far above
+    compactness = perimeter ** 2 / (4 * math.pi * area)
+    return float(np.clip((compactness - 1.0) / 4.0, 0.0, 1.0))
+
+
+def lesion_features(image: Any) -> dict[str, float]:
+    """
+    ABCDE proxies in 0-1 for a PIL image or encoded image bytes:
+    asymmetry, border, color, diameter, plus lesion_fraction and contrast (lesion vs. skin).
+    """
+    import PIL.Image
+
+    if isinstance(image, (bytes, bytearray)):
+        image = PIL.Image.open(io.BytesIO(image))
+    img = image.convert("RGB")
+    img.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+    rgb = np.asarray(img, dtype="float64")
+    gray = rgb.mean(axis=2)
+    mask = _lesion_mask(gray)
+
+    lesion, skin = rgb[mask], rgb[~mask]
+    fraction = float(mask.mean())
+    contrast = (skin.mean() - lesion.mean()) / 255 if len(skin) else 0.0
+    return {
+        "asymmetry": round(_asymmetry(mask), 4),
+        "border": round(_border_irregularity(mask), 4),
+        "color": round(float(np.clip(lesion.std(axis=0).mean() / COLOR_STD_SCALE, 0.0, 1.0)), 4),
+        # Equivalent diameter relative to the shorter image edge
+        "diameter": round(float(np.clip(math.sqrt(mask.sum() * 4 / math.pi) / min(mask.shape), 0.0, 1.0)), 4),
+        "lesion_fraction": round(fraction, 4),
+        "contrast": round(float(np.clip(contrast, 0.0, 1.0)), 4),
+    }
+
+
+def proxy_score(features: dict[str, float]) -> float:
+    """Uncalibrated melanoma risk proxy in 0-1: a logistic of the weighted ABCDE features."""
+    z = PROXY_INTERCEPT + sum(w * features[k] for k, w in PROXY_WEIGHTS.items())
+    return 1 / (1 + math.exp(-z))
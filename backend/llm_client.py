@@ -0,0 +1,751 @@
+"""
+Async LLM client used by every Gemini call in the pipeline.
+Bounds concurrency with a semaphore, applies per-call timeouts, and
+delegates to a pluggable backend (Gemini, or a local fake for offline load tests).
+
+Env:
+  LLM_BACKEND          gemini (default) | fake (offline; image-dependent vision scores)
+  LLM_MAX_CONCURRENCY  max in-flight calls per event loop (default 8)
+  LLM_TIMEOUT_S        override the per-stage default timeouts
+  LLM_FAKE_LATENCY_MS  simulated mean latency for the fake backend (default 0)
+  LLM_FAKE_JITTER_MS   standard deviation of the simulated latency (default 0)
+  LLM_FAKE_ERROR_RATE  share of fake calls failing with a simulated 429/503 (default 0)
+  LLM_FAKE_SEED        seed for the fake backend's latency and errors (default 0)
+  LLM_MODEL            model for every stage (default gemini-1.5-flash)
+  LLM_MODEL_<STAGE>    per-stage model override, e.g. LLM_MODEL_VISION
+  LLM_GENERATION_CONFIG          JSON generation config for every stage, e.g. {"temperature": 0.2}
+  LLM_GENERATION_CONFIG_<STAGE>  per-stage JSON generation config, merged over the above
+  LLM_RATE_PER_S       token-bucket rate for call starts (default 0 = unlimited), LLM_RATE_BURST bucket size
+  LLM_RETRIES          retries for transient errors other than timeouts (default 2), LLM_RETRY_BASE_S / LLM_RETRY_MAX_S backoff
+  LLM_BREAKER_THRESHOLD   consecutive transient failures that open the circuit (default 5, 0 = off)
+  LLM_BREAKER_COOLDOWN_S  seconds the circuit stays open before a trial call (default 30)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator
+
+from backend import metrics
+
+# Optional: google-generativeai
+try:
+    import google.generativeai as genai
+    GEMINI_AVAILABLE = True
+except ImportError:
+    GEMINI_AVAILABLE = False
+
+# Per-stage call timeouts in seconds
+DEFAULT_TIMEOUTS = {
+    "vision": 30.0,
+    "reasoning": 45.0,
+    "vision_reasoning": 60.0,
+    "chat": 30.0,
+    "chat_summary": 20.0,
+    "pipeline_steps": 20.0,
+    "demo_explain": 20.0,
+}
+
+DEFAULT_MODEL_NAME = "gemini-1.5-flash"
+
+
+@dataclass(frozen=True)
+class StageModel:
+    """Model name and generation config (temperature, max_output_tokens, ...) for one stage."""
+
+    name: str
+    generation_config: dict[str, Any] = field(default_factory=dict, hash=False)
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return self.name, json.dumps(self.generation_config, sort_keys=True)
+
+
+class LLMBackend(ABC):
+    """Backend interface: produce the response text for a prompt (and optional images)."""
+
+    name = "base"
+
+    def available(self) -> bool:
+        return True
+
+    def configure(self) -> None:
+        """One-time setup (credentials, transport). Called at startup and before first use."""
+
+    @abstractmethod
+    async def generate(self, stage: str, model: StageModel, parts: list[Any], timeout: float | None = None) -> str:
+        """Response text; timeout (s) is the caller's deadline, for backends that can enforce it themselves."""
+
+    @abstractmethod
+    def stream(
+        self, stage: str, model: StageModel, parts: list[Any], timeout: float | None = None
+    ) -> AsyncIterator[str]:
+        """
+        Async generator yielding response text incrementally (a backend without incremental
+        output may yield the whole generate() response as one chunk).
+        """
+
+
+async def _in_thread(func, *args) -> Any:
+    """Run a blocking call in a worker thread (see _await_thread for cancellation)."""
+    return await _await_thread(asyncio.ensure_future(asyncio.to_thread(func, *args)))
+
+
+async def _await_thread(task: asyncio.Future) -> Any:
+    """
+    Await a worker-thread task. A thread cannot be interrupted, so if the caller is cancelled
+    (e.g. by wait_for's timeout) this still waits for the thread to finish before re-raising:
+    the caller's concurrency slot stays held while the request is really in flight.
+    """
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        while not task.done():
+            try:
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                pass
+        if not task.cancelled():
+            task.exception()  # Mark retrieved; the caller only sees the cancellation
+        raise
+
+
+class GeminiBackend(LLMBackend):
+    """
+    google-generativeai backend. The SDK is configured once per process and model objects are
+    cached per (model, generation config), so calls share the SDK's client and its connections.
+    The SDK call is blocking, so it runs in a worker thread; the caller's deadline is passed
+    to the SDK as its request timeout, since the thread itself cannot be cancelled.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key: str | None = None):
+        self.api_key = api_key if api_key is not None else os.environ.get("GEMINI_API_KEY")
+        self._configured = False
+        self._models: dict[tuple[str, str], Any] = {}
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return GEMINI_AVAILABLE and bool(self.api_key)
+
+    def configure(self) -> None:
+        if self._configured or not self.available():
+            return
+        with self._lock:
+            if not self._configured:
+                genai.configure(api_key=self.api_key)
+                self._configured = True
+
+    def _model(self, model: StageModel) -> Any:
+        """Cached GenerativeModel for a stage model (thread-safe)."""
+        self.configure()
+        cached = self._models.get(model.key)
+        if cached is None:
+            with self._lock:
+                cached = self._models.get(model.key)
+                if cached is None:
+                    cached = self._models[model.key] = genai.GenerativeModel(
+                        model.name, generation_config=model.generation_config or None
+                    )
+        return cached
+
+    @staticmethod
+    def _request_options(timeout: float | None) -> dict[str, Any]:
+        return {"timeout": timeout} if timeout is not None else {}
+
+    async def generate(self, stage: str, model: StageModel, parts: list[Any], timeout: float | None = None) -> str:
+        return await _in_thread(self._generate_sync, model, parts, timeout)
+
+    def _generate_sync(self, model: StageModel, parts: list[Any], timeout: float | None) -> str:
+        content = parts[0] if len(parts) == 1 else parts
+        return self._model(model).generate_content(content, request_options=self._request_options(timeout)).text
+
+    async def stream(
+        self, stage: str, model: StageModel, parts: list[Any], timeout: float | None = None
+    ) -> AsyncIterator[str]:
+        # The SDK's streaming iterator blocks, so drain it in a worker thread into a queue
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        end = object()
+
+        def produce():
+            try:
+                content = parts[0] if len(parts) == 1 else parts
+                response = self._model(model).generate_content(
+                    content, stream=True, request_options=self._request_options(timeout)
+                )
+                for chunk in response:
+                    if stop.is_set():
+                        return
+                    if chunk.text:
+                        loop.call_soon_threadsafe(queue.put_nowait, chunk.text)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, end)
+
+        producer = asyncio.ensure_future(asyncio.to_thread(produce))
+        try:
+            while True:
+                item = await queue.get()
+                if item is end:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # The producer stops at its next chunk (or the SDK timeout); wait for it so the
+            # caller's concurrency slot is not released while the request is still running
+            stop.set()
+            await _await_thread(producer)
+
+
+class FakeBackendError(Exception):
+    """Simulated transient backend failure (429 or 503), classified like the real SDK errors."""
+
+    def __init__(self, code: int):
+        super().__init__(f"{code} simulated {'quota exhausted' if code == 429 else 'service unavailable'}")
+        self.code = code
+
+
+class FakeBackend(LLMBackend):
+    """
+    Offline backend returning parseable responses per stage after a simulated delay.
+    Vision scores are computed from the image itself (lesion_features), so score
+    distributions and benchmark metrics vary realistically across images.
+    Latency jitter and injected errors are drawn from an RNG seeded by (seed, stage,
+    request content, n-th identical request), so a run is reproducible regardless of
+    how concurrent calls interleave, while retries of the same request can succeed.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.seed = seed
+        self._calls: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _rng(self, stage: str, parts: list[Any]) -> random.Random:
+        digest = hashlib.sha256(stage.encode())
+        for part in parts:
+            digest.update(part["data"] if isinstance(part, dict) else str(part).encode())
+        key = digest.hexdigest()
+        with self._lock:
+            if len(self._calls) >= 100_000:
+                self._calls.clear()
+            n = self._calls.get(key, 0)
+            self._calls[key] = n + 1
+        return random.Random(f"{self.seed}:{key}:{n}")
+
+    async def _simulate(self, stage: str, parts: list[Any]) -> float:
+        """Sleep for the time to first byte, maybe raise a simulated error; returns the remaining latency (s)."""
+        rng = self._rng(stage, parts)
+        latency = max(0.0, rng.gauss(self.latency_ms, self.jitter_ms) if self.jitter_ms > 0 else self.latency_ms) / 1000
+        if rng.random() < self.error_rate:
+            # Failures come back faster than full responses
+            await asyncio.sleep(latency / 2)
+            raise FakeBackendError(rng.choice((429, 503)))
+        return latency
+
+    async def generate(self, stage: str, model: StageModel, parts: list[Any], timeout: float | None = None) -> str:
+        latency = await self._simulate(stage, parts)
+        if latency > 0:
+            await asyncio.sleep(latency)
+        if any(isinstance(p, dict) for p in parts):
+            # Image statistics decode the image; keep that off the event loop
+            return await asyncio.to_thread(self.respond, stage, parts)
+        return self.respond(stage, parts)
+
+    async def stream(
+        self, stage: str, model: StageModel, parts: list[Any], timeout: float | None = None
+    ) -> AsyncIterator[str]:
+        latency = await self._simulate(stage, parts)
+        # Word-sized chunks with the simulated latency spread across them
+        chunks = re.findall(r"\S+\s*|\s+", self.respond(stage, parts)) or [""]
+        for chunk in chunks:
+            if latency > 0:
+                await asyncio.sleep(latency / len(chunks))
+            yield chunk
+
+    def respond(self, stage: str, parts: list[Any]) -> str:
+        if stage == "vision_reasoning":
+            vision = json.loads(self.respond("vision", parts))
+            reasoning = json.loads(self.respond("reasoning", parts))
+            # State the fusion the prompt asks for, so the local consistency check passes
+            m = re.search(r"p_health=([0-9.]+).*?λ=([0-9.]+)", str(parts[0]), re.S)
+            p_health, lambda_ = (float(m.group(1)), float(m.group(2))) if m else (0.5, 0.5)
+            p_fused = lambda_ * p_health + (1 - lambda_) * vision["p_vision"]
+            abstain = "conservative mode)" in str(parts[0]) and 0.3 < p_fused < 0.7
+            return json.dumps({**vision, "p_fused": round(p_fused, 6), "abstain": abstain, **reasoning})
+        if stage == "vision":
+            return json.dumps(self._vision_response(parts))
+        if stage == "reasoning":
+            m = re.search(r"Fused score: ([0-9.]+)", str(parts[0]))
+            fused = f" at a fused score of {m.group(1)}" if m else ""
+            return json.dumps({
+                "node_reasoning": {
+                    k: f"Fake backend reasoning for the {k} step."
+                    for k in ("wearables", "vision", "fusion", "guardrails", "decision")
+                },
+                "clinician_report": f"Fake backend clinician report{fused}.",
+                "patient_summary": "Fake backend patient summary.",
+            })
+        if stage == "pipeline_steps":
+            return json.dumps([
+                {"id": k, "label": f"{i}. {k.title()}", "description": f"Fake backend description of {k}."}
+                for i, k in enumerate(("wearables", "vision", "fusion", "guardrails", "decision"), start=1)
+            ])
+        return f"Fake backend response for {stage}."
+
+    @staticmethod
+    def _vision_response(parts: list[Any]) -> dict[str, Any]:
+        """Vision JSON from image statistics (fixed values when the request has no image)."""
+        from backend.lesion_features import lesion_features, proxy_score
+
+        image = next((p["data"] for p in parts if isinstance(p, dict)), None)
+        if image is None:
+            features = {"asymmetry": 0.4, "border": 0.4, "color": 0.4, "diameter": 0.3}
+            p_vision = 0.42
+        else:
+            features = lesion_features(image)
+            p_vision = proxy_score(features)
+        p_benign = 1 - p_vision
+        return {
+            "p_vision": round(p_vision, 4),
+            # More confident away from the decision boundary
+            "confidence": round(0.5 + abs(p_vision - 0.5), 4),
+            "brief_findings": (
+                "Fake backend (image statistics, no model): "
+                + ", ".join(f"{k}={features[k]:.2f}" for k in ("asymmetry", "border", "color", "diameter"))
+            ),
+            "abcde": {**{k: features[k] for k in ("asymmetry", "border", "color", "diameter")}, "evolution": 0.5},
+            "differential_diagnosis": sorted([
+                {"dx": "mel", "name": "Melanoma", "probability": round(p_vision, 4), "rationale": "Fake backend"},
+                {"dx": "nv", "name": "Nevus", "probability": round(p_benign * 0.7, 4), "rationale": "Fake backend"},
+                {"dx": "bkl", "name": "Benign keratosis", "probability": round(p_benign * 0.3, 4), "rationale": "Fake backend"},
+            ], key=lambda d: -d["probability"]),
+        }
+
+
+def _backend_from_env() -> LLMBackend:
+    if os.environ.get("LLM_BACKEND", "gemini").lower() == "fake":
+        return FakeBackend(
+            latency_ms=float(os.environ.get("LLM_FAKE_LATENCY_MS", "0")),
+            jitter_ms=float(os.environ.get("LLM_FAKE_JITTER_MS", "0")),
+            error_rate=float(os.environ.get("LLM_FAKE_ERROR_RATE", "0")),
+            seed=int(os.environ.get("LLM_FAKE_SEED", "0")),
+        )
+    return GeminiBackend()
+
+
+class LLMClient:
+    """
+    Async front door for LLM calls: one semaphore per event loop caps in-flight calls,
+    and each call is cancelled after its stage timeout (raising asyncio.TimeoutError).
+    A slot is only freed once the backend has really stopped, so work a timeout could
+    not interrupt (an SDK call in a worker thread) still counts against the cap.
+    Call starts are paced by a shared token bucket, transient failures other than timeouts
+    are retried with jittered backoff, and a circuit breaker fails fast while the backend
+    keeps failing.
+    """
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        max_concurrency: int = 8,
+        timeouts: dict[str, float] | None = None,
+        models: dict[str, StageModel] | None = None,
+        default_model: StageModel | None = None,
+        bucket: "TokenBucket | None" = None,
+        breaker: "CircuitBreaker | None" = None,
+        retries: int = 2,
+        retry_base_s: float = 0.5,
+        retry_max_s: float = 8.0,
+    ):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.default_model = default_model or StageModel(DEFAULT_MODEL_NAME)
+        self.models = dict(models or {})
+        self.bucket = bucket or TokenBucket()
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = retries
+        self.retry_base_s = retry_base_s
+        self.retry_max_s = retry_max_s
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def available(self) -> bool:
+        return self.backend.available()
+
+    def configure(self) -> None:
+        """Configure the backend up front (e.g. at app startup) instead of on the first call."""
+        self.backend.configure()
+
+    def model_for(self, stage: str) -> StageModel:
+        return self.models.get(stage, self.default_model)
+
+    def model_name(self, stage: str) -> str:
+        """Model used for a stage; part of cache keys for model outputs."""
+        return self.model_for(stage).name
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        sem = self._semaphores.get(loop)
+        if sem is None:
+            sem = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return sem
+
+    async def generate(self, stage: str, parts: list[Any], timeout: float | None = None) -> str:
+        """
+        Return response text from the stage's model. Transient errors other than timeouts are
+        retried with jittered exponential backoff; raises asyncio.TimeoutError, CircuitOpenError
+        or the backend's exception.
+        """
+        timeout = timeout if timeout is not None else self.timeouts.get(stage, 30.0)
+        attempt = 0
+        while True:
+            await self._admit(stage)
+            try:
+                text = await self._generate_once(stage, parts, timeout)
+            except Exception as e:
+                if not await self._retry_after_failure(stage, e, attempt):
+                    raise
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.release()
+                raise
+            self._on_success()
+            return text
+
+    async def _generate_once(self, stage: str, parts: list[Any], timeout: float) -> str:
+        queued = time.perf_counter()
+        async with self._semaphore():
+            start = time.perf_counter()
+            metrics.LLM_QUEUE_SECONDS.observe(start - queued, stage=stage)
+            outcome = "ok"
+            try:
+                return await asyncio.wait_for(self.backend.generate(stage, self.model_for(stage), parts, timeout), timeout)
+            except BaseException as e:
+                outcome = _outcome(e)
+                raise
+            finally:
+                metrics.record(
+                    metrics.LLM_CALL_SECONDS, time.perf_counter() - start, f"llm:{stage}", stage=stage, outcome=outcome
+                )
+
+    async def stream(self, stage: str, parts: list[Any], timeout: float | None = None) -> AsyncIterator[str]:
+        """
+        Yield response text chunks as they arrive. The stage timeout bounds the whole stream;
+        the concurrency slot is held until the stream is exhausted or closed.
+        Transient errors before the first chunk are retried like generate(); later ones are raised.
+        """
+        timeout = timeout if timeout is not None else self.timeouts.get(stage, 30.0)
+        attempt = 0
+        while True:
+            await self._admit(stage)
+            sent = False
+            try:
+                async for chunk in self._stream_once(stage, parts, timeout):
+                    sent = True
+                    yield chunk
+            except Exception as e:
+                if sent or not await self._retry_after_failure(stage, e, attempt):
+                    raise
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.release()
+                raise
+            self._on_success()
+            return
+
+    async def _stream_once(self, stage: str, parts: list[Any], timeout: float) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        queued = time.perf_counter()
+        async with self._semaphore():
+            start = time.perf_counter()
+            metrics.LLM_QUEUE_SECONDS.observe(start - queued, stage=stage)
+            outcome = "ok"
+            chunks = self.backend.stream(stage, self.model_for(stage), parts, timeout)
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(anext(chunks), max(0.0, deadline - loop.time()))
+                    except StopAsyncIteration:
+                        return
+                    yield chunk
+            except BaseException as e:
+                outcome = _outcome(e)
+                raise
+            finally:
+                await chunks.aclose()
+                metrics.record(
+                    metrics.LLM_CALL_SECONDS, time.perf_counter() - start, f"llm:{stage}", stage=stage, outcome=outcome
+                )
+
+    async def _admit(self, stage: str) -> None:
+        """Fail fast while the circuit is open, else wait for a rate-limit token."""
+        self.breaker.allow()
+        try:
+            waited = await self.bucket.acquire()
+        except BaseException:
+            # Cancelled while queued: give up a half-open trial slot that was never used
+            self.breaker.release()
+            raise
+        if waited:
+            metrics.LLM_RATE_WAIT_SECONDS.observe(waited, stage=stage)
+
+    async def _retry_after_failure(self, stage: str, exc: Exception, attempt: int) -> bool:
+        """Record a failed attempt; sleep and return True if it should be retried."""
+        if not is_transient(exc):
+            self.breaker.release()
+            return False
+        self.breaker.record_failure()
+        if is_rate_limited(exc):
+            self.bucket.on_rate_limited()
+        # A timed-out request already used its whole deadline and may still be completing (and
+        # billed) server-side; retrying it would multiply the latency and load of a slow backend
+        if attempt >= self.retries or self.breaker.state == "open" or is_timeout(exc):
+            return False
+        metrics.LLM_RETRIES.inc(stage=stage, reason=_outcome(exc))
+        # Full jitter keeps retries from synchronized clients from arriving together
+        await asyncio.sleep(random.uniform(0, min(self.retry_max_s, self.retry_base_s * 2 ** attempt)))
+        return True
+
+    def _on_success(self) -> None:
+        self.breaker.record_success()
+        self.bucket.on_success()
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the backend while the circuit breaker is open."""
+
+
+class TokenBucket:
+    """
+    Process-wide token bucket for call starts (rate 0 = unlimited). Callers reserve a token under
+    a lock and sleep outside it, so bursts queue instead of failing.
+    Adaptive: the rate halves on rate-limit errors (down to a tenth of the configured rate)
+    and recovers additively on successes.
+    """
+
+    def __init__(self, rate: float = 0.0, burst: float | None = None):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1.0, burst if burst else rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token; returns how long to wait before using it."""
+        if not self.max_rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self) -> float:
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    def on_rate_limited(self) -> None:
+        if self.max_rate:
+            with self._lock:
+                self.rate = max(self.max_rate * 0.1, self.rate * 0.5)
+
+    def on_success(self) -> None:
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive transient failures; while open, calls fail fast with
+    CircuitOpenError. After cooldown_s one trial call is let through (half-open): success
+    closes the circuit, failure reopens it. threshold 0 disables the breaker.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown_s: float = 30.0):
+        self.threshold = threshold
+        self.cooldown_s = cooldown_s
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        if not self.threshold:
+            return
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.cooldown_s:
+                    raise CircuitOpenError("LLM circuit breaker is open after repeated failures")
+                self._set_state("half_open")
+            if self.state == "half_open":
+                if self._trial:
+                    raise CircuitOpenError("LLM circuit breaker is half-open; trial call in flight")
+                self._trial = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial = False
+            if self.state != "closed":
+                self._set_state("closed")
+
+    def record_failure(self) -> None:
+        if not self.threshold:
+            return
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            if self.state == "half_open" or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+                if self.state != "open":
+                    metrics.LLM_CIRCUIT_OPENED.inc()
+                self._set_state("open")
+
+    def release(self) -> None:
+        """End a trial call that failed for a non-transient reason (the backend did respond)."""
+        with self._lock:
+            self._trial = False
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        metrics.LLM_CIRCUIT_STATE.set({"closed": 0, "half_open": 1, "open": 2}[state])
+
+
+_TRANSIENT_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway", "Aborted", "RetryError",
+}
+_RATE_LIMIT_ERRORS = {"ResourceExhausted", "TooManyRequests"}
+_TIMEOUT_ERRORS = {"DeadlineExceeded", "GatewayTimeout"}
+
+
+def _status_code(exc: BaseException) -> int | None:
+    for attr in ("code", "status_code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    return type(exc).__name__ in _RATE_LIMIT_ERRORS or _status_code(exc) == 429
+
+
+def is_timeout(exc: BaseException) -> bool:
+    """Our deadline or the server's (504 / DeadlineExceeded)."""
+    return isinstance(exc, asyncio.TimeoutError) or type(exc).__name__ in _TIMEOUT_ERRORS or _status_code(exc) == 504
+
+
+def is_transient(exc: BaseException) -> bool:
+    """
+    Backend health failures: timeouts, rate limits, 5xx and connection failures (matched by name,
+    SDK-agnostic). All count toward the circuit breaker; all but timeouts are retried.
+    """
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    return type(exc).__name__ in _TRANSIENT_ERRORS or _status_code(exc) in (429, 500, 502, 503, 504)
+
+
+def fallback_reason(exc: BaseException) -> str:
+    """Short reason recorded when a stage falls back after an LLM failure."""
+    if isinstance(exc, CircuitOpenError):
+        return "circuit_open"
+    return _outcome(exc)
+
+
+def _outcome(exc: BaseException) -> str:
+    """Metrics label for a failed call."""
+    if is_timeout(exc):
+        return "timeout"
+    if isinstance(exc, (asyncio.CancelledError, GeneratorExit)):
+        return "cancelled"
+    if is_rate_limited(exc):
+        return "rate_limited"
+    return "error"
+
+
+def _models_from_env() -> tuple[StageModel, dict[str, StageModel]]:
+    """Default model plus per-stage overrides from LLM_MODEL[_<STAGE>] / LLM_GENERATION_CONFIG[_<STAGE>]."""
+    base_name = os.environ.get("LLM_MODEL") or DEFAULT_MODEL_NAME
+    base_config = json.loads(os.environ.get("LLM_GENERATION_CONFIG") or "{}")
+    default = StageModel(base_name, base_config)
+    models = {}
+    for stage in DEFAULT_TIMEOUTS:
+        name = os.environ.get(f"LLM_MODEL_{stage.upper()}")
+        config = os.environ.get(f"LLM_GENERATION_CONFIG_{stage.upper()}")
+        if name or config:
+            models[stage] = StageModel(name or base_name, {**base_config, **json.loads(config or "{}")})
+    return default, models
+
+
+def _client_from_env() -> LLMClient:
+    timeouts = None
+    if os.environ.get("LLM_TIMEOUT_S"):
+        timeouts = {stage: float(os.environ["LLM_TIMEOUT_S"]) for stage in DEFAULT_TIMEOUTS}
+    default_model, models = _models_from_env()
+    return LLMClient(
+        _backend_from_env(),
+        max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", "8")),
+        timeouts=timeouts,
+        models=models,
+        default_model=default_model,
+        bucket=TokenBucket(
+            rate=float(os.environ.get("LLM_RATE_PER_S", "0")),
+            burst=float(os.environ.get("LLM_RATE_BURST", "0")) or None,
+        ),
+        breaker=CircuitBreaker(
+            threshold=int(os.environ.get("LLM_BREAKER_THRESHOLD", "5")),
+            cooldown_s=float(os.environ.get("LLM_BREAKER_COOLDOWN_S", "30")),
+        ),
+        retries=int(os.environ.get("LLM_RETRIES", "2")),
+        retry_base_s=float(os.environ.get("LLM_RETRY_BASE_S", "0.5")),
+        retry_max_s=float(os.environ.get("LLM_RETRY_MAX_S", "8")),
+    )
+
+
+_client: LLMClient | None = None
+_init_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """Process-wide client configured from env on first use; shared by every stage and thread."""
+    global _client
+    if _client is None:
+        with _init_lock:
+            if _client is None:
+                _client = _client_from_env()
+    return _client
+
+
+def set_llm_client(client: LLMClient | None) -> None:
+    """Swap the process-wide client (e.g. a FakeBackend for load tests). None re-reads env."""
+    global _client
+    _client = client
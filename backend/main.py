@@ -1,7 +1,6 @@
 """
 OncoLens Backend - FastAPI demo server.
 """
-import base64
 from pathlib import Path
 
 # Load .env from backend/ or project root
@@ -9,18 +8,30 @@ _env_path = Path(__file__).resolve().parent / ".env"
 if _env_path.exists():
     from dotenv import load_dotenv
     load_dotenv(_env_path)
+import asyncio
 import json
 import os
-import random
+import time
 import uuid
 
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 
 from backend.data_loader import load_ham_index
-from backend.pipeline import run_pipeline, call_gemini_chat, call_gemini_demo_explanation, call_gemini_pipeline_steps
-from backend.benchmark import run_ham_benchmark
+from backend.ham_index import HamIndex
+from backend.ham_images import CACHE_CONTROL, THUMBNAIL_SIZES, is_not_modified, media_type_for, thumbnail_path, validators
+from backend.pipeline import extract_wearable_features, validate_image, run_pipeline, run_pipeline_stream, rescore_pipeline, refresh_reasoning, call_gemini_chat, stream_gemini_chat, record_chat_turn, cached_demo_explanation, cached_pipeline_steps, warm_static_cache
+from backend.batch import BATCH_MAX_BYTES, BatchJob, BatchJobs, group_files, read_archive, result_summary, run_batch
+from backend.benchmark import run_ham_benchmark_async
+from backend.blob_store import get_blob_store
+from backend.case_store import CaseStore, case_store_from_env
+from backend.job_queue import JobQueue, job_queue_from_env
+from backend.llm_client import get_llm_client
+from backend import metrics
+from backend.response_cache import static_cache, warmup_enabled
+from backend.vision_cache import get_vision_cache
 
 app = FastAPI(title="OncoLens Backend", version=os.environ.get("APP_VERSION", "0.1.0"))
 
@@ -32,18 +43,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory case storage
-cases: dict[str, dict] = {}
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (not the raw path) to keep series bounded
+        route = request.scope.get("route")
+        metrics.HTTP_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
+
+# Case storage (memory LRU or SQLite, see CASE_STORE)
+cases: CaseStore = case_store_from_env()
+
+# Background jobs (runs, benchmarks, batches; see JOB_STORE) and this process's live batches
+jobs: JobQueue = job_queue_from_env()
+batch_jobs = BatchJobs()
 
 # HAM index (loaded on startup)
-ham_index: list[dict] = []
+ham_index: HamIndex = HamIndex()
 ham_index_error: str | None = None
 
 
 @app.on_event("startup")
 def startup():
     global ham_index, ham_index_error
-    ham_index, ham_index_error = load_ham_index()
+    entries, ham_index_error = load_ham_index()
+    ham_index = HamIndex(entries)
+    # Configure the LLM SDK once per process; calls then reuse its client and cached models
+    get_llm_client().configure()
+
+
+_warmup_task: asyncio.Task | None = None
+
+
+@app.on_event("startup")
+async def warm_caches():
+    # In the background so startup is not blocked on Gemini
+    global _warmup_task
+    if warmup_enabled():
+        _warmup_task = asyncio.create_task(warm_static_cache())
+
+
+@app.on_event("startup")
+async def start_jobs():
+    await jobs.start()
+
+
+@app.on_event("shutdown")
+async def stop_jobs():
+    await jobs.stop()
 
 
 # --- Models ---
@@ -52,6 +110,10 @@ def startup():
 class RunRequest(BaseModel):
     lambda_: float = 0.5
     conservative: bool = False
+    # Reuse stored wearables/vision results and only recompute fusion, guardrails and next steps
+    incremental: bool = False
+    # One Gemini call for vision + narrative instead of two (default from PIPELINE_FUSED_CALL)
+    fused_call: bool | None = None
 
 
 class ChatRequest(BaseModel):
@@ -62,6 +124,11 @@ class BenchmarkRequest(BaseModel):
     n_sample: int = 30
     lambda_: float = 0.0
     seed: int | None = 42
+    # Vision calls in flight (capped by BENCHMARK_MAX_CONCURRENCY) and optional call-start rate cap
+    concurrency: int = 4
+    max_rps: float | None = None
+    # False: uniform sample over all classes; n_sample <= 0 then means the whole index
+    stratified: bool = True
 
 
 class DemoExplainRequest(BaseModel):
@@ -83,20 +150,11 @@ def get_ham_status():
             "dataset_dir": None,
             "counts_by_class": {},
         }
-    counts = {}
-    for entry in ham_index:
-        dx = entry.get("dx", "unknown")
-        counts[dx] = counts.get(dx, 0) + 1
-    dataset_dir = None
-    if ham_index:
-        first_path = Path(ham_index[0].get("filepath", ""))
-        if first_path.exists():
-            dataset_dir = str(first_path.parent)
     return {
         "index_exists": True,
         "error": None,
-        "dataset_dir": dataset_dir,
-        "counts_by_class": counts,
+        "dataset_dir": ham_index.dataset_dir(),
+        "counts_by_class": dict(ham_index.counts_by_class),
         "total": len(ham_index),
     }
 
@@ -112,35 +170,11 @@ def get_random_ham_image(dx: str | None = None, label: str | None = None, binary
     if ham_index_error:
         raise HTTPException(status_code=503, detail=ham_index_error)
 
-    candidates = ham_index
-    if dx:
-        candidates = [e for e in ham_index if e.get("dx") == dx.lower()]
-    elif label:
-        if label.lower() == "mel":
-            candidates = [e for e in ham_index if e.get("binary_label_mel") == 1]
-        else:
-            candidates = [e for e in ham_index if e.get("binary_label_mel") == 0]
-    elif binary_label is not None:
-        candidates = [e for e in ham_index if e.get("binary_label_mel") == int(binary_label)]
-
-    if not candidates:
+    entry = ham_index.random_entry(dx=dx, label=label, binary_label=binary_label)
+    if entry is None:
         raise HTTPException(status_code=404, detail="No matching images found")
 
-    entry = random.choice(candidates)
-    filepath = Path(entry.get("filepath", ""))
-    if not filepath.exists():
-        raise HTTPException(status_code=500, detail=f"Image file not found: {filepath}")
-
-    with open(filepath, "rb") as f:
-        image_bytes = f.read()
-
-    if filepath.suffix.lower() in [".png"]:
-        mime_type = "image/png"
-    else:
-        mime_type = "image/jpeg"
-
-    image_base64 = base64.b64encode(image_bytes).decode("utf-8")
-
+    image_id = entry.get("image_id")
     return {
         "image_id": entry.get("image_id"),
         "dx": entry.get("dx"),
@@ -148,14 +182,52 @@ def get_random_ham_image(dx: str | None = None, label: str | None = None, binary
         "age": entry.get("age"),
         "sex": entry.get("sex"),
         "localization": entry.get("localization"),
-        "image_base64": image_base64,
-        "mime_type": mime_type,
+        "image_url": f"/dataset/ham/images/{image_id}",
+        "thumbnail_url": f"/dataset/ham/images/{image_id}?size=small",
     }
 
 
+@app.get("/dataset/ham/images/{image_id}")
+def get_ham_image(image_id: str, request: Request, size: str | None = None):
+    """
+    Serve a dataset image file (or a cached thumbnail: size=thumb|small|medium)
+    with ETag / Last-Modified validators and Cache-Control; answers 304 when unchanged.
+    """
+    if ham_index_error:
+        raise HTTPException(status_code=503, detail=ham_index_error)
+    entry = ham_index.get(image_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Dataset image not found: {image_id}")
+    filepath = Path(entry.get("filepath", ""))
+    if not filepath.is_file():
+        raise HTTPException(status_code=404, detail=f"Image file not found: {filepath}")
+    if size is not None:
+        if size not in THUMBNAIL_SIZES:
+            raise HTTPException(status_code=400, detail=f"size must be one of {', '.join(THUMBNAIL_SIZES)}")
+        filepath = thumbnail_path(filepath, image_id, size)
+
+    etag, last_modified = validators(filepath)
+    headers = {"ETag": etag, "Last-Modified": last_modified, "Cache-Control": CACHE_CONTROL}
+    if is_not_modified(
+        request.headers.get("if-none-match"), request.headers.get("if-modified-since"), etag, last_modified
+    ):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(filepath, media_type=media_type_for(filepath), headers=headers)
+
+
 # --- Cases ---
 
 
+def _read_file(path: Path) -> bytes:
+    with metrics.IO_SECONDS.time(op="ham_read"):
+        return path.read_bytes()
+
+
+def _store_blob(blob_store, data: bytes) -> str:
+    with metrics.IO_SECONDS.time(op="blob_put"):
+        return blob_store.put(data)
+
+
 @app.post("/cases")
 async def create_case(
     wearables_csv: UploadFile | None = File(None),
@@ -168,77 +240,185 @@ async def create_case(
     case_data = {
         "id": case_id,
         "wearables_csv": None,
-        "image_data": None,
+        "image_ref": None,
         "dataset_image_id": None,
     }
 
     if wearables_csv and wearables_csv.filename:
-        case_data["wearables_csv"] = (await wearables_csv.read()).decode("utf-8", errors="replace")
+        # Stream the spooled upload through chunked parsing instead of holding the CSV text on the case
+        case_data["wearables_result"] = await asyncio.to_thread(extract_wearable_features, wearables_csv.file)
+        case_data["wearables_filename"] = wearables_csv.filename
 
+    blob_store = get_blob_store()
     if image and image.filename:
-        case_data["image_data"] = base64.b64encode(await image.read()).decode("utf-8")
+        # Raw bytes, content-addressed: identical uploads are stored once
+        image_bytes = await image.read()
+        try:
+            await asyncio.to_thread(validate_image, image_bytes)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        case_data["image_ref"] = await asyncio.to_thread(_store_blob, blob_store, image_bytes)
         case_data["image_mime"] = image.content_type or "image/jpeg"
 
     if dataset_image_id:
         if ham_index_error:
             raise HTTPException(status_code=503, detail=ham_index_error)
-        for entry in ham_index:
-            if entry.get("image_id") == dataset_image_id:
-                filepath = Path(entry.get("filepath", ""))
-                if filepath.exists():
-                    with open(filepath, "rb") as f:
-                        case_data["image_data"] = base64.b64encode(f.read()).decode("utf-8")
-                    case_data["image_mime"] = "image/jpeg" if filepath.suffix.lower() in [".jpg", ".jpeg"] else "image/png"
-                    case_data["dataset_image_id"] = dataset_image_id
-                    case_data["dataset_metadata"] = {
-                        "dx": entry.get("dx"),
-                        "binary_label_mel": entry.get("binary_label_mel"),
-                        "age": entry.get("age"),
-                        "sex": entry.get("sex"),
-                        "localization": entry.get("localization"),
-                    }
-                break
-        if not case_data.get("image_data"):
+        entry = ham_index.get(dataset_image_id)
+        if entry is not None:
+            filepath = Path(entry.get("filepath", ""))
+            if filepath.exists():
+                image_bytes = await asyncio.to_thread(_read_file, filepath)
+                case_data["image_ref"] = await asyncio.to_thread(_store_blob, blob_store, image_bytes)
+                case_data["image_mime"] = "image/jpeg" if filepath.suffix.lower() in [".jpg", ".jpeg"] else "image/png"
+                case_data["dataset_image_id"] = dataset_image_id
+                case_data["dataset_metadata"] = {
+                    "dx": entry.get("dx"),
+                    "binary_label_mel": entry.get("binary_label_mel"),
+                    "age": entry.get("age"),
+                    "sex": entry.get("sex"),
+                    "localization": entry.get("localization"),
+                }
+        if not case_data.get("image_ref"):
             raise HTTPException(status_code=404, detail=f"Dataset image not found: {dataset_image_id}")
 
-    cases[case_id] = case_data
+    await asyncio.to_thread(cases.put, case_data)
     return {"case_id": case_id}
 
 
 @app.get("/cases/{case_id}")
 def get_case(case_id: str):
     """Get case details and run result if available."""
-    if case_id not in cases:
+    case = cases.get(case_id)
+    if case is None:
         raise HTTPException(status_code=404, detail="Case not found")
-    case = cases[case_id].copy()
-    # Don't send full image base64 in response
-    if "image_data" in case:
+    case = case.copy()
+    # Stage results are internal (already flattened into result)
+    case.pop("health_result", None)
+    case.pop("vision_result", None)
+    case.pop("chat_context", None)
+    # Image bytes live in the blob store; only report whether one is attached
+    if case.get("image_ref") or case.get("image_data"):
         case["has_image"] = True
-        case.pop("image_data", None)
-        case.pop("image_mime", None)
+    case.pop("image_ref", None)
+    case.pop("image_data", None)
+    case.pop("image_mime", None)
     return case
 
 
 @app.post("/cases/{case_id}/run")
 async def run_case(case_id: str, body: RunRequest):
-    """Run full pipeline for the case."""
-    if case_id not in cases:
-        raise HTTPException(status_code=404, detail="Case not found")
+    """
+    Run full pipeline for the case.
+    With incremental=true and a previous run, only rescore (narrative kept, flagged reasoning_stale).
+    """
+    case = await _runnable_case(case_id)
+    try:
+        return await _run_and_save(case, body)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/cases/{case_id}/run/jobs", status_code=202)
+async def submit_case_run(case_id: str, body: RunRequest):
+    """Queue a pipeline run as a background job; poll GET /jobs/{job_id} (the result is also saved on the case)."""
+    await _runnable_case(case_id)
+    return await jobs.submit("run", {"case_id": case_id, **body.model_dump()})
+
+
+async def _run_and_save(case: dict, body: RunRequest) -> dict:
+    if body.incremental and case.get("health_result") and case.get("vision_result"):
+        result = rescore_pipeline(case, lambda_=body.lambda_, conservative=body.conservative)
+    else:
+        result = await run_pipeline(
+            case=case,
+            lambda_=body.lambda_,
+            conservative=body.conservative,
+            fused_call=_fused_call(body),
+        )
+    await _save_result(case, result)
+    return result
+
+
+async def _run_job(job_id: str, params: dict, progress) -> dict:
+    params = dict(params)
+    case = await _runnable_case(params.pop("case_id"))
+    progress(0, 1)
+    result = await _run_and_save(case, RunRequest(**params))
+    progress(1, 1)
+    return result
+
 
-    case = cases[case_id]
-    if not case.get("image_data"):
+@app.post("/cases/{case_id}/run/stream")
+async def run_case_stream(case_id: str, body: RunRequest):
+    """
+    Streaming run (Server-Sent Events): "scores" as soon as fusion is done, "token" events
+    with reasoning text as Gemini produces it, then "result" (also saved on the case) or "error".
+    """
+    case = await _runnable_case(case_id)
+
+    async def events():
+        try:
+            if body.incremental and case.get("health_result") and case.get("vision_result"):
+                stream = _single_result(rescore_pipeline(case, lambda_=body.lambda_, conservative=body.conservative))
+            else:
+                stream = run_pipeline_stream(case, body.lambda_, body.conservative, _fused_call(body))
+            async for kind, data in stream:
+                if kind == "result":
+                    await _save_result(case, data)
+                yield _sse(kind, {"text": data} if kind == "token" else data)
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return _sse_response(events())
+
+
+async def _runnable_case(case_id: str) -> dict:
+    case = await asyncio.to_thread(cases.get, case_id)
+    if case is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    if not case.get("image_ref") and not case.get("image_data"):
         raise HTTPException(
             status_code=400,
             detail="Image is required for this demo. Please attach an image or pick a dataset image.",
         )
+    return case
+
+
+def _fused_call(body: RunRequest) -> bool:
+    if body.fused_call is not None:
+        return body.fused_call
+    return os.environ.get("PIPELINE_FUSED_CALL", "").lower() in ("1", "true", "yes")
+
+
+async def _single_result(result: dict):
+    yield "scores", result
+    yield "result", result
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _sse_response(events) -> StreamingResponse:
+    # no-transform / X-Accel-Buffering keep proxies from buffering the stream
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"},
+    )
 
+
+@app.post("/cases/{case_id}/reasoning")
+async def refresh_case_reasoning(case_id: str):
+    """Regenerate the Gemini narrative for the current result (e.g. after incremental re-runs)."""
+    case = await asyncio.to_thread(cases.get, case_id)
+    if case is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    if not case.get("result"):
+        raise HTTPException(status_code=400, detail="Run analysis first.")
     try:
-        result = run_pipeline(
-            case=case,
-            lambda_=body.lambda_,
-            conservative=body.conservative,
-        )
-        case["result"] = result
+        result = await refresh_reasoning(case)
+        await _save_result(case, result)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -247,40 +427,90 @@ async def run_case(case_id: str, body: RunRequest):
 @app.post("/cases/{case_id}/chat")
 async def case_chat(case_id: str, body: ChatRequest):
     """Multi-turn chat: clinician asks follow-up questions about the case."""
-    if case_id not in cases:
+    case = await asyncio.to_thread(cases.get, case_id)
+    if case is None:
         raise HTTPException(status_code=404, detail="Case not found")
-    case = cases[case_id]
     if not case.get("result"):
         raise HTTPException(
             status_code=400,
             detail="Run analysis first before asking questions.",
         )
     try:
-        reply = call_gemini_chat(case, body.message)
-        if "chat_history" not in case:
-            case["chat_history"] = []
-        case["chat_history"].append({"role": "user", "content": body.message})
-        case["chat_history"].append({"role": "assistant", "content": reply})
+        reply = await call_gemini_chat(case, body.message)
+        await _save_chat_turn(case, body.message, reply)
         return {"reply": reply}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/cases/{case_id}/chat/stream")
+async def case_chat_stream(case_id: str, body: ChatRequest):
+    """
+    Streaming chat (Server-Sent Events): "token" events as the reply is generated, then
+    "done" with the full reply, which is saved to chat_history (not saved if the client disconnects).
+    """
+    case = await asyncio.to_thread(cases.get, case_id)
+    if case is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    if not case.get("result"):
+        raise HTTPException(
+            status_code=400,
+            detail="Run analysis first before asking questions.",
+        )
+
+    async def events():
+        chunks = []
+        try:
+            async for chunk in stream_gemini_chat(case, body.message):
+                chunks.append(chunk)
+                yield _sse("token", {"text": chunk})
+            reply = "".join(chunks).strip()
+            await _save_chat_turn(case, body.message, reply)
+            yield _sse("done", {"reply": reply})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return _sse_response(events())
+
+
+async def _save_chat_turn(case: dict, message: str, reply: str) -> None:
+    # Archive before saving the trimmed case so no message is ever only in memory
+    archived = await record_chat_turn(case, message, reply)
+    if archived:
+        await asyncio.to_thread(cases.archive_chat, case["id"], archived)
+    await asyncio.to_thread(cases.put, case)
+
+
+@app.get("/cases/{case_id}/chat/archive")
+def get_chat_archive(case_id: str):
+    """Chat messages trimmed from chat_history (oldest first); the full log is archive + chat_history."""
+    if cases.get(case_id) is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return {"messages": cases.chat_archive(case_id)}
+
+
+async def _save_result(case: dict, result: dict) -> None:
+    # result_version invalidates derived per-result caches (e.g. the chat case summary)
+    case["result"] = result
+    case["result_version"] = case.get("result_version", 0) + 1
+    await asyncio.to_thread(cases.put, case)
+
+
 @app.get("/pipeline/steps")
-def get_pipeline_steps():
+async def get_pipeline_steps():
     """Return pipeline step descriptions from Gemini (id, label, description)."""
     try:
-        steps = call_gemini_pipeline_steps()
+        steps = await cached_pipeline_steps()
         return {"steps": steps}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/demo/explain")
-def demo_explain(body: DemoExplainRequest):
+async def demo_explain(body: DemoExplainRequest):
     """Generate Gemini explanation of what's happening in the mock demo."""
     try:
-        explanation = call_gemini_demo_explanation(
+        explanation = await cached_demo_explanation(
             patient_name=body.patient_name,
             image_label=body.image_label,
             dx=body.dx,
@@ -290,23 +520,264 @@ def demo_explain(body: DemoExplainRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# --- Batches ---
+
+
+@app.post("/batches")
+async def create_batch(
+    archive: UploadFile | None = File(None),
+    files: list[UploadFile] | None = File(None),
+    lambda_: float = Form(0.5),
+    conservative: bool = Form(False),
+    fused_call: bool | None = Form(None),
+):
+    """
+    Create and run many cases at once: a zip archive (one folder per patient, or files named
+    by patient) or a multipart list of images and wearables CSVs named by patient
+    (patient01.jpg + patient01.csv). Returns a job to poll (GET /batches/{job_id}) or
+    stream (GET /batches/{job_id}/stream). Cases that fail ingestion are listed in ingest_errors.
+    """
+    try:
+        if archive is not None and archive.filename:
+            uploaded = await asyncio.to_thread(read_archive, await archive.read())
+            items, errors = group_files(uploaded, in_archive=True)
+        elif files:
+            uploaded, total = [], 0
+            for f in files:
+                data = await f.read()
+                total += len(data)
+                if total > BATCH_MAX_BYTES:
+                    raise ValueError(f"Upload exceeds {BATCH_MAX_BYTES // (1024 * 1024)} MB")
+                uploaded.append((f.filename or "", data))
+            items, errors = group_files(uploaded)
+        else:
+            raise ValueError("Provide an archive or files")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not items:
+        raise HTTPException(status_code=400, detail={"message": "No cases found in upload", "errors": errors})
+
+    ingested = await asyncio.gather(
+        *(asyncio.to_thread(_ingest_batch_case, item) for item in items.values()), return_exceptions=True
+    )
+    case_ids = {}
+    for key, outcome in zip(items, ingested):
+        if isinstance(outcome, Exception):
+            errors.append({"key": key, "error": str(outcome)})
+        else:
+            case_ids[key] = outcome
+    if not case_ids:
+        raise HTTPException(status_code=400, detail={"message": "No valid cases in upload", "errors": errors})
+
+    run = {"lambda_": lambda_, "conservative": conservative, "fused_call": _fused_call(RunRequest(fused_call=fused_call))}
+    queued = await jobs.submit("batch", {"case_ids": case_ids, "run": run, "ingest_errors": errors})
+    batch_jobs.add(BatchJob(case_ids, run, errors, job_id=queued["id"]))
+    return {"job_id": queued["id"], "status": queued["status"], "case_ids": case_ids, "ingest_errors": errors}
+
+
+async def _batch_job(job_id: str, params: dict, progress) -> dict:
+    # The live BatchJob exists if this process created the batch; rebuild it otherwise
+    job = batch_jobs.get(job_id)
+    if job is None:
+        job = BatchJob(params["case_ids"], params["run"], params["ingest_errors"], job_id=job_id)
+        batch_jobs.add(job)
+    run = RunRequest(**params["run"])
+
+    async def run_one(case_id: str) -> dict:
+        case = await asyncio.to_thread(cases.get, case_id)
+        if case is None:
+            raise ValueError("Case not found")
+        return await _run_and_save(case, run)
+
+    progress(0, len(job.case_ids))
+    await run_batch(job, run_one, on_progress=progress)
+    return job.snapshot()
+
+
+def _ingest_batch_case(item: dict) -> str:
+    """Validate, store and save one batch case (runs in a worker thread). Returns the case id."""
+    image_name, image_bytes = item["image"]
+    validate_image(image_bytes)
+    case_data = {
+        "id": str(uuid.uuid4()),
+        "wearables_csv": None,
+        "image_ref": _store_blob(get_blob_store(), image_bytes),
+        "image_mime": "image/png" if image_name.lower().endswith(".png") else "image/jpeg",
+        "dataset_image_id": None,
+        "batch_filename": image_name,
+    }
+    if item["wearables"] is not None:
+        csv_name, csv_bytes = item["wearables"]
+        case_data["wearables_result"] = extract_wearable_features(csv_bytes)
+        case_data["wearables_filename"] = csv_name
+    cases.put(case_data)
+    return case_data["id"]
+
+
+@app.get("/batches/{job_id}")
+async def get_batch(job_id: str):
+    """Batch job status, counts and per-case results (summaries; full results are on each case)."""
+    live = batch_jobs.get(job_id)
+    if live is not None and live.status != "queued":
+        return live.snapshot()
+    return await _stored_batch(job_id)
+
+
+async def _batch_record(job_id: str) -> dict:
+    record = await jobs.get(job_id)
+    if record is None or record["kind"] != "batch":
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return record
+
+
+async def _stored_batch(job_id: str) -> dict:
+    """Batch snapshot from the job store (batches run by another process, or before a restart)."""
+    record = await _batch_record(job_id)
+    if record["result"] is not None:
+        return record["result"]
+    params = record["params"]
+    # Unfinished: per-case results are read back from the saved cases; cases counted
+    # as done by the job's progress but without a result failed
+    results = await asyncio.to_thread(_saved_batch_results, params["case_ids"])
+    return {
+        "job_id": job_id,
+        "status": record["status"],
+        "params": params["run"],
+        "total": len(params["case_ids"]),
+        "completed": len(results),
+        "failed": max(0, record["progress"]["done"] - len(results)),
+        "created_at": record["created_at"],
+        "finished_at": record["finished_at"],
+        "ingest_errors": params["ingest_errors"],
+        "results": results,
+        "error": record["error"],
+    }
+
+
+def _saved_batch_results(case_ids: dict[str, str]) -> list[dict]:
+    results = []
+    for key, case_id in case_ids.items():
+        case = cases.get(case_id)
+        if case is not None and case.get("result"):
+            results.append(result_summary(key, case_id, case["result"]))
+    return results
+
+
+@app.get("/batches/{job_id}/stream")
+async def stream_batch(job_id: str):
+    """Server-Sent Events: a "case" event per finished case (including ones already done), then "done"."""
+    await _batch_record(job_id)
+
+    async def events():
+        # Follow the live batch once this process runs it; otherwise wait for the stored result
+        while True:
+            live = batch_jobs.get(job_id)
+            if live is not None and live.status != "queued":
+                async for kind, data in live.follow():
+                    yield _sse(kind, data)
+                return
+            record = await _batch_record(job_id)
+            if record["status"] in ("done", "failed", "cancelled"):
+                snapshot = await _stored_batch(job_id)
+                for item in snapshot["results"]:
+                    yield _sse("case", item)
+                yield _sse("done", {k: v for k, v in snapshot.items() if k != "results"})
+                return
+            await asyncio.sleep(1.0)
+
+    return _sse_response(events())
+
+
 @app.post("/benchmark/ham/run")
-def run_benchmark(body: BenchmarkRequest):
+async def run_benchmark(body: BenchmarkRequest):
     """
     Run HAM10000 benchmark: evaluate vision pipeline on stratified sample.
     Returns accuracy, AUC, sensitivity, specificity.
+    Sample size is not capped; throughput is bounded by concurrency / max_rps instead.
     """
     try:
-        result = run_ham_benchmark(
-            n_sample=min(max(body.n_sample, 4), 100),
-            lambda_=body.lambda_,
-            seed=body.seed,
-        )
-        return result
+        return await _benchmark(body)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/benchmark/ham/jobs", status_code=202)
+async def submit_benchmark(body: BenchmarkRequest):
+    """Queue a benchmark as a background job; poll GET /jobs/{job_id} for progress and the result."""
+    return await jobs.submit("benchmark", body.model_dump())
+
+
+async def _benchmark(body: BenchmarkRequest, on_progress=None) -> dict:
+    max_concurrency = int(os.environ.get("BENCHMARK_MAX_CONCURRENCY", "16"))
+    return await run_ham_benchmark_async(
+        n_sample=max(body.n_sample, 4) if body.stratified else body.n_sample,
+        lambda_=body.lambda_,
+        seed=body.seed,
+        index=None if ham_index_error else ham_index,
+        concurrency=min(max(body.concurrency, 1), max_concurrency),
+        max_rps=body.max_rps,
+        stratified=body.stratified,
+        on_progress=on_progress,
+    )
+
+
+async def _benchmark_job(job_id: str, params: dict, progress) -> dict:
+    return await _benchmark(BenchmarkRequest(**params), on_progress=progress)
+
+
+# --- Jobs ---
+
+
+@app.get("/jobs")
+async def list_jobs(kind: str | None = None, status: str | None = None, limit: int = 50):
+    """Recent jobs (without results), newest first."""
+    return {"jobs": await jobs.recent(kind=kind, status=status, limit=min(max(limit, 1), 500))}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status, progress ({done, total}), and result or error once finished."""
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued job, or ask the worker running it to stop."""
+    job = await jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+jobs.register("run", _run_job)
+jobs.register("benchmark", _benchmark_job)
+jobs.register("batch", _batch_job)
+
+
+@app.get("/cache/vision/stats")
+def vision_cache_stats():
+    """Vision result cache hit/miss counters and tier sizes."""
+    cache = get_vision_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.snapshot()}
+
+
+@app.get("/cache/static/stats")
+def static_cache_stats():
+    """Pipeline steps / demo explanation cache counters."""
+    return static_cache.snapshot()
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text format: stage / LLM call / I/O / HTTP latency histograms, fallback, cache and error counters."""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/health")
 def health():
     return {"status": "ok", "version": os.environ.get("APP_VERSION", "0.1.0")}
@@ -0,0 +1,222 @@
+"""
+Lightweight in-process metrics: counters and latency histograms rendered in the
+Prometheus text format on /metrics, plus optional per-request timing spans
+(collect_spans) attached to pipeline results.
+Metrics are per process; with several workers, scrape each one.
+"""
+import contextvars
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+# Seconds; covers local stages (ms) through slow Gemini calls (tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.label_names)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    @abstractmethod
+    def _samples(self) -> list[str]:
+        """Sample lines in the Prometheus text format."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._value = 0.0
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def _samples(self) -> list[str]:
+        return [f"{self.name} {_fmt(self._value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, span: str | None = None, **labels: Any) -> Iterator[None]:
+        """Observe the wall time of the block (also recorded as a request span if named)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record(self, time.perf_counter() - start, span, **labels)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, (list(c), t[0])) for k, (c, t) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                le = f'le="{bound if bound == "+Inf" else _fmt(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {counts[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "oncolens_stage_duration_seconds", "Pipeline stage wall time.", ("stage",)
+))
+LLM_CALL_SECONDS = REGISTRY.register(Histogram(
+    "oncolens_llm_call_duration_seconds", "LLM call time (excluding queueing) by outcome.", ("stage", "outcome")
+))
+LLM_QUEUE_SECONDS = REGISTRY.register(Histogram(
+    "oncolens_llm_queue_wait_seconds", "Time waiting for an LLM concurrency slot.", ("stage",)
+))
+LLM_RATE_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "oncolens_llm_rate_limit_wait_seconds", "Time queued by the LLM token-bucket rate limiter.", ("stage",)
+))
+LLM_RETRIES = REGISTRY.register(Counter(
+    "oncolens_llm_retries_total", "LLM call retries after transient errors.", ("stage", "reason")
+))
+LLM_CIRCUIT_STATE = REGISTRY.register(Gauge(
+    "oncolens_llm_circuit_state", "LLM circuit breaker state (0 closed, 1 half-open, 2 open)."
+))
+LLM_CIRCUIT_OPENED = REGISTRY.register(Counter(
+    "oncolens_llm_circuit_opened_total", "Times the LLM circuit breaker opened."
+))
+IO_SECONDS = REGISTRY.register(Histogram(
+    "oncolens_io_duration_seconds", "File and blob store I/O time.", ("op",)
+))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    "oncolens_http_request_duration_seconds", "HTTP request time by route.", ("method", "route", "status")
+))
+FALLBACKS = REGISTRY.register(Counter(
+    "oncolens_fallbacks_total", "Results served from a local fallback instead of the model.", ("kind", "reason")
+))
+PRESCREEN_DECISIONS = REGISTRY.register(Counter(
+    "oncolens_prescreen_decisions_total", "Local pre-screen outcomes (benign / suspicious resolved locally, or escalated).", ("decision",)
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "oncolens_cache_requests_total", "Cache lookups by outcome.", ("cache", "result")
+))
+ERRORS = REGISTRY.register(Counter(
+    "oncolens_errors_total", "Exceptions by component and type.", ("component", "error")
+))
+
+
+# --- Per-request spans ---
+
+_spans: contextvars.ContextVar[list[dict[str, Any]] | None] = contextvars.ContextVar("metrics_spans", default=None)
+
+
+@contextmanager
+def collect_spans() -> Iterator[list[dict[str, Any]]]:
+    """Collect named spans recorded in this context (including tasks and to_thread calls started from it)."""
+    spans: list[dict[str, Any]] = []
+    token = _spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _spans.reset(token)
+
+
+def record(histogram: Histogram, seconds: float, span: str | None = None, **labels: Any) -> None:
+    """Observe seconds on histogram, and append a span to the current request's spans if named."""
+    histogram.observe(seconds, **labels)
+    spans = _spans.get()
+    if span is not None and spans is not None:
+        spans.append({"name": span, "duration_ms": round(seconds * 1000, 3), **labels})
+
+
+def fallback(kind: str, reason: str) -> None:
+    FALLBACKS.inc(kind=kind, reason=reason)
+
+
+def error(component: str, exc: BaseException) -> None:
+    ERRORS.inc(component=component, error=type(exc).__name__)
@@ -2,21 +2,43 @@
 OncoLens pipeline: wearables -> health score, vision -> vision score,
 fusion -> guardrails -> decision, with Gemini reasoning.
 """
+import asyncio
 import base64
+import copy
+import csv
 import io
 import json
 import os
 import re
-from typing import Any
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import IO, Any, AsyncIterator, Callable
 
 import pandas as pd
 
-# Optional: google-generativeai
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+from backend.blob_store import blob_ref, get_blob_store
+from backend.chat_context import (
+    add_turn,
+    case_summary,
+    fold_history,
+    format_messages,
+    history_context,
+    local_summary,
+    trim_history,
+)
+from backend.llm_client import fallback_reason, get_llm_client
+from backend import metrics
+from backend.prescreen import get_prescreen
+from backend.response_cache import static_cache
+from backend.stage_dag import Stage, run_stages
+from backend.wearable_features import WindowedFeatureEngine, resolve_columns
+from backend.vision_cache import get_vision_cache, vision_cache_key
+
+
+# Bump when the vision prompt or result parsing changes so cached results are not reused
+VISION_PROMPT_VERSION = "v1"
 
 
 def round_float(x: float) -> float:
@@ -24,93 +46,337 @@ def round_float(x: float) -> float:
     return round(float(x), 6)
 
 
-def extract_wearable_features(csv_content: str | None) -> dict[str, Any]:
+# Rows per chunk when streaming wearables CSVs; memory stays flat regardless of file size
+WEARABLES_CHUNK_ROWS = 200_000
+
+
+def _wearables_default(reason: str) -> dict[str, Any]:
+    return {
+        "p_health": 0.5,
+        "var_health": 0.05,
+        "ci_health": [0.2, 0.8],
+        "reason": reason,
+        "features": {},
+    }
+
+
+class RunningStats:
+    """Streaming count / mean / variance (Chan et al. pairwise merge of per-chunk moments)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values: pd.Series) -> None:
+        values = values.dropna()
+        n = len(values)
+        if n == 0:
+            return
+        chunk_mean = float(values.mean())
+        chunk_m2 = float(((values - chunk_mean) ** 2).sum())
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += chunk_m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": round_float(self.mean) if self.count else None,
+            "std": round_float(self.variance ** 0.5) if self.count else None,
+        }
+
+
+def _open_wearables_source(source: str | bytes | IO | None) -> IO[bytes] | None:
+    """Normalize str / bytes / text or binary file handle into a seekable binary handle."""
+    if source is None:
+        return None
+    if isinstance(source, str):
+        return io.BytesIO(source.encode("utf-8"))
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    if isinstance(source, io.TextIOBase):
+        source = getattr(source, "buffer", None) or io.BytesIO(source.read().encode("utf-8"))
+    if not source.seekable():
+        spooled = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        shutil.copyfileobj(source, spooled)
+        source = spooled
+    source.seek(0)
+    return source
+
+
+def extract_wearable_features(source: str | bytes | IO | None) -> dict[str, Any]:
     """
     Parse wearables CSV and compute features.
+    source: CSV text, raw bytes, or a (preferably seekable) file handle such as an upload's
+    SpooledTemporaryFile. Only the timestamp / heart-rate / SpO2 / activity columns are parsed,
+    in chunks of WEARABLES_CHUNK_ROWS, with running mean/variance so memory does not grow with
+    file size. Chunks are also folded into time bins for windowed features (trends, rolling
+    variability, desaturation episodes, activity-stratified HR); var_health / ci_health come
+    from the spread of per-window health scores.
     Returns p_health, var_health, ci_health, reason.
     """
-    if not csv_content or not csv_content.strip():
-        return {
-            "p_health": 0.5,
-            "var_health": 0.05,
-            "ci_health": [0.2, 0.8],
-            "reason": "wearables_missing",
-            "features": {},
-        }
-
+    handle = _open_wearables_source(source)
+    if handle is None:
+        return _wearables_default("wearables_missing")
+
+    header_line = handle.readline().decode("utf-8-sig", errors="replace")
+    if not header_line.strip():
+        # Blank first line: treat as missing if the whole upload is whitespace
+        if not handle.read(4096).strip():
+            return _wearables_default("wearables_missing")
+        return _wearables_default("csv_parse_error")
+    try:
+        columns = next(csv.reader([header_line]))
+    except (csv.Error, StopIteration):
+        return _wearables_default("csv_parse_error")
+    columns = [c.strip() for c in columns]
+    roles = resolve_columns(columns)
+    hr_col, spo2_col = roles["hr"], roles["spo2"]
+    engine = WindowedFeatureEngine(roles)
+    usecols = engine.usecols()
+
+    hr_stats, spo2_stats = RunningStats(), RunningStats()
+    rows = 0
+    handle.seek(0)
     try:
-        df = pd.read_csv(io.StringIO(csv_content))
+        reader = pd.read_csv(
+            handle,
+            usecols=usecols or [0],
+            dtype=engine.dtypes(),
+            encoding="utf-8-sig",
+            encoding_errors="replace",
+            skipinitialspace=True,
+            chunksize=WEARABLES_CHUNK_ROWS,
+            # Chunks are already bounded; one tokenizer pass per chunk is faster than low_memory's sub-chunks
+            low_memory=False,
+        )
+        for chunk in reader:
+            rows += len(chunk)
+            if hr_col is not None:
+                hr_stats.update(chunk[hr_col])
+            if spo2_col is not None:
+                spo2_stats.update(chunk[spo2_col])
+            engine.add_chunk(chunk)
     except Exception:
-        return {
-            "p_health": 0.5,
-            "var_health": 0.05,
-            "ci_health": [0.2, 0.8],
-            "reason": "csv_parse_error",
-            "features": {},
-        }
+        return _wearables_default("csv_parse_error")
 
     # Demo: simple heuristic from CSV columns
     # Look for heart rate, SpO2, activity-like columns
     p = 0.5
     var = 0.05
-    cols = [c.lower() for c in df.columns]
 
-    if "heart_rate" in cols or "hr" in cols or "bpm" in str(cols):
-        col = next((c for c in df.columns if "heart" in c.lower() or c.lower() == "hr" or "bpm" in c.lower()), None)
-        if col is not None:
-            mean_val = df[col].mean()
+    if hr_col is not None:
+        if hr_stats.count:
+            mean_val = hr_stats.mean
             if mean_val > 100:
                 p = min(0.75, 0.5 + (mean_val - 100) / 200)
             elif mean_val < 60:
                 p = max(0.25, 0.5 - (60 - mean_val) / 200)
-            var = 0.03
+        var = 0.03
 
-    if "spo2" in cols or "oxygen" in cols:
-        col = next((c for c in df.columns if "spo2" in c.lower() or "oxygen" in c.lower()), None)
-        if col is not None:
-            mean_val = df[col].mean()
+    if spo2_col is not None:
+        if spo2_stats.count:
+            mean_val = spo2_stats.mean
             if mean_val < 95:
                 p = min(0.8, 0.5 + (95 - mean_val) / 50)
-            var = min(var, 0.04)
+        var = min(var, 0.04)
 
     p = max(0.0, min(1.0, p))
-    ci_low = max(0, p - 0.15)
-    ci_high = min(1, p + 0.15)
+    ci_half = 0.15
+
+    features: dict[str, Any] = {"rows": rows, "columns": columns}
+    if hr_col is not None:
+        features["heart_rate"] = {"column": hr_col, **hr_stats.summary()}
+    if spo2_col is not None:
+        features["spo2"] = {"column": spo2_col, **spo2_stats.summary()}
+
+    windowed = engine.finalize()
+    if windowed:
+        features["windowed"] = {
+            k: round_float(v) if isinstance(v, float) else v for k, v in windowed.items()
+        }
+        # Between-window spread plus the heuristic prior shrunk by the number of windows
+        var = min(0.05, max(0.001, windowed["window_p_std"] ** 2 + var / max(1, windowed["n_windows"])))
+        ci_half = 1.96 * var ** 0.5
+    ci_low = max(0, p - ci_half)
+    ci_high = min(1, p + ci_half)
 
     return {
         "p_health": round_float(p),
         "var_health": round_float(var),
         "ci_health": [round_float(ci_low), round_float(ci_high)],
         "reason": "wearables_analyzed",
-        "features": {"rows": len(df), "columns": list(df.columns)},
+        "features": features,
     }
 
 
-def run_vision_model(image_base64: str, patient_context: dict | None = None) -> dict[str, Any]:
+# Images sent to Gemini are normalized by prepare_image: validated, EXIF-oriented,
+# center-cropped to at most IMAGE_MAX_ASPECT and downscaled to IMAGE_MAX_EDGE, then
+# re-encoded. HAM10000 images (600x450 JPEG) already fit and pass through unchanged.
+IMAGE_MAX_EDGE = int(os.environ.get("VISION_IMAGE_MAX_EDGE", "1024"))
+IMAGE_FORMAT = os.environ.get("VISION_IMAGE_FORMAT", "JPEG").upper()  # JPEG | WEBP
+IMAGE_QUALITY = int(os.environ.get("VISION_IMAGE_QUALITY", "85"))
+IMAGE_MAX_ASPECT = 4 / 3
+IMAGE_MIN_EDGE = 32
+IMAGE_MAX_PIXELS = 64_000_000
+IMAGE_FORMATS = ("JPEG", "MPO", "PNG", "WEBP", "BMP", "TIFF")
+# Identifies the preprocessing settings; part of the vision cache key
+IMAGE_VARIANT = f"{IMAGE_FORMAT.lower()}-{IMAGE_MAX_EDGE}-q{IMAGE_QUALITY}"
+# Prepared variants kept in-process, keyed by source hash
+IMAGE_PREP_CACHE_ITEMS = 256
+
+
+class CaseImage:
     """
-    Use Gemini vision to analyze skin lesion image. Returns p_vision, ci_vision.
-    Falls back to mock if Gemini unavailable.
+    Raw image bytes plus their content hash, decoded to a PIL image at most once.
+    Shared by the vision and reasoning stages of a run.
+    """
+
+    def __init__(self, data: bytes, sha256: str | None = None, mime_type: str | None = None):
+        self.data = data
+        self.sha256 = sha256 or blob_ref(data)
+        self.mime_type = mime_type
+        self._pil = None
+
+    @classmethod
+    def coerce(cls, image: "CaseImage | bytes | str") -> "CaseImage":
+        """Accept a CaseImage, raw bytes, or (legacy) a base64 string."""
+        if isinstance(image, CaseImage):
+            return image
+        if isinstance(image, str):
+            image = base64.b64decode(image)
+        return cls(bytes(image))
+
+    def pil(self):
+        """Decoded PIL image (decoded fully on first call, then reused)."""
+        if self._pil is None:
+            import PIL.Image
+            img = PIL.Image.open(io.BytesIO(self.data))
+            img.load()
+            self._pil = img
+        return self._pil
+
+    def part(self) -> dict[str, Any]:
+        """Inline blob part for the Gemini request (sends these exact bytes, no re-encode)."""
+        return {"mime_type": self.mime_type or "image/jpeg", "data": self.data}
+
+
+_prepared_images: OrderedDict[str, CaseImage] = OrderedDict()
+_prepared_lock = threading.Lock()
+
+
+def validate_image(data: bytes):
     """
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key or not GEMINI_AVAILABLE:
-        return _mock_vision_result()
+    Open and fully decode image bytes, rejecting unsupported formats, corrupt data and
+    implausible sizes. Returns the PIL image; raises ValueError with a user-facing message.
+    """
+    import PIL
+    import PIL.Image
 
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-1.5-flash")
+        img = PIL.Image.open(io.BytesIO(data))
+        if img.format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format: {img.format or 'unknown'}")
+        width, height = img.size
+        if min(width, height) < IMAGE_MIN_EDGE:
+            raise ValueError(f"Image too small ({width}x{height}); minimum edge is {IMAGE_MIN_EDGE}px")
+        if width * height > IMAGE_MAX_PIXELS:
+            raise ValueError(f"Image too large ({width}x{height})")
+        img.load()
+    except ValueError:
+        raise
+    except PIL.UnidentifiedImageError:
+        raise ValueError("Unrecognized image file")
+    except Exception as e:
+        raise ValueError(f"Could not read image: {e}") from e
+    return img
 
-        context_str = ""
-        if patient_context:
-            parts = [f"{k}={v}" for k, v in patient_context.items() if v]
-            if parts:
-                context_str = f"\nPatient context (if from dataset): {', '.join(parts)}"
 
-        prompt = f"""You are a dermatology AI assistant. Analyze this dermatoscopic skin lesion image.
+def _center_crop(img, max_aspect: float):
+    """Trim the longer side so width/height stays within max_aspect (either orientation)."""
+    width, height = img.size
+    if width > height * max_aspect:
+        new_width = round(height * max_aspect)
+        left = (width - new_width) // 2
+        return img.crop((left, 0, left + new_width, height))
+    if height > width * max_aspect:
+        new_height = round(width * max_aspect)
+        top = (height - new_height) // 2
+        return img.crop((0, top, width, top + new_height))
+    return img
 
-Output a melanoma risk score from 0.0 (benign) to 1.0 (high suspicion of melanoma).
-{context_str}
 
-1. ABCDE CRITERIA - Score each 0.0 (reassuring) to 1.0 (concerning):
+def prepare_image(source: CaseImage) -> CaseImage:
+    """
+    Normalized variant of source for model input (see IMAGE_* settings).
+    Images that are already a JPEG within bounds and upright are returned as-is.
+    Results are cached by source hash, so repeated runs on a case skip the work.
+    """
+    key = f"{source.sha256}:{IMAGE_VARIANT}"
+    with _prepared_lock:
+        cached = _prepared_images.get(key)
+        if cached is not None:
+            _prepared_images.move_to_end(key)
+            metrics.CACHE_REQUESTS.inc(cache="prepared_image", result="hit")
+            return cached
+    metrics.CACHE_REQUESTS.inc(cache="prepared_image", result="miss")
+
+    from PIL import Image, ImageOps
+
+    img = validate_image(source.data)
+    # EXIF Orientation tag; 1 (or absent) means already upright
+    oriented = img if img.getexif().get(0x0112, 1) == 1 else ImageOps.exif_transpose(img)
+    cropped = _center_crop(oriented, IMAGE_MAX_ASPECT)
+    if (
+        img.format == "JPEG"
+        and IMAGE_FORMAT == "JPEG"
+        and cropped is img
+        and max(img.size) <= IMAGE_MAX_EDGE
+        and img.mode in ("RGB", "L")
+    ):
+        prepared = CaseImage(source.data, sha256=source.sha256, mime_type="image/jpeg")
+        prepared._pil = img
+    else:
+        out = cropped if cropped.mode == "RGB" else cropped.convert("RGB")
+        if max(out.size) > IMAGE_MAX_EDGE:
+            out.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE), Image.Resampling.LANCZOS)
+        buf = io.BytesIO()
+        if IMAGE_FORMAT == "WEBP":
+            out.save(buf, format="WEBP", quality=IMAGE_QUALITY, method=4)
+        else:
+            out.save(buf, format="JPEG", quality=IMAGE_QUALITY, optimize=True)
+        prepared = CaseImage(buf.getvalue(), mime_type=f"image/{IMAGE_FORMAT.lower()}")
+        prepared._pil = out
+
+    with _prepared_lock:
+        _prepared_images[key] = prepared
+        _prepared_images.move_to_end(key)
+        while len(_prepared_images) > IMAGE_PREP_CACHE_ITEMS:
+            _prepared_images.popitem(last=False)
+    return prepared
+
+
+def load_case_image(case: dict) -> CaseImage | None:
+    """Resolve the case's image from the blob store (image_ref) or legacy inline base64."""
+    if case.get("image_ref"):
+        with metrics.IO_SECONDS.time("blob_get", op="blob_get"):
+            data = get_blob_store().get(case["image_ref"])
+        if data is None:
+            raise ValueError("Case image is no longer available. Please create the case again.")
+        return CaseImage(data, sha256=case["image_ref"])
+    if case.get("image_data"):
+        return CaseImage.coerce(case["image_data"])
+    return None
+
+
+_VISION_CRITERIA = """1. ABCDE CRITERIA - Score each 0.0 (reassuring) to 1.0 (concerning):
    - asymmetry: Lesion asymmetry (0= symmetric, 1= highly asymmetric)
    - border: Border irregularity (0= smooth, 1= very irregular/notched)
    - color: Color variation (0= uniform, 1= multiple colors/variegation)
@@ -119,74 +385,213 @@ Output a melanoma risk score from 0.0 (benign) to 1.0 (high suspicion of melanom
 
 2. DIFFERENTIAL DIAGNOSIS - List top diagnoses with probability (sum to 1.0):
    Use HAM10000 classes: mel (melanoma), nv (nevus), bkl (benign keratosis), bcc (basal cell carcinoma), ak (actinic keratosis), vasc (vascular), df (dermatofibroma).
-   Include brief rationale for top 2.
+   Include brief rationale for top 2."""
 
-Respond with a valid JSON object only, no markdown:
-{{
-  "p_vision": <number between 0 and 1>,
+_VISION_JSON_FIELDS = """  "p_vision": <number between 0 and 1>,
   "confidence": <number 0-1>,
   "brief_findings": "1-2 sentence description of key visual features",
-  "abcde": {{
+  "abcde": {
     "asymmetry": <0-1>,
     "border": <0-1>,
     "color": <0-1>,
     "diameter": <0-1>,
     "evolution": 0.5
-  }},
+  },
   "differential_diagnosis": [
-    {{ "dx": "mel", "name": "Melanoma", "probability": <0-1>, "rationale": "brief" }},
-    {{ "dx": "nv", "name": "Nevus", "probability": <0-1>, "rationale": "brief" }}
-  ]
+    { "dx": "mel", "name": "Melanoma", "probability": <0-1>, "rationale": "brief" },
+    { "dx": "nv", "name": "Nevus", "probability": <0-1>, "rationale": "brief" }
+  ]"""
+
+
+def _reasoning_json_fields(lambda_: float) -> str:
+    return f"""  "node_reasoning": {{
+    "wearables": "2-3 sentences: (1) What this step does, (2) The math: how we derive p_health from heart rate, SpO2, etc. (3) Why this value makes sense for this case.",
+    "vision": "2-3 sentences: (1) What this step does, (2) The math: how ABCDE criteria and differential diagnosis yield p_vision, (3) Key visual findings that drove the score.",
+    "fusion": f"2-3 sentences: (1) What fusion does, (2) The exact formula: p_fused = λ × p_health + (1−λ) × p_vision with λ={lambda_}. Plug in the numbers. (3) Why we weight image vs health this way.",
+    "guardrails": "2-3 sentences: (1) What guardrails do, (2) The logic: when do we abstain vs pass, (3) Why this case got this outcome.",
+    "decision": "2-3 sentences: (1) What the decision step does, (2) How the fused score maps to recommendations, (3) The clinical rationale for this case."
+  }},
+  "clinician_report": "2-4 sentence summary for clinician",
+  "patient_summary": "1-2 sentence plain-language summary for patient\""""
+
+
+def _wearables_trends_context(health_result: dict) -> str:
+    windowed = (health_result.get("features") or {}).get("windowed") or {}
+    if not windowed:
+        return ""
+    return (
+        f"\nWearables trends: HR {windowed.get('hr_trend_per_hour')}/h, "
+        f"SpO2 {windowed.get('spo2_trend_per_hour')}/h, "
+        f"desaturation episodes={windowed.get('desaturation_episodes')}, "
+        f"HR by activity={windowed.get('hr_by_activity')}"
+    )
+
+
+def _vision_cache_key(image: CaseImage, patient_context: dict | None, stage: str = "vision") -> str:
+    """Vision cache key for a result produced by the given stage's model."""
+    return vision_cache_key(
+        image.sha256, f"{VISION_PROMPT_VERSION}/{IMAGE_VARIANT}", get_llm_client().model_name(stage), patient_context
+    )
+
+
+def _cached_vision(image: CaseImage, patient_context: dict | None, stages: tuple[str, ...] = ("vision",)) -> dict | None:
+    """Cached vision result from any of the given stages' models, else None (blocking; run in a thread)."""
+    cache = get_vision_cache()
+    if cache is None:
+        return None
+    for key in dict.fromkeys(_vision_cache_key(image, patient_context, stage) for stage in stages):
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    return None
+
+
+async def run_vision_model(
+    image: CaseImage | bytes | str, patient_context: dict | None = None, prescreen: bool = True
+) -> dict[str, Any]:
+    """
+    Use Gemini vision to analyze skin lesion image. Returns p_vision, ci_vision.
+    image: CaseImage, raw bytes, or a base64 string (preprocessed via prepare_image before upload).
+    Results are cached by image content + prompt version + preprocessing + model + patient context.
+    prescreen=False skips the local pre-screen (the caller already ran it and it escalated).
+    Falls back to mock if Gemini unavailable.
+    """
+    try:
+        image = CaseImage.coerce(image)
+    except Exception as e:
+        return _vision_fallback("invalid_image", e)
+
+    # The cache's disk tier is SQLite; keep its I/O off the event loop
+    cached = await asyncio.to_thread(_cached_vision, image, patient_context)
+    if cached is not None:
+        return cached
+
+    if prescreen:
+        screened = await prescreen_vision(image)
+        if screened is not None:
+            return screened
+
+    client = get_llm_client()
+    if not client.available():
+        return _vision_fallback("unavailable")
+
+    try:
+        context_str = ""
+        if patient_context:
+            parts = [f"{k}={v}" for k, v in patient_context.items() if v]
+            if parts:
+                context_str = f"\nPatient context (if from dataset): {', '.join(parts)}"
+
+        prompt = f"""You are a dermatology AI assistant. Analyze this dermatoscopic skin lesion image.
+
+Output a melanoma risk score from 0.0 (benign) to 1.0 (high suspicion of melanoma).
+{context_str}
+
+{_VISION_CRITERIA}
+
+Respond with a valid JSON object only, no markdown:
+{{
+{_VISION_JSON_FIELDS}
 }}"""
 
-        img_data = base64.b64decode(image_base64)
-        img = __import__("PIL.Image", fromlist=["Image"]).Image.open(io.BytesIO(img_data))
+        prepared = await asyncio.to_thread(prepare_image, image)
 
-        response = model.generate_content([prompt, img])
-        text = response.text.strip()
-        if text.startswith("```"):
-            text = re.sub(r"^```(?:json)?\s*", "", text)
-            text = re.sub(r"\s*```$", "", text)
-        data = json.loads(text)
+        text = await client.generate("vision", [prompt, prepared.part()])
+        result = _parse_vision_response(_parse_json_response(text))
+        cache = get_vision_cache()
+        if cache is not None:
+            await asyncio.to_thread(cache.put, _vision_cache_key(image, patient_context), result)
+        return result
+    except Exception as e:
+        metrics.error("vision", e)
+        return _vision_fallback(fallback_reason(e), e)
 
-        p_vision = max(0.0, min(1.0, float(data.get("p_vision", 0.35))))
-        confidence = max(0.1, min(1.0, float(data.get("confidence", 0.7))))
-        var_vision = round_float((1 - confidence) * 0.08 + 0.02)
-        ci_half = 0.1 + (1 - confidence) * 0.08
-        ci_low = max(0, p_vision - ci_half)
-        ci_high = min(1, p_vision + ci_half)
-
-        abcde_raw = data.get("abcde") or {}
-        abcde = {
-            "asymmetry": round_float(max(0, min(1, float(abcde_raw.get("asymmetry", 0.5))))),
-            "border": round_float(max(0, min(1, float(abcde_raw.get("border", 0.5))))),
-            "color": round_float(max(0, min(1, float(abcde_raw.get("color", 0.5))))),
-            "diameter": round_float(max(0, min(1, float(abcde_raw.get("diameter", 0.5))))),
-            "evolution": round_float(max(0, min(1, float(abcde_raw.get("evolution", 0.5))))),
-        }
 
-        diff_raw = data.get("differential_diagnosis") or []
-        differential_diagnosis = []
-        for item in diff_raw[:6] if isinstance(diff_raw, list) else []:
-            if isinstance(item, dict) and item.get("dx"):
-                differential_diagnosis.append({
-                    "dx": str(item.get("dx", "")),
-                    "name": str(item.get("name", item.get("dx", ""))),
-                    "probability": round_float(max(0, min(1, float(item.get("probability", 0))))),
-                    "rationale": str(item.get("rationale", "")),
-                })
+async def prescreen_vision(image: CaseImage) -> dict[str, Any] | None:
+    """
+    Vision result from the local pre-screen when it resolves the case (clearly benign or
+    clearly suspicious), else None to escalate to the model. None when the pre-screen is off.
+    """
+    screen = get_prescreen()
+    if screen is None:
+        return None
+    try:
+        with metrics.STAGE_SECONDS.time("prescreen", stage="prescreen"):
+            outcome = await asyncio.to_thread(lambda: screen.screen(image.pil()))
+    except Exception as e:
+        metrics.error("prescreen", e)
+        return None
+    decision = outcome["decision"]
+    metrics.PRESCREEN_DECISIONS.inc(decision=decision or "escalated")
+    if decision is None:
+        return None
+    features = outcome["features"]
+    result = _parse_vision_response({
+        "p_vision": outcome["score"],
+        "confidence": 0.6,
+        "brief_findings": (
+            f"Resolved by the local pre-screen as {decision} (score {outcome['score']:.2f}); no model call. "
+            + ", ".join(f"{k}={features[k]:.2f}" for k in ("asymmetry", "border", "color", "diameter"))
+        ),
+        "abcde": {**features, "evolution": 0.5},
+    })
+    result["prescreen"] = {k: outcome[k] for k in ("decision", "score", "band")}
+    return result
+
+
+def _parse_json_response(text: str) -> Any:
+    """Parse a JSON model response, stripping markdown code fences if present."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = re.sub(r"^```(?:json)?\s*", "", text)
+        text = re.sub(r"\s*```$", "", text)
+    return json.loads(text)
+
+
+def _parse_vision_response(data: dict) -> dict[str, Any]:
+    """Clamp and normalize the vision fields of a model response into a vision result."""
+    p_vision = max(0.0, min(1.0, float(data.get("p_vision", 0.35))))
+    confidence = max(0.1, min(1.0, float(data.get("confidence", 0.7))))
+    var_vision = round_float((1 - confidence) * 0.08 + 0.02)
+    ci_half = 0.1 + (1 - confidence) * 0.08
+    ci_low = max(0, p_vision - ci_half)
+    ci_high = min(1, p_vision + ci_half)
+
+    abcde_raw = data.get("abcde") or {}
+    abcde = {
+        "asymmetry": round_float(max(0, min(1, float(abcde_raw.get("asymmetry", 0.5))))),
+        "border": round_float(max(0, min(1, float(abcde_raw.get("border", 0.5))))),
+        "color": round_float(max(0, min(1, float(abcde_raw.get("color", 0.5))))),
+        "diameter": round_float(max(0, min(1, float(abcde_raw.get("diameter", 0.5))))),
+        "evolution": round_float(max(0, min(1, float(abcde_raw.get("evolution", 0.5))))),
+    }
 
-        return {
-            "p_vision": round_float(p_vision),
-            "var_vision": var_vision,
-            "ci_vision": [round_float(ci_low), round_float(ci_high)],
-            "vision_findings": data.get("brief_findings", ""),
-            "abcde": abcde,
-            "differential_diagnosis": differential_diagnosis,
-            "heatmap": "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==",
-        }
-    except Exception:
-        return _mock_vision_result()
+    diff_raw = data.get("differential_diagnosis") or []
+    differential_diagnosis = []
+    for item in diff_raw[:6] if isinstance(diff_raw, list) else []:
+        if isinstance(item, dict) and item.get("dx"):
+            differential_diagnosis.append({
+                "dx": str(item.get("dx", "")),
+                "name": str(item.get("name", item.get("dx", ""))),
+                "probability": round_float(max(0, min(1, float(item.get("probability", 0))))),
+                "rationale": str(item.get("rationale", "")),
+            })
+
+    return {
+        "p_vision": round_float(p_vision),
+        "var_vision": var_vision,
+        "ci_vision": [round_float(ci_low), round_float(ci_high)],
+        "vision_findings": data.get("brief_findings", ""),
+        "abcde": abcde,
+        "differential_diagnosis": differential_diagnosis,
+        "heatmap": "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==",
+    }
+
+
+def _vision_fallback(reason: str, error: Exception | None = None) -> dict[str, Any]:
+    """Mock vision result flagged with why the model was not used (never cached)."""
+    metrics.fallback("vision", reason)
+    return {**_mock_vision_result(), "fallback": {"reason": reason, "error": str(error) if error else None}}
 
 
 def _mock_vision_result() -> dict[str, Any]:
@@ -236,42 +641,72 @@ def guardrails(p_fused: float, conservative: bool) -> dict[str, Any]:
     return {"abstain": abstain, "reason": reason}
 
 
-def call_gemini_for_reasoning(
+async def call_gemini_for_reasoning(
     health_result: dict,
     vision_result: dict,
     p_fused: float,
     guardrail_result: dict,
-    image_base64: str | None,
+    image: CaseImage | bytes | str | None,
     patient_context: dict | None = None,
     lambda_: float = 0.5,
+    on_token: Callable[[str], None] | None = None,
 ) -> dict[str, Any]:
     """
     Call Gemini for structured reasoning. Returns node_reasoning, clinician_report, patient_summary.
+    image: the case image (its prepare_image variant is shared with the vision stage), or None.
+    on_token: if given, the response is streamed and each raw text chunk is passed to it.
     """
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key or not GEMINI_AVAILABLE:
-        return _fallback_reasoning(health_result, vision_result, p_fused, guardrail_result)
+    client = get_llm_client()
+    if not client.available():
+        return _fallback_reasoning(health_result, vision_result, p_fused, guardrail_result, reason="unavailable")
 
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-1.5-flash")
+        parts = await _reasoning_parts(
+            health_result, vision_result, p_fused, guardrail_result, image, patient_context, lambda_
+        )
+        if on_token is None:
+            text = await client.generate("reasoning", parts)
+        else:
+            chunks = []
+            async for chunk in client.stream("reasoning", parts):
+                chunks.append(chunk)
+                on_token(chunk)
+            text = "".join(chunks)
+        return _parse_reasoning_response(text)
+    except Exception as e:
+        metrics.error("reasoning", e)
+        return _fallback_reasoning(
+            health_result, vision_result, p_fused, guardrail_result, str(e), reason=fallback_reason(e)
+        )
 
-        context_str = ""
-        if patient_context and any(patient_context.get(k) for k in ("age", "sex", "localization")):
-            ctx_parts = [f"{k}={v}" for k, v in patient_context.items() if v]
-            context_str = f"\nPatient/dataset context: {', '.join(ctx_parts)}"
-        vision_findings = vision_result.get("vision_findings", "")
-        if vision_findings:
-            context_str += f"\nVision model findings: {vision_findings}"
-        abcde = vision_result.get("abcde", {})
-        if abcde:
-            context_str += f"\nABCDE: asymmetry={abcde.get('asymmetry')}, border={abcde.get('border')}, color={abcde.get('color')}, diameter={abcde.get('diameter')}"
-        diff = vision_result.get("differential_diagnosis", [])[:3]
-        if diff:
-            top = ", ".join(f"{d.get('name')}({d.get('probability', 0)*100:.0f}%)" for d in diff)
-            context_str += f"\nTop differential: {top}"
-
-        prompt = f"""You are a clinical decision support assistant. Analyze this pipeline output and provide structured reasoning.
+
+async def _reasoning_parts(
+    health_result: dict,
+    vision_result: dict,
+    p_fused: float,
+    guardrail_result: dict,
+    image: CaseImage | bytes | str | None,
+    patient_context: dict | None,
+    lambda_: float,
+) -> list[Any]:
+    """Prompt (plus preprocessed image part, if any) for the reasoning call."""
+    context_str = ""
+    if patient_context and any(patient_context.get(k) for k in ("age", "sex", "localization")):
+        ctx_parts = [f"{k}={v}" for k, v in patient_context.items() if v]
+        context_str = f"\nPatient/dataset context: {', '.join(ctx_parts)}"
+    vision_findings = vision_result.get("vision_findings", "")
+    if vision_findings:
+        context_str += f"\nVision model findings: {vision_findings}"
+    context_str += _wearables_trends_context(health_result)
+    abcde = vision_result.get("abcde", {})
+    if abcde:
+        context_str += f"\nABCDE: asymmetry={abcde.get('asymmetry')}, border={abcde.get('border')}, color={abcde.get('color')}, diameter={abcde.get('diameter')}"
+    diff = vision_result.get("differential_diagnosis", [])[:3]
+    if diff:
+        top = ", ".join(f"{d.get('name')}({d.get('probability', 0)*100:.0f}%)" for d in diff)
+        context_str += f"\nTop differential: {top}"
+
+    prompt = f"""You are a clinical decision support assistant. Analyze this pipeline output and provide structured reasoning.
 {context_str}
 
 Pipeline outputs:
@@ -282,58 +717,132 @@ Pipeline outputs:
 
 Respond with a valid JSON object only, no markdown, with these exact keys:
 {{
-  "node_reasoning": {{
-    "wearables": "2-3 sentences: (1) What this step does, (2) The math: how we derive p_health from heart rate, SpO2, etc. (3) Why this value makes sense for this case.",
-    "vision": "2-3 sentences: (1) What this step does, (2) The math: how ABCDE criteria and differential diagnosis yield p_vision, (3) Key visual findings that drove the score.",
-    "fusion": f"2-3 sentences: (1) What fusion does, (2) The exact formula: p_fused = λ × p_health + (1−λ) × p_vision with λ={lambda_}. Plug in the numbers. (3) Why we weight image vs health this way.",
-    "guardrails": "2-3 sentences: (1) What guardrails do, (2) The logic: when do we abstain vs pass, (3) Why this case got this outcome.",
-    "decision": "2-3 sentences: (1) What the decision step does, (2) How the fused score maps to recommendations, (3) The clinical rationale for this case."
-  }},
-  "clinician_report": "2-4 sentence summary for clinician",
-  "patient_summary": "1-2 sentence plain-language summary for patient"
+{_reasoning_json_fields(lambda_)}
 }}"""
 
-        if image_base64:
-            import PIL.Image
-            img_data = base64.b64decode(image_base64)
-            img = PIL.Image.open(io.BytesIO(img_data))
-            response = model.generate_content([prompt, img])
-        else:
-            response = model.generate_content(prompt)
+    if image:
+        prepared = await asyncio.to_thread(prepare_image, CaseImage.coerce(image))
+        return [prompt, prepared.part()]
+    return [prompt]
 
-        text = response.text.strip()
-        # Remove markdown code blocks if present
-        if text.startswith("```"):
-            text = re.sub(r"^```(?:json)?\s*", "", text)
-            text = re.sub(r"\s*```$", "", text)
-        data = json.loads(text)
 
-        node_reasoning = data.get("node_reasoning", {})
-        clinician_report = data.get("clinician_report", "")
-        patient_summary = data.get("patient_summary", "")
+def _parse_reasoning_response(text: str) -> dict[str, Any]:
+    data = _parse_json_response(text)
+    return {
+        "node_reasoning": data.get("node_reasoning", {}),
+        "clinician_report": data.get("clinician_report", ""),
+        "patient_summary": data.get("patient_summary", ""),
+    }
+
+
+# Max |stated - local| p_fused for a fused-call narrative to count as consistent
+FUSED_CALL_TOLERANCE = 0.02
+
+
+async def call_gemini_vision_reasoning(
+    health_result: dict,
+    image: CaseImage,
+    patient_context: dict | None = None,
+    lambda_: float = 0.5,
+    conservative: bool = False,
+) -> dict[str, Any] | None:
+    """
+    Fused mode: one Gemini call (one image upload) returning the vision scores and the
+    narrative together. Returns {"vision", "reasoning", "stated"} where stated holds the
+    model's own p_fused / abstain for check_stated_scores, or None when Gemini is
+    unavailable or the response is unusable (callers fall back to the two-call path).
+    """
+    client = get_llm_client()
+    if not client.available():
+        return None
+
+    try:
+        context_str = ""
+        if patient_context:
+            ctx_parts = [f"{k}={v}" for k, v in patient_context.items() if v]
+            if ctx_parts:
+                context_str = f"\nPatient context (if from dataset): {', '.join(ctx_parts)}"
+        context_str += _wearables_trends_context(health_result)
+        abstain_rule = (
+            "abstain=true when 0.3 < p_fused < 0.7 (conservative mode), otherwise false"
+            if conservative
+            else "abstain=false (conservative mode is off)"
+        )
+
+        prompt = f"""You are a dermatology AI assistant and clinical decision support assistant.
+Analyze this dermatoscopic skin lesion image, then explain the full pipeline result.
+
+Output a melanoma risk score p_vision from 0.0 (benign) to 1.0 (high suspicion of melanoma).
+{context_str}
+
+{_VISION_CRITERIA}
+
+3. PIPELINE - Combine your p_vision with the wearables result:
+   - Wearables: p_health={health_result.get('p_health')}, reason={health_result.get('reason')}
+   - Fusion: p_fused = λ × p_health + (1−λ) × p_vision with λ={lambda_}
+   - Guardrails: {abstain_rule}
+   Report the p_fused and abstain values you used in your reasoning.
+
+Respond with a valid JSON object only, no markdown, with these exact keys:
+{{
+{_VISION_JSON_FIELDS},
+  "p_fused": <number between 0 and 1>,
+  "abstain": <true or false>,
+{_reasoning_json_fields(lambda_)}
+}}"""
 
+        prepared = await asyncio.to_thread(prepare_image, image)
+        text = await client.generate("vision_reasoning", [prompt, prepared.part()])
+        data = _parse_json_response(text)
+        if not isinstance(data, dict) or "p_vision" not in data:
+            return None
         return {
-            "node_reasoning": node_reasoning,
-            "clinician_report": clinician_report,
-            "patient_summary": patient_summary,
+            "vision": _parse_vision_response(data),
+            "reasoning": {
+                "node_reasoning": data.get("node_reasoning", {}),
+                "clinician_report": data.get("clinician_report", ""),
+                "patient_summary": data.get("patient_summary", ""),
+            },
+            "stated": {"p_fused": data.get("p_fused"), "abstain": data.get("abstain")},
         }
     except Exception as e:
-        return _fallback_reasoning(health_result, vision_result, p_fused, guardrail_result, str(e))
+        metrics.error("vision_reasoning", e)
+        return None
+
+
+def check_stated_scores(stated: dict, scores: dict) -> dict[str, Any]:
+    """
+    Compare the numbers a fused-call narrative was written against with the locally computed
+    fusion / guardrails (the local values are always the ones reported).
+    """
+    try:
+        stated_p = round_float(stated.get("p_fused"))
+    except (TypeError, ValueError):
+        stated_p = None
+    stated_abstain = stated.get("abstain") if isinstance(stated.get("abstain"), bool) else None
+    consistent = (
+        stated_p is not None
+        and abs(stated_p - scores["p_fused"]) <= FUSED_CALL_TOLERANCE
+        and stated_abstain == scores["abstain"]
+    )
+    return {
+        "mode": "fused",
+        "stated_p_fused": stated_p,
+        "stated_abstain": stated_abstain,
+        "consistent": consistent,
+    }
 
 
-def call_gemini_pipeline_steps() -> list[dict[str, str]]:
+async def call_gemini_pipeline_steps() -> list[dict[str, str]]:
     """
     Ask Gemini to describe the 5 pipeline steps. Returns list of {id, label, description}.
     Used for step-by-step UI without hardcoding.
     """
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key or not GEMINI_AVAILABLE:
+    client = get_llm_client()
+    if not client.available():
         return _fallback_pipeline_steps()
 
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-1.5-flash")
-
         prompt = """You are a clinical decision support assistant for OncoLens, a skin lesion analysis app that combines wearables data with AI vision.
 
 Our pipeline has exactly 5 steps in order:
@@ -351,16 +860,18 @@ Respond with a valid JSON array only, no markdown. Each element must have exactl
 Example format:
 [{"id":"wearables","label":"1. Health data","description":"..."},{"id":"vision","label":"2. Image analysis","description":"..."},...]"""
 
-        response = model.generate_content(prompt)
-        text = response.text.strip()
+        text = (await client.generate("pipeline_steps", [prompt])).strip()
         if text.startswith("```"):
             text = re.sub(r"^```(?:json)?\s*", "", text)
             text = re.sub(r"\s*```$", "", text)
         data = json.loads(text)
         if isinstance(data, list) and len(data) >= 5:
             return data[:5]
+        metrics.fallback("pipeline_steps", "invalid_response")
         return _fallback_pipeline_steps()
-    except Exception:
+    except Exception as e:
+        metrics.error("pipeline_steps", e)
+        metrics.fallback("pipeline_steps", "error")
         return _fallback_pipeline_steps()
 
 
@@ -375,22 +886,15 @@ def _fallback_pipeline_steps() -> list[dict[str, str]]:
     ]
 
 
-def call_gemini_demo_explanation(patient_name: str, image_label: str, dx: str = "") -> str:
+async def call_gemini_demo_explanation(patient_name: str, image_label: str, dx: str = "") -> str:
     """
     Generate a brief Gemini explanation of what's happening in the mock demo.
     """
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key or not GEMINI_AVAILABLE:
-        return (
-            "We're loading the patient's wearables data (heart rate, SpO2, activity) and analyzing "
-            "the dermatoscopic image with our vision model. Next, we'll fuse the scores, apply "
-            "guardrails, and generate clinical recommendations."
-        )
+    client = get_llm_client()
+    if not client.available():
+        return DEMO_EXPLAIN_UNAVAILABLE
 
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-1.5-flash")
-
         patient_desc = {
             "patient_a_high_priority": "elevated heart rate, declining SpO2, and high activity — suggesting physiological stress",
             "patient_b_needs_review": "moderate vitals with some variability — warrants careful review",
@@ -407,56 +911,142 @@ The pipeline will: (1) extract wearables features → p_health, (2) run vision m
 
 Write 2-3 concise sentences explaining what is happening right now in this demo, in present tense. Use plain language. Address the clinician directly. Be specific about this patient and image."""
 
-        response = model.generate_content(prompt)
-        return response.text.strip() or "Processing patient data and lesion image..."
-    except Exception:
-        return (
-            "We're analyzing the patient's wearables and the dermatoscopic image. "
-            "The vision model will assess ABCDE criteria and differential diagnosis, "
-            "then we'll fuse scores and apply guardrails for the final recommendation."
-        )
+        text = await client.generate("demo_explain", [prompt])
+        return text.strip() or DEMO_EXPLAIN_EMPTY
+    except Exception as e:
+        metrics.error("demo_explain", e)
+        metrics.fallback("demo_explain", "error")
+        return DEMO_EXPLAIN_FAILED
+
+
+DEMO_EXPLAIN_UNAVAILABLE = (
+    "We're loading the patient's wearables data (heart rate, SpO2, activity) and analyzing "
+    "the dermatoscopic image with our vision model. Next, we'll fuse the scores, apply "
+    "guardrails, and generate clinical recommendations."
+)
+DEMO_EXPLAIN_EMPTY = "Processing patient data and lesion image..."
+DEMO_EXPLAIN_FAILED = (
+    "We're analyzing the patient's wearables and the dermatoscopic image. "
+    "The vision model will assess ABCDE criteria and differential diagnosis, "
+    "then we'll fuse scores and apply guardrails for the final recommendation."
+)
+
+# Sample patients offered by the guided demo, and the HAM10000 dx codes per image label
+DEMO_PATIENTS = (
+    "patient_a_high_priority.csv",
+    "patient_b_needs_review.csv",
+    "patient_c_deferred_low_quality.csv",
+)
+DEMO_DX_BY_LABEL = {"mel": ("mel",), "non-mel": ("nv", "bkl", "bcc", "akiec", "vasc", "df")}
+# Demo explanations warmed at a time, so the warm-up never crowds out live requests
+DEMO_WARMUP_CONCURRENCY = 2
+
+
+async def cached_pipeline_steps() -> list[dict[str, str]]:
+    """call_gemini_pipeline_steps through the static response cache (the prompt is constant)."""
+    return await static_cache.get_or_compute(
+        ("pipeline_steps", get_llm_client().model_name("pipeline_steps")),
+        call_gemini_pipeline_steps,
+        is_fallback=lambda steps: steps == _fallback_pipeline_steps(),
+    )
+
+
+async def cached_demo_explanation(patient_name: str, image_label: str, dx: str = "") -> str:
+    """call_gemini_demo_explanation through the static response cache."""
+    key = ("demo_explain", get_llm_client().model_name("demo_explain"), patient_name.lower().replace(".csv", ""), image_label, dx)
+    return await static_cache.get_or_compute(
+        key,
+        lambda: call_gemini_demo_explanation(patient_name, image_label, dx),
+        is_fallback=lambda text: text in (DEMO_EXPLAIN_UNAVAILABLE, DEMO_EXPLAIN_EMPTY, DEMO_EXPLAIN_FAILED),
+    )
+
+
+async def warm_static_cache() -> None:
+    """
+    Precompute the pipeline steps, then every demo explanation combination (runs in the
+    background at startup). Skipped without a usable model; the demo explanations are warmed
+    DEMO_WARMUP_CONCURRENCY at a time and stop early once the circuit breaker opens.
+    """
+    client = get_llm_client()
+    if not client.available():
+        return
+    try:
+        await cached_pipeline_steps()
+    except Exception as e:
+        metrics.error("warm_static_cache", e)
+
+    slots = asyncio.Semaphore(DEMO_WARMUP_CONCURRENCY)
+
+    async def warm(patient: str, label: str, dx: str) -> None:
+        async with slots:
+            if client.breaker.state == "open":
+                return
+            try:
+                await cached_demo_explanation(patient, label, dx)
+            except Exception as e:
+                metrics.error("warm_static_cache", e)
+
+    await asyncio.gather(*(
+        warm(patient, label, dx)
+        for patient in DEMO_PATIENTS
+        for label, dxs in DEMO_DX_BY_LABEL.items()
+        for dx in dxs
+    ))
+
 
+CHAT_UNAVAILABLE = "Chat is unavailable. Please ensure GEMINI_API_KEY is set."
+CHAT_EMPTY_REPLY = "I couldn't generate a response. Please try rephrasing."
 
-def call_gemini_chat(case: dict, message: str) -> str:
+
+async def call_gemini_chat(case: dict, message: str) -> str:
     """
     Multi-turn chat: clinician asks follow-up questions. Uses case result + chat history.
     """
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key or not GEMINI_AVAILABLE:
-        return "Chat is unavailable. Please ensure GEMINI_API_KEY is set."
+    client = get_llm_client()
+    if not client.available():
+        return CHAT_UNAVAILABLE
 
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-1.5-flash")
-
-        result = case.get("result", {})
-        context = f"""Case analysis summary:
-- p_health: {result.get('p_health')}, p_vision: {result.get('p_vision')}, p_fused: {result.get('p_fused')}
-- Guardrails: {result.get('guardrail_reason')}
-- Next steps: {result.get('next_steps', [])}
-- Clinician report: {result.get('clinician_report', '')}
-- Patient summary: {result.get('patient_summary', '')}
-- Vision findings: {result.get('vision_findings', '')}
-"""
-        abcde = result.get("abcde", {})
-        if abcde:
-            context += f"- ABCDE: asymmetry={abcde.get('asymmetry')}, border={abcde.get('border')}, color={abcde.get('color')}, diameter={abcde.get('diameter')}\n"
-        diff = result.get("differential_diagnosis", [])[:5]
-        if diff:
-            context += "- Differential diagnosis: " + ", ".join(f"{d.get('name')}({d.get('probability', 0)*100:.0f}%)" for d in diff) + "\n"
-        patient_ctx = case.get("dataset_metadata") or {}
-        if patient_ctx:
-            context += f"\nPatient/dataset context: age={patient_ctx.get('age')}, sex={patient_ctx.get('sex')}, localization={patient_ctx.get('localization')}"
-
-        chat_history = case.get("chat_history", [])
-        history_text = "\n".join(
-            f"{'Clinician' if m['role'] == 'user' else 'Assistant'}: {m['content']}"
-            for m in chat_history[-10:]
-        )
-        if history_text:
-            context += f"\n\nRecent conversation:\n{history_text}"
+        text = await client.generate("chat", [_chat_prompt(case, message)])
+        return text.strip() or CHAT_EMPTY_REPLY
+    except Exception as e:
+        metrics.error("chat", e)
+        return f"Error: {str(e)}"
+
+
+async def stream_gemini_chat(case: dict, message: str) -> AsyncIterator[str]:
+    """
+    Streaming call_gemini_chat: yields reply text chunks as they arrive.
+    Errors after the first chunk are appended as an "Error: ..." chunk, like the non-streaming reply.
+    """
+    client = get_llm_client()
+    if not client.available():
+        yield CHAT_UNAVAILABLE
+        return
+
+    sent = False
+    try:
+        async for chunk in client.stream("chat", [_chat_prompt(case, message)]):
+            if not sent:
+                chunk = chunk.lstrip()
+                if not chunk:
+                    continue
+            sent = True
+            yield chunk
+        if not sent:
+            yield CHAT_EMPTY_REPLY
+    except Exception as e:
+        metrics.error("chat", e)
+        yield f"{' ' if sent else ''}Error: {str(e)}"
 
-        prompt = f"""You are a clinical decision support assistant. A clinician is asking a follow-up question about this case.
+
+def _chat_prompt(case: dict, message: str) -> str:
+    context = case_summary(case)
+    history = history_context(case)
+    if history:
+        context += f"\n\n{history}"
+
+    return f"""You are a clinical decision support assistant. A clinician is asking a follow-up question about this case.
 
 {context}
 
@@ -464,10 +1054,39 @@ Clinician question: {message}
 
 Provide a helpful, concise answer (2-4 sentences). Be clinically appropriate. If unsure, recommend consulting the full report or a specialist."""
 
-        response = model.generate_content(prompt)
-        return response.text.strip() or "I couldn't generate a response. Please try rephrasing."
+
+async def summarize_chat(previous: str, messages: list[dict], max_tokens: int) -> str:
+    """Fold messages into the rolling chat summary with Gemini; local extractive summary as fallback."""
+    client = get_llm_client()
+    if not client.available():
+        return local_summary(previous, messages, max_tokens)
+    prompt = f"""Update the running summary of a clinician's Q&A about a skin lesion case.
+Keep clinically relevant questions, answers, decisions and open items. At most {max_tokens * 3 // 4} words, plain text.
+
+Current summary:
+{previous or "(none)"}
+
+New messages:
+{format_messages(messages)}
+
+Updated summary:"""
+    try:
+        text = (await client.generate("chat_summary", [prompt])).strip()
+        return text or local_summary(previous, messages, max_tokens)
     except Exception as e:
-        return f"Error: {str(e)}"
+        metrics.error("chat_summary", e)
+        metrics.fallback("chat_summary", "error")
+        return local_summary(previous, messages, max_tokens)
+
+
+async def record_chat_turn(case: dict, message: str, reply: str) -> list[dict]:
+    """
+    Append a Q&A turn, fold older turns into the rolling summary when over budget, and cap
+    stored history. Returns messages removed from chat_history (for CaseStore.archive_chat).
+    """
+    add_turn(case, message, reply)
+    await fold_history(case, summarize_chat)
+    return trim_history(case)
 
 
 def _fallback_reasoning(
@@ -476,9 +1095,12 @@ def _fallback_reasoning(
     p_fused: float,
     guardrail_result: dict,
     error: str | None = None,
+    reason: str = "error",
 ) -> dict[str, Any]:
-    """Fallback when Gemini fails or is unavailable."""
+    """Fallback when Gemini fails or is unavailable; flagged under "fallback" with the reason."""
+    metrics.fallback("reasoning", reason)
     return {
+        "fallback": {"reason": reason, "error": error},
         "node_reasoning": {
             "wearables": f"Wearables analysis: {health_result.get('reason', 'N/A')}.",
             "vision": f"Vision analysis yielded p_vision={vision_result.get('p_vision')}.",
@@ -491,41 +1113,24 @@ def _fallback_reasoning(
     }
 
 
-def run_pipeline(case: dict, lambda_: float = 0.5, conservative: bool = False) -> dict[str, Any]:
-    """
-    Run full pipeline: wearables -> health, vision -> vision, fusion -> guardrails -> decision -> Gemini.
-    """
-    # 1. Wearables
-    health_result = extract_wearable_features(case.get("wearables_csv"))
+def decide_next_steps(p_fused: float, guardrail_result: dict) -> list[str]:
+    """Map fused score and guardrail outcome to recommended next steps."""
+    if guardrail_result["abstain"]:
+        return ["Abstain from automated decision", "Manual review required"]
+    if p_fused > 0.7:
+        return ["Urgent dermatology referral", "Document findings", "Schedule follow-up"]
+    if p_fused > 0.4:
+        return ["Schedule dermatology review", "Monitor lesion", "Document baseline"]
+    return ["Routine monitoring", "Patient education", "Document in chart"]
 
-    # 2. Vision (required)
-    image_base64 = case.get("image_data")
-    if not image_base64:
-        raise ValueError("Image is required for this demo.")
-    patient_context = case.get("dataset_metadata") or {}
-    vision_result = run_vision_model(image_base64, patient_context)
 
-    # 3. Fusion
+def score_stages(health_result: dict, vision_result: dict, lambda_: float, conservative: bool) -> dict[str, Any]:
+    """
+    Fusion -> guardrails -> decision from already computed stage results.
+    Pure and cheap: no I/O, safe to call on every slider change.
+    """
     p_fused = fuse_scores(health_result["p_health"], vision_result["p_vision"], lambda_)
-
-    # 4. Guardrails
     guardrail_result = guardrails(p_fused, conservative)
-
-    # 5. Decision (next steps)
-    if guardrail_result["abstain"]:
-        next_steps = ["Abstain from automated decision", "Manual review required"]
-    elif p_fused > 0.7:
-        next_steps = ["Urgent dermatology referral", "Document findings", "Schedule follow-up"]
-    elif p_fused > 0.4:
-        next_steps = ["Schedule dermatology review", "Monitor lesion", "Document baseline"]
-    else:
-        next_steps = ["Routine monitoring", "Patient education", "Document in chart"]
-
-    # 6. Gemini reasoning
-    gemini_result = call_gemini_for_reasoning(
-        health_result, vision_result, p_fused, guardrail_result, image_base64, patient_context, lambda_
-    )
-
     return {
         "p_health": health_result["p_health"],
         "var_health": health_result["var_health"],
@@ -537,11 +1142,221 @@ def run_pipeline(case: dict, lambda_: float = 0.5, conservative: bool = False) -
         "vision_findings": vision_result.get("vision_findings", ""),
         "abcde": vision_result.get("abcde", {}),
         "differential_diagnosis": vision_result.get("differential_diagnosis", []),
+        # Stages served by a local fallback instead of the model: {stage: {reason, error}}
+        "fallbacks": {"vision": vision_result["fallback"]} if vision_result.get("fallback") else {},
+        # Set when the local pre-screen resolved the vision stage without a model call
+        "prescreen": vision_result.get("prescreen"),
         "p_fused": round_float(p_fused),
         "abstain": guardrail_result["abstain"],
         "guardrail_reason": guardrail_result["reason"],
-        "next_steps": next_steps,
-        "node_reasoning": gemini_result["node_reasoning"],
-        "clinician_report": gemini_result["clinician_report"],
-        "patient_summary": gemini_result["patient_summary"],
+        "next_steps": decide_next_steps(p_fused, guardrail_result),
+        "lambda_": lambda_,
+        "conservative": conservative,
     }
+
+
+async def _reasoning_for(
+    case: dict, scores: dict, image: CaseImage | None, on_token: Callable[[str], None] | None = None
+) -> dict[str, Any]:
+    """Gemini narrative for the given scores, using the stage results stored on the case."""
+    guardrail_result = {"abstain": scores["abstain"], "reason": scores["guardrail_reason"]}
+    return await call_gemini_for_reasoning(
+        case["health_result"],
+        case["vision_result"],
+        scores["p_fused"],
+        guardrail_result,
+        image,
+        case.get("dataset_metadata") or {},
+        scores["lambda_"],
+        on_token,
+    )
+
+
+def _case_wearables(case: dict) -> dict[str, Any]:
+    """Wearables result computed at upload time, else parse any inline CSV text on the case."""
+    if case.get("wearables_result"):
+        return case["wearables_result"]
+    return extract_wearable_features(case.get("wearables_csv"))
+
+
+async def run_pipeline(
+    case: dict,
+    lambda_: float = 0.5,
+    conservative: bool = False,
+    fused_call: bool = False,
+    on_event: Callable[[str, Any], None] | None = None,
+) -> dict[str, Any]:
+    """
+    Run full pipeline: wearables -> health, vision -> vision, fusion -> guardrails -> decision -> Gemini.
+    Wearables (thread pool) and vision (async) are independent and run concurrently;
+    per-stage timings, the critical path and external-call spans ("calls") are returned under "timings".
+    fused_call: one Gemini call for vision + narrative (call_gemini_vision_reasoning) instead of
+    two; the narrative is checked against the local scores under "reasoning_check" and flagged
+    reasoning_stale if it disagrees. Falls back to the two-call path if the fused call fails.
+    on_event(kind, data) receives ("scores", scores) once fusion is done and, on the two-call
+    path, ("token", text) reasoning chunks as Gemini streams them (see run_pipeline_stream).
+    Stores health_result and vision_result on the case so rescore_pipeline can reuse them.
+    """
+    if not case.get("image_ref") and not case.get("image_data"):
+        raise ValueError("Image is required for this demo.")
+    patient_context = case.get("dataset_metadata") or {}
+    image_error: Exception | None = None
+
+    def image() -> CaseImage | None:
+        # Fetch and preprocess once (cached by source hash); vision and reasoning share the variant
+        nonlocal image_error
+        try:
+            case_image = load_case_image(case)
+            prepare_image(case_image)
+            return case_image
+        except Exception as e:
+            # Missing or unreadable image: vision degrades to its fallback, the rest of the run goes on
+            metrics.error("image", e)
+            image_error = e
+            return None
+
+    async def vision(image: CaseImage | None):
+        if image is None:
+            return _vision_fallback("invalid_image", image_error)
+        return await run_vision_model(image, patient_context)
+
+    def scoring(wearables: dict, vision: dict) -> dict[str, Any]:
+        case["health_result"] = wearables
+        case["vision_result"] = vision
+        scores = score_stages(wearables, vision, lambda_, conservative)
+        if on_event is not None:
+            # Snapshot: reasoning is merged into scores later, possibly before the event is sent
+            on_event("scores", copy.deepcopy(scores))
+        return scores
+
+    async def reasoning(scoring: dict, image: CaseImage | None) -> dict[str, Any]:
+        on_token = (lambda text: on_event("token", text)) if on_event is not None else None
+        return await _reasoning_for(case, scoring, image, on_token)
+
+    stages = [
+        # 1. Wearables
+        Stage("wearables", lambda: _case_wearables(case), kind="thread"),
+        Stage("image", image, kind="thread"),
+    ]
+    if not fused_call:
+        stages += [
+            # 2. Vision (required)
+            Stage("vision", vision, deps=("image",), kind="async"),
+            # 3-5. Fusion, guardrails, decision (next steps)
+            Stage("scoring", scoring, deps=("wearables", "vision")),
+            # 6. Gemini reasoning
+            Stage("reasoning", reasoning, deps=("scoring", "image"), kind="async"),
+        ]
+    else:
+        # The fused prompt needs p_health, so the single call waits for wearables
+        async def vision_reasoning(wearables: dict, image: CaseImage | None) -> dict[str, Any]:
+            if image is None:
+                return {"vision": _vision_fallback("invalid_image", image_error), "reasoning": None}
+            # Cached or resolved locally: only the narrative needs the model (two-call reasoning)
+            known = await asyncio.to_thread(_cached_vision, image, patient_context, ("vision_reasoning", "vision"))
+            if known is None:
+                known = await prescreen_vision(image)
+            if known is not None:
+                return {"vision": known, "reasoning": None}
+            fused = await call_gemini_vision_reasoning(wearables, image, patient_context, lambda_, conservative)
+            if fused is None:
+                metrics.fallback("vision_reasoning", "two_call")
+                # The pre-screen already escalated this image; don't run it again
+                return {"vision": await run_vision_model(image, patient_context, prescreen=False), "reasoning": None}
+            cache = get_vision_cache()
+            if cache is not None:
+                await asyncio.to_thread(
+                    cache.put, _vision_cache_key(image, patient_context, "vision_reasoning"), fused["vision"]
+                )
+            return fused
+
+        def fused_scoring(wearables: dict, vision_reasoning: dict) -> dict[str, Any]:
+            return scoring(wearables, vision_reasoning["vision"])
+
+        async def fused_reasoning(scoring: dict, vision_reasoning: dict, image: CaseImage | None) -> dict[str, Any]:
+            if vision_reasoning["reasoning"] is None:
+                return await reasoning(scoring, image)
+            check = check_stated_scores(vision_reasoning["stated"], scoring)
+            return {**vision_reasoning["reasoning"], "reasoning_check": check}
+
+        stages += [
+            # 2 + 6. Vision and narrative in one Gemini call
+            Stage("vision_reasoning", vision_reasoning, deps=("wearables", "image"), kind="async"),
+            # 3-5. Fusion, guardrails, decision (next steps)
+            Stage("scoring", fused_scoring, deps=("wearables", "vision_reasoning")),
+            Stage("reasoning", fused_reasoning, deps=("scoring", "vision_reasoning", "image"), kind="async"),
+        ]
+
+    with metrics.collect_spans() as calls:
+        results, timings = await run_stages(stages)
+    timings["calls"] = calls
+
+    result = _with_reasoning(results["scoring"], results["reasoning"])
+    result["reasoning_stale"] = not result.get("reasoning_check", {}).get("consistent", True)
+    result["timings"] = timings
+    return result
+
+
+async def run_pipeline_stream(
+    case: dict, lambda_: float = 0.5, conservative: bool = False, fused_call: bool = False
+) -> AsyncIterator[tuple[str, Any]]:
+    """
+    run_pipeline as an event stream: ("scores", scores) as soon as fusion is done, then
+    ("token", text) reasoning chunks, then ("result", result). Exceptions propagate to the consumer.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.ensure_future(run_pipeline(
+        case, lambda_, conservative, fused_call, on_event=lambda kind, data: queue.put_nowait((kind, data))
+    ))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while (event := await queue.get()) is not None:
+            yield event
+        yield "result", task.result()
+    finally:
+        task.cancel()
+
+
+def rescore_pipeline(case: dict, lambda_: float = 0.5, conservative: bool = False) -> dict[str, Any]:
+    """
+    Incremental re-run: recompute fusion, guardrails and next steps from the stage results
+    stored by the last run_pipeline, without calling wearables parsing, vision or Gemini.
+    The previous narrative is carried over and flagged reasoning_stale if the scores changed;
+    call refresh_reasoning to regenerate it.
+    """
+    if not case.get("health_result") or not case.get("vision_result"):
+        raise ValueError("Run the full pipeline before an incremental re-run.")
+    previous = case.get("result") or {}
+    result = score_stages(case["health_result"], case["vision_result"], lambda_, conservative)
+    for key in ("node_reasoning", "clinician_report", "patient_summary"):
+        result[key] = previous.get(key, {} if key == "node_reasoning" else "")
+    if "reasoning" in previous.get("fallbacks", {}):
+        result["fallbacks"]["reasoning"] = previous["fallbacks"]["reasoning"]
+    result["reasoning_stale"] = previous.get("reasoning_stale", True) or any(
+        previous.get(k) != result[k] for k in ("p_fused", "abstain", "guardrail_reason", "lambda_")
+    )
+    return result
+
+
+async def refresh_reasoning(case: dict) -> dict[str, Any]:
+    """Regenerate the Gemini narrative for the case's current result."""
+    result = case.get("result")
+    if not result or not case.get("health_result") or not case.get("vision_result"):
+        raise ValueError("Run the full pipeline before refreshing reasoning.")
+    image = await asyncio.to_thread(load_case_image, case)
+    result = {k: v for k, v in result.items() if k != "reasoning_check"}
+    result = _with_reasoning(result, await _reasoning_for(case, result, image))
+    result["reasoning_stale"] = False
+    return result
+
+
+def _with_reasoning(result: dict, reasoning: dict) -> dict[str, Any]:
+    """Merge a narrative into result, moving its fallback flag (if any) into result["fallbacks"]."""
+    reasoning = dict(reasoning)
+    fallback = reasoning.pop("fallback", None)
+    result.update(reasoning)
+    fallbacks = {k: v for k, v in result.get("fallbacks", {}).items() if k != "reasoning"}
+    if fallback:
+        fallbacks["reasoning"] = fallback
+    result["fallbacks"] = fallbacks
+    return result
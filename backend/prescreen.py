@@ -0,0 +1,149 @@
+"""
+Optional local pre-screen in front of the vision model. ABCDE proxies from lesion_features
+are scored by a logistic model calibrated on the HAM index
+(python -m backend.benchmark --calibrate-prescreen). Scores at or below the benign band or
+at or above the suspicious band are resolved locally; only ambiguous cases reach the LLM.
+Without a calibration file (or PRESCREEN_LOW / PRESCREEN_HIGH) nothing is resolved locally.
+
+Env:
+  PRESCREEN_ENABLED      1 to resolve clear cases locally (default 0)
+  PRESCREEN_CALIBRATION  calibration JSON (default backend/data/prescreen_calibration.json)
+  PRESCREEN_LOW          override the calibrated benign band (score <= LOW)
+  PRESCREEN_HIGH         override the calibrated suspicious band (score >= HIGH)
+"""
+import json
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from backend.lesion_features import PROXY_INTERCEPT, PROXY_WEIGHTS, lesion_features
+
+DEFAULT_CALIBRATION_PATH = Path(__file__).resolve().parent / "data" / "prescreen_calibration.json"
+FEATURES = tuple(PROXY_WEIGHTS)
+# Fewest samples a band must cover on the validation split to be used at all
+MIN_BAND_SAMPLES = 20
+
+
+class Prescreen:
+    """Calibrated ABCDE-proxy scorer with benign / suspicious bands (None = band disabled)."""
+
+    def __init__(
+        self,
+        intercept: float = PROXY_INTERCEPT,
+        weights: dict[str, float] | None = None,
+        low: float | None = None,
+        high: float | None = None,
+    ):
+        self.intercept = intercept
+        self.weights = dict(weights or PROXY_WEIGHTS)
+        self.low = low
+        self.high = high
+
+    @property
+    def active(self) -> bool:
+        return self.low is not None or self.high is not None
+
+    def score(self, features: dict[str, float]) -> float:
+        z = self.intercept + sum(w * features[k] for k, w in self.weights.items())
+        return 1 / (1 + math.exp(-z))
+
+    def decide(self, score: float) -> str | None:
+        """"benign", "suspicious", or None to escalate to the model."""
+        if self.low is not None and score <= self.low:
+            return "benign"
+        if self.high is not None and score >= self.high:
+            return "suspicious"
+        return None
+
+    def screen(self, image: Any) -> dict[str, Any]:
+        """Features, score and decision for a PIL image or encoded image bytes (CPU-bound; run in a thread)."""
+        features = lesion_features(image)
+        score = self.score(features)
+        return {"decision": self.decide(score), "score": round(score, 4), "band": [self.low, self.high], "features": features}
+
+    @classmethod
+    def load(cls, path: Path) -> "Prescreen":
+        data = json.loads(path.read_text())
+        return cls(data["intercept"], data["weights"], data.get("low"), data.get("high"))
+
+
+def fit_logistic(x: np.ndarray, y: np.ndarray, l2: float = 1e-3, iterations: int = 50) -> tuple[float, np.ndarray]:
+    """(intercept, weights) of an L2-regularized logistic regression, fitted by Newton's method (IRLS)."""
+    design = np.column_stack([np.ones(len(x)), x])
+    beta = np.zeros(design.shape[1])
+    penalty = l2 * np.eye(len(beta))
+    penalty[0, 0] = 0.0
+    for _ in range(iterations):
+        p = 1 / (1 + np.exp(-design @ beta))
+        gradient = design.T @ (p - y) + penalty @ beta
+        hessian = (design * (p * (1 - p))[:, None]).T @ design + penalty
+        step = np.linalg.solve(hessian, gradient)
+        beta -= step
+        if np.abs(step).max() < 1e-8:
+            break
+    return float(beta[0]), beta[1:]
+
+
+def choose_bands(
+    y: np.ndarray, p: np.ndarray, max_missed: float, min_ppv: float
+) -> tuple[float | None, float | None]:
+    """
+    Widest bands that keep local decisions safe on held-out data:
+    low = highest score whose benign band holds at most max_missed of all melanomas;
+    high = lowest score >= 0.5 whose suspicious band has precision >= min_ppv.
+    A band covering fewer than MIN_BAND_SAMPLES samples is disabled (None).
+    """
+    order = np.argsort(p, kind="stable")
+    p_sorted, y_sorted = p[order], y[order]
+    n_pos = y.sum()
+
+    low = None
+    # Melanomas at or below each score (cut only between distinct scores)
+    missed = np.cumsum(y_sorted)
+    last_of_level = np.r_[p_sorted[1:] != p_sorted[:-1], True]
+    ok = last_of_level & (missed <= max_missed * n_pos) & (p_sorted < 0.5)
+    ok &= np.arange(1, len(p) + 1) >= MIN_BAND_SAMPLES
+    if ok.any():
+        low = float(p_sorted[np.nonzero(ok)[0].max()])
+
+    high = None
+    # Precision of "score >= p_sorted[i]" for each first index of a score level
+    hits = np.cumsum(y_sorted[::-1])[::-1]
+    counts = np.arange(len(p), 0, -1)
+    first_of_level = np.r_[True, p_sorted[1:] != p_sorted[:-1]]
+    ok = first_of_level & (hits / counts >= min_ppv) & (p_sorted >= 0.5) & (counts >= MIN_BAND_SAMPLES)
+    if ok.any():
+        high = float(p_sorted[np.nonzero(ok)[0].min()])
+    return low, high
+
+
+def prescreen_from_env() -> Prescreen | None:
+    if os.environ.get("PRESCREEN_ENABLED", "").lower() not in ("1", "true", "yes"):
+        return None
+    path = Path(os.environ.get("PRESCREEN_CALIBRATION") or DEFAULT_CALIBRATION_PATH)
+    screen = Prescreen.load(path) if path.exists() else Prescreen()
+    if os.environ.get("PRESCREEN_LOW"):
+        screen.low = float(os.environ["PRESCREEN_LOW"])
+    if os.environ.get("PRESCREEN_HIGH"):
+        screen.high = float(os.environ["PRESCREEN_HIGH"])
+    return screen if screen.active else None
+
+
+_prescreen: Prescreen | None = None
+_prescreen_loaded = False
+_init_lock = threading.Lock()
+
+
+def get_prescreen() -> Prescreen | None:
+    """Process-wide pre-screen configured from env (None if disabled or uncalibrated)."""
+    global _prescreen, _prescreen_loaded
+    if not _prescreen_loaded:
+        with _init_lock:
+            if not _prescreen_loaded:
+                _prescreen = prescreen_from_env()
+                _prescreen_loaded = True
+    return _prescreen
@@ -0,0 +1,108 @@
+"""
+In-memory TTL cache for static-ish Gemini outputs (pipeline steps, demo explanations),
+with single-flight coalescing: concurrent misses for one key share one upstream call.
+
+Env:
+  STATIC_CACHE_TTL_S  TTL for cached responses (default 86400)
+  STATIC_CACHE_WARMUP warm the pipeline steps and demo explanations in the background at startup (default 1)
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+from backend import metrics
+
+# Fallback values (Gemini unavailable / failed) are kept only briefly so recovery is picked up
+FALLBACK_TTL_S = 60.0
+
+
+class AsyncTTLCache:
+    """LRU-bounded TTL cache for async computations. Not thread-safe; use from one event loop."""
+
+    def __init__(self, ttl_s: float = 86400, max_items: int = 256, name: str = "static"):
+        self.name = name
+        self.ttl_s = ttl_s
+        self.max_items = max_items
+        self._items: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        is_fallback: Callable[[Any], bool] | None = None,
+    ) -> Any:
+        """
+        Cached value for key, else await compute() once for all concurrent callers.
+        Values for which is_fallback(value) is true are cached for FALLBACK_TTL_S only.
+        Exceptions are propagated to every waiter and not cached. If the caller computing
+        the value is cancelled, a waiter takes over and computes it.
+        """
+        while True:
+            item = self._items.get(key)
+            if item is not None:
+                expires, value = item
+                if time.monotonic() < expires:
+                    self._items.move_to_end(key)
+                    self.stats["hits"] += 1
+                    metrics.CACHE_REQUESTS.inc(cache=self.name, result="hit")
+                    return value
+                del self._items[key]
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.stats["coalesced"] += 1
+            metrics.CACHE_REQUESTS.inc(cache=self.name, result="coalesced")
+            try:
+                # shield: a cancelled waiter must not cancel the shared call
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Our own cancellation propagates; the leader's means retry (likely as the new leader)
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        self.stats["misses"] += 1
+        metrics.CACHE_REQUESTS.inc(cache=self.name, result="miss")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except BaseException as e:
+            if not isinstance(e, asyncio.CancelledError):
+                future.set_exception(e)
+                # Mark retrieved so an exception nobody else awaited is not logged
+                future.exception()
+            else:
+                future.cancel()
+            raise
+        else:
+            ttl = FALLBACK_TTL_S if is_fallback is not None and is_fallback(value) else self.ttl_s
+            self._items[key] = (time.monotonic() + ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Counters plus the current number of entries (expired ones included until next touched)."""
+        return {**self.stats, "entries": len(self)}
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+static_cache = AsyncTTLCache(ttl_s=float(os.environ.get("STATIC_CACHE_TTL_S", "86400")))
+
+
+def warmup_enabled() -> bool:
+    return os.environ.get("STATIC_CACHE_WARMUP", "1").lower() not in ("0", "false", "no")
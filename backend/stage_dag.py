@@ -0,0 +1,114 @@
+"""
+Small stage DAG executor for the pipeline.
+Independent stages run concurrently: async stages on the event loop,
+CPU-bound stages in a shared thread pool. Records per-stage wall-clock
+timings (also exported as metrics) and the critical path.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from backend import metrics
+
+_cpu_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("PIPELINE_CPU_WORKERS", "4")),
+    thread_name_prefix="pipeline-cpu",
+)
+
+
+class Stage:
+    """
+    One pipeline stage. fn is called with the results of deps as keyword arguments.
+    kind: "async" (fn is a coroutine function), "thread" (run fn in the CPU pool) or "inline".
+    """
+
+    def __init__(self, name: str, fn: Callable[..., Any], deps: tuple[str, ...] = (), kind: str = "inline"):
+        if kind not in ("async", "thread", "inline"):
+            raise ValueError(f"Unknown stage kind: {kind}")
+        self.name = name
+        self.fn = fn
+        self.deps = deps
+        self.kind = kind
+
+
+async def run_stages(stages: list[Stage]) -> tuple[dict[str, Any], dict[str, Any]]:
+    """
+    Execute stages respecting deps. Returns (results_by_stage, timings) where timings is
+    {"wall_ms", "stages": {name: {start_ms, end_ms, duration_ms, kind, deps}}, "critical_path": [names]}.
+    Raises the first stage exception after cancelling the remaining stages.
+    """
+    by_name = {s.name: s for s in stages}
+    for s in stages:
+        missing = [d for d in s.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"Stage {s.name} depends on unknown stage(s): {missing}")
+
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+    results: dict[str, Any] = {}
+    stage_timings: dict[str, dict[str, Any]] = {}
+    tasks: dict[str, asyncio.Task] = {}
+
+    async def execute(stage: Stage) -> Any:
+        if stage.deps:
+            await asyncio.gather(*(tasks[d] for d in stage.deps))
+        kwargs = {d: results[d] for d in stage.deps}
+        start = time.perf_counter()
+        try:
+            if stage.kind == "async":
+                value = await stage.fn(**kwargs)
+            elif stage.kind == "thread":
+                # Copy the context (as asyncio.to_thread does) so spans recorded in the stage are kept
+                ctx = contextvars.copy_context()
+                value = await loop.run_in_executor(_cpu_pool, ctx.run, functools.partial(stage.fn, **kwargs))
+            else:
+                value = stage.fn(**kwargs)
+        except Exception as e:
+            metrics.error(f"stage:{stage.name}", e)
+            raise
+        end = time.perf_counter()
+        metrics.STAGE_SECONDS.observe(end - start, stage=stage.name)
+        results[stage.name] = value
+        stage_timings[stage.name] = {
+            "start_ms": round((start - t0) * 1000, 3),
+            "end_ms": round((end - t0) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+            "kind": stage.kind,
+            "deps": list(stage.deps),
+        }
+        return value
+
+    # Create every task before any runs so dependents can always find their deps
+    for s in stages:
+        tasks[s.name] = loop.create_task(execute(s))
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+
+    timings = {
+        "wall_ms": round((time.perf_counter() - t0) * 1000, 3),
+        "stages": stage_timings,
+        "critical_path": critical_path(stage_timings),
+    }
+    return results, timings
+
+
+def critical_path(stage_timings: dict[str, dict[str, Any]]) -> list[str]:
+    """Walk back from the last-finishing stage through the latest-finishing dependency."""
+    if not stage_timings:
+        return []
+    name = max(stage_timings, key=lambda n: stage_timings[n]["end_ms"])
+    path = [name]
+    while stage_timings[name]["deps"]:
+        name = max(stage_timings[name]["deps"], key=lambda n: stage_timings[n]["end_ms"])
+        path.append(name)
+    return path[::-1]
+
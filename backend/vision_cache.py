@@ -0,0 +1,219 @@
+"""
+Content-addressed cache for vision model results.
+Two tiers: an in-process LRU and an on-disk SQLite table under backend/data/.
+Keys hash the image content hash, prompt version, model name and normalized patient context.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from backend import metrics
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent / "data" / "vision_cache.sqlite"
+
+
+def normalize_patient_context(patient_context: dict | None) -> dict[str, str]:
+    """Drop empty values and normalize the rest so equivalent contexts share a key."""
+    if not patient_context:
+        return {}
+    return {
+        str(k).strip().lower(): str(v).strip().lower()
+        for k, v in sorted(patient_context.items())
+        if v not in (None, "")
+    }
+
+
+def vision_cache_key(image_sha256: str, prompt_version: str, model_name: str, patient_context: dict | None) -> str:
+    """sha256 over the image content hash (hex) + prompt version + model + normalized context."""
+    h = hashlib.sha256()
+    h.update(image_sha256.encode("ascii") + b"\0")
+    h.update(prompt_version.encode("utf-8") + b"\0")
+    h.update(model_name.encode("utf-8") + b"\0")
+    h.update(json.dumps(normalize_patient_context(patient_context), sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+class VisionCache:
+    """
+    Two-tier result cache. get/put are thread-safe.
+    memory_max_items bounds the LRU; disk_max_bytes bounds the SQLite table (oldest-accessed evicted first).
+    Hits only buffer their access time; the buffer is written in one transaction every
+    _FLUSH_ITEMS hits or _FLUSH_S seconds, and before each put's eviction. The table size is
+    tracked as a running total, re-read every _RESYNC_EVERY puts since other workers share the file.
+    """
+
+    _FLUSH_ITEMS = 64
+    _FLUSH_S = 30.0
+    _RESYNC_EVERY = 100
+
+    def __init__(
+        self,
+        db_path: Path | None = DEFAULT_DB_PATH,
+        memory_max_items: int = 512,
+        disk_max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.memory_max_items = memory_max_items
+        self.disk_max_bytes = disk_max_bytes
+        self._lru: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self._touched: dict[str, float] = {}
+        self._last_flush = time.monotonic()
+        self._disk_bytes: int | None = None
+        self._disk_puts = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "puts": 0, "evictions": 0}
+        if db_path is not None:
+            try:
+                db_path.parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS vision_cache ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS vision_cache_access ON vision_cache(last_access)")
+                self._db.commit()
+            except sqlite3.Error:
+                self._db = None
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                metrics.CACHE_REQUESTS.inc(cache="vision", result="memory_hit")
+                # Hot entries served from memory must not age out of the disk tier either
+                self._touch(key)
+                return json.loads(value)
+            if self._db is not None:
+                try:
+                    row = self._db.execute("SELECT value FROM vision_cache WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        self._touch(key)
+                        self._remember(key, row[0])
+                        self.stats["disk_hits"] += 1
+                        metrics.CACHE_REQUESTS.inc(cache="vision", result="disk_hit")
+                        return json.loads(row[0])
+                except sqlite3.Error:
+                    pass
+            self.stats["misses"] += 1
+            metrics.CACHE_REQUESTS.inc(cache="vision", result="miss")
+            return None
+
+    def put(self, key: str, result: dict[str, Any]) -> None:
+        value = json.dumps(result)
+        with self._lock:
+            self._remember(key, value)
+            self.stats["puts"] += 1
+            if self._db is None:
+                return
+            try:
+                self._flush_touches()
+                old = self._db.execute("SELECT size FROM vision_cache WHERE key = ?", (key,)).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO vision_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, value, len(value), time.time()),
+                )
+                self._disk_puts += 1
+                if self._disk_bytes is None or self._disk_puts % self._RESYNC_EVERY == 0:
+                    self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM vision_cache").fetchone()[0]
+                else:
+                    self._disk_bytes += len(value) - (old[0] if old else 0)
+                self._evict_disk()
+                self._db.commit()
+            except sqlite3.Error:
+                self._db.rollback()
+                self._disk_bytes = None
+
+    def snapshot(self) -> dict[str, Any]:
+        """Counters plus current tier sizes."""
+        with self._lock:
+            disk_entries, disk_bytes = 0, 0
+            if self._db is not None:
+                try:
+                    disk_entries, disk_bytes = self._db.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM vision_cache"
+                    ).fetchone()
+                except sqlite3.Error:
+                    pass
+            return {
+                **self.stats,
+                "memory_entries": len(self._lru),
+                "disk_entries": disk_entries,
+                "disk_bytes": disk_bytes,
+            }
+
+    def _remember(self, key: str, value: str) -> None:
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_max_items:
+            self._lru.popitem(last=False)
+
+    def _touch(self, key: str) -> None:
+        """Buffer a disk access-time update; flush the buffer when it is full or old. Caller holds the lock."""
+        if self._db is None:
+            return
+        self._touched[key] = time.time()
+        if len(self._touched) >= self._FLUSH_ITEMS or time.monotonic() - self._last_flush >= self._FLUSH_S:
+            try:
+                self._flush_touches()
+                self._db.commit()
+            except sqlite3.Error:
+                pass
+
+    def _flush_touches(self) -> None:
+        """Write buffered access times (the caller commits)."""
+        if self._touched:
+            self._db.executemany(
+                "UPDATE vision_cache SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._touched.items()],
+            )
+            self._touched.clear()
+        self._last_flush = time.monotonic()
+
+    def _evict_disk(self) -> None:
+        while self._disk_bytes > self.disk_max_bytes:
+            rows = self._db.execute("SELECT key, size FROM vision_cache ORDER BY last_access LIMIT 64").fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                return
+            for key, size in rows:
+                if self._disk_bytes <= self.disk_max_bytes:
+                    return
+                self._db.execute("DELETE FROM vision_cache WHERE key = ?", (key,))
+                self._disk_bytes -= size
+                self.stats["evictions"] += 1
+
+
+def _cache_from_env() -> VisionCache | None:
+    if os.environ.get("VISION_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    db_path = os.environ.get("VISION_CACHE_PATH")
+    return VisionCache(
+        db_path=Path(db_path) if db_path else DEFAULT_DB_PATH,
+        memory_max_items=int(os.environ.get("VISION_CACHE_MEMORY_ITEMS", "512")),
+        disk_max_bytes=int(os.environ.get("VISION_CACHE_DISK_MB", "64")) * 1024 * 1024,
+    )
+
+
+_vision_cache: VisionCache | None = None
+_vision_cache_loaded = False
+_init_lock = threading.Lock()
+
+
+def get_vision_cache() -> VisionCache | None:
+    """Process-wide cache configured from env (None if VISION_CACHE_DISABLED)."""
+    global _vision_cache, _vision_cache_loaded
+    if not _vision_cache_loaded:
+        with _init_lock:
+            if not _vision_cache_loaded:
+                _vision_cache = _cache_from_env()
+                _vision_cache_loaded = True
+    return _vision_cache
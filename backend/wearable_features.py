@@ -0,0 +1,277 @@
+"""
+Windowed time-series features for wearables CSVs.
+Rows are folded chunk-by-chunk into fixed time bins (sums, shifted sums of squares,
+counts), so memory depends on the time span, not the row count. Rolling statistics,
+trends, desaturation episodes and per-window health scores are computed on the
+binned series with vectorized pandas/NumPy.
+"""
+import warnings
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+# Width of the base aggregation bins
+BIN_SECONDS = 60
+# Window for rolling variability
+ROLLING_WINDOW = "60min"
+# Window used for per-window health scores (drives var_health / ci_health)
+SCORING_WINDOW_SECONDS = 3600
+# SpO2 below this (bin mean) counts as desaturated
+DESATURATION_THRESHOLD = 92.0
+# Compact accumulated bin tables after this many chunks
+_COMPACT_EVERY = 32
+_SIGNALS = ("hr", "spo2")
+
+
+def resolve_columns(columns: list[str]) -> dict[str, str | None]:
+    """Map roles (timestamp, hr, spo2, activity) to CSV header names."""
+    cols = [c.lower() for c in columns]
+    hr_col = spo2_col = None
+    if "heart_rate" in cols or "hr" in cols or "bpm" in str(cols):
+        hr_col = next((c for c in columns if "heart" in c.lower() or c.lower() == "hr" or "bpm" in c.lower()), None)
+    if "spo2" in cols or "oxygen" in cols:
+        spo2_col = next((c for c in columns if "spo2" in c.lower() or "oxygen" in c.lower()), None)
+    ts_col = next((c for c in columns if c.lower() in ("timestamp", "time", "datetime", "date")), None)
+    activity_col = next((c for c in columns if "activity" in c.lower()), None)
+    return {"timestamp": ts_col, "hr": hr_col, "spo2": spo2_col, "activity": activity_col}
+
+
+def health_score(hr_mean, spo2_mean) -> np.ndarray:
+    """
+    Vectorized demo heuristic: elevated/low HR and low SpO2 raise/lower p_health.
+    NaN inputs leave the neutral 0.5 (or the HR-derived value) untouched.
+    """
+    hr = np.asarray(hr_mean, dtype="float64")
+    spo2 = np.asarray(spo2_mean, dtype="float64")
+    p = np.full(np.broadcast(hr, spo2).shape, 0.5)
+    with np.errstate(invalid="ignore"):
+        p = np.where(hr > 100, np.minimum(0.75, 0.5 + (hr - 100) / 200), p)
+        p = np.where(hr < 60, np.maximum(0.25, 0.5 - (60 - hr) / 200), p)
+        p = np.where(spo2 < 95, np.minimum(0.8, 0.5 + (95 - spo2) / 50), p)
+    return np.clip(p, 0.0, 1.0)
+
+
+class WindowedFeatureEngine:
+    """Accumulate wearables chunks into time bins, then compute windowed features once."""
+
+    def __init__(self, columns: dict[str, str | None]):
+        self.columns = columns
+        self.rows = 0
+        self._signals = [s for s in _SIGNALS if columns[s] is not None]
+        # Per-bin accumulators, in this order: <signal>_sum, <signal>_sq, <signal>_n per signal
+        self._fields = [f"{s}_{k}" for s in self._signals for k in ("sum", "sq", "n")]
+        self._shift: dict[str, float] = {}
+        self._parts: list[tuple[np.ndarray, np.ndarray]] = []
+        self._activity: dict[str, list[float]] = {}
+
+    def usecols(self) -> list[str]:
+        return [c for c in self.columns.values() if c is not None]
+
+    def dtypes(self) -> dict[str, str]:
+        """read_csv dtypes for the projected columns."""
+        dtypes = {self.columns[s]: "float64" for s in _SIGNALS if self.columns[s] is not None}
+        if self.columns["activity"] is not None:
+            dtypes[self.columns["activity"]] = "category"
+        return dtypes
+
+    def add_chunk(self, chunk: pd.DataFrame) -> None:
+        n = len(chunk)
+        if n == 0:
+            return
+        ts_col = self.columns["timestamp"]
+        if ts_col is not None:
+            seconds, valid = epoch_seconds(chunk[ts_col])
+        else:
+            # No timestamps: treat rows as one sample per minute
+            valid = np.ones(n, dtype=bool)
+            seconds = (np.arange(self.rows, self.rows + n, dtype="int64")) * 60
+        self.rows += n
+        if not self._signals or not valid.any():
+            return
+
+        values = []
+        for signal in self._signals:
+            v = chunk[self.columns[signal]].to_numpy(dtype="float64")[valid]
+            present = ~np.isnan(v)
+            if signal not in self._shift and present.any():
+                self._shift[signal] = float(v[present].mean())
+            centered = np.where(present, v - self._shift.get(signal, 0.0), 0.0)
+            values += [centered, centered * centered, present.astype("float64")]
+        self._parts.append(_bin_sums(seconds[valid] // BIN_SECONDS, np.stack(values)))
+
+        act_col, hr_col = self.columns["activity"], self.columns["hr"]
+        if act_col is not None and hr_col is not None:
+            self._add_activity(chunk[act_col][valid], chunk[hr_col].to_numpy(dtype="float64")[valid])
+
+        if len(self._parts) >= _COMPACT_EVERY:
+            self._parts = [self._merged()]
+
+    def _add_activity(self, activity: pd.Series, hr: np.ndarray) -> None:
+        """HR sums and counts per activity label, via bincount over the categorical codes."""
+        if not isinstance(activity.dtype, pd.CategoricalDtype):
+            activity = activity.astype("category")
+        codes = activity.cat.codes.to_numpy()
+        ok = (codes >= 0) & ~np.isnan(hr)
+        k = len(activity.cat.categories)
+        sums = np.bincount(codes[ok], weights=hr[ok], minlength=k)
+        counts = np.bincount(codes[ok], minlength=k)
+        for label, total, count in zip(activity.cat.categories, sums, counts):
+            if count:
+                acc = self._activity.setdefault(str(label).strip().lower(), [0.0, 0])
+                acc[0] += float(total)
+                acc[1] += int(count)
+
+    def _merged(self) -> tuple[np.ndarray, np.ndarray]:
+        if len(self._parts) == 1:
+            return self._parts[0]
+        return _bin_sums(
+            np.concatenate([bins for bins, _ in self._parts]),
+            np.concatenate([sums for _, sums in self._parts], axis=1),
+        )
+
+    def finalize(self) -> dict[str, Any]:
+        """Features, window scores and derived uncertainty. Empty dict if no usable data."""
+        if not self._parts:
+            return {}
+        bin_ids, sums = self._merged()
+        bins = pd.DataFrame(sums.T, index=bin_ids, columns=self._fields)
+        bin_start = bins.index.to_numpy() * BIN_SECONDS
+        hours = (bin_start - bin_start[0]) / 3600.0
+        index = pd.to_datetime(bin_start, unit="s")
+        features: dict[str, Any] = {
+            "time_span_hours": float(hours[-1]) if len(hours) else 0.0,
+            "n_bins": int(len(bins)),
+        }
+
+        means = {}
+        for signal in _SIGNALS:
+            if f"{signal}_n" not in bins:
+                continue
+            n = bins[f"{signal}_n"].to_numpy(dtype="float64")
+            s = bins[f"{signal}_sum"].to_numpy()
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = s / n + self._shift.get(signal, 0.0)
+            means[signal] = mean
+            has = n > 0
+            features[f"{signal}_trend_per_hour"] = _weighted_slope(hours[has], mean[has], n[has])
+
+            rolled = pd.DataFrame(
+                {"s": s, "sq": bins[f"{signal}_sq"].to_numpy(), "n": n}, index=index
+            ).rolling(ROLLING_WINDOW).sum()
+            with np.errstate(invalid="ignore", divide="ignore"):
+                rvar = (rolled["sq"] - rolled["s"] ** 2 / rolled["n"]) / (rolled["n"] - 1)
+            rstd = np.sqrt(rvar.where(rolled["n"] > 1).clip(lower=0)).dropna()
+            features[f"{signal}_rolling_std_mean"] = _maybe_float(rstd.mean()) if len(rstd) else None
+            features[f"{signal}_rolling_std_max"] = _maybe_float(rstd.max()) if len(rstd) else None
+
+        if "spo2" in means:
+            spo2 = means["spo2"]
+            has = ~np.isnan(spo2)
+            below = spo2[has] < DESATURATION_THRESHOLD
+            starts = bin_start[has]
+            # Consecutive observed bins belong to one episode unless separated by a gap
+            # well beyond the typical sampling interval
+            gaps = np.diff(starts)
+            max_gap = max(BIN_SECONDS, 1.5 * float(np.median(gaps))) if len(gaps) else BIN_SECONDS
+            contiguous = np.concatenate([[False], gaps <= max_gap])
+            prev_below = np.concatenate([[False], below[:-1]])
+            features["desaturation_episodes"] = int(np.sum(below & ~(prev_below & contiguous)))
+            n_spo2 = bins["spo2_n"].to_numpy()[has]
+            features["desaturation_fraction"] = (
+                float(n_spo2[below].sum() / n_spo2.sum()) if n_spo2.sum() else 0.0
+            )
+
+        if self._activity:
+            features["hr_by_activity"] = {
+                k: round(total / count, 6) for k, (total, count) in sorted(self._activity.items())
+            }
+
+        # Per-window health scores over SCORING_WINDOW_SECONDS windows
+        window = bin_start // SCORING_WINDOW_SECONDS
+        window_means = {}
+        for signal in means:
+            agg = pd.DataFrame({
+                "w": window,
+                "s": bins[f"{signal}_sum"].to_numpy(),
+                "n": bins[f"{signal}_n"].to_numpy(),
+            }).groupby("w").sum()
+            with np.errstate(invalid="ignore", divide="ignore"):
+                window_means[signal] = agg["s"] / agg["n"] + self._shift.get(signal, 0.0)
+        windows = pd.DataFrame(window_means)
+        window_p = health_score(
+            windows["hr"] if "hr" in windows else np.nan,
+            windows["spo2"] if "spo2" in windows else np.nan,
+        )
+        features["n_windows"] = int(len(window_p))
+        features["window_p_std"] = float(np.std(window_p, ddof=1)) if len(window_p) > 1 else 0.0
+        return features
+
+
+def epoch_seconds(timestamps: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (Unix seconds as int64, valid mask) for a timestamp column. Numeric columns are epochs
+    (seconds, or milliseconds when the values are that large). Strings go through NumPy's
+    fixed-format ISO 8601 parser, which is several times faster than pandas' per-value
+    parsing; chunks it rejects (blanks, other formats) fall back to pd.to_datetime.
+    """
+    n = len(timestamps)
+    if pd.api.types.is_numeric_dtype(timestamps.dtype):
+        values = timestamps.to_numpy(dtype="float64")
+        valid = ~np.isnan(values)
+        if valid.any() and np.nanmedian(np.abs(values)) > 1e11:
+            values = values / 1000
+        seconds = np.zeros(n, dtype="int64")
+        seconds[valid] = np.floor(values[valid]).astype("int64")
+        return seconds, valid
+    try:
+        with warnings.catch_warnings():
+            # Offsets such as +02:00 / Z are applied (converted to UTC); numpy warns about that
+            warnings.simplefilter("ignore", UserWarning)
+            # np.asarray on the string array is a zero-copy view; to_numpy would re-scan it for missing values
+            seconds = np.asarray(timestamps.array).astype("datetime64[s]").astype("int64")
+        # "NaT" parses to int64 min; mask it like the fallback path does
+        valid = seconds != np.iinfo(np.int64).min
+        seconds[~valid] = 0
+        return seconds, valid
+    except (ValueError, TypeError, OverflowError):
+        pass
+    ts = pd.to_datetime(timestamps, errors="coerce", format="ISO8601", utc=True)
+    valid = ts.notna().to_numpy()
+    seconds = np.zeros(n, dtype="int64")
+    seconds[valid] = ts[valid].dt.tz_localize(None).to_numpy().astype("datetime64[s]").astype("int64")
+    return seconds, valid
+
+
+def _bin_sums(bins: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sum each row of values (fields x samples) per integer bin id with np.bincount.
+    Returns (sorted distinct bin ids, fields x bins sums). Dense offsets from the smallest id
+    are used when the ids span a range comparable to the sample count (the usual, time-ordered
+    case); sparse ids (gaps of years, stray rows) are first compacted with np.unique.
+    """
+    lo = bins.min()
+    offsets = bins - lo
+    span = int(offsets.max()) + 1
+    if span <= 4 * len(bins) + 1024:
+        occupied = np.bincount(offsets, minlength=span) > 0
+        sums = np.stack([np.bincount(offsets, weights=v, minlength=span)[occupied] for v in values])
+        return np.nonzero(occupied)[0] + lo, sums
+    ids, inverse = np.unique(bins, return_inverse=True)
+    return ids, np.stack([np.bincount(inverse, weights=v, minlength=len(ids)) for v in values])
+
+
+def _weighted_slope(x: np.ndarray, y: np.ndarray, w: np.ndarray) -> float | None:
+    """Count-weighted least-squares slope of y on x, or None if undefined."""
+    if len(x) < 2 or w.sum() <= 0:
+        return None
+    xm = np.average(x, weights=w)
+    ym = np.average(y, weights=w)
+    denom = np.sum(w * (x - xm) ** 2)
+    if denom <= 0:
+        return None
+    return float(np.sum(w * (x - xm) * (y - ym)) / denom)
+
+
+def _maybe_float(x) -> float | None:
+    return None if x is None or pd.isna(x) else float(x)
@@ -118,6 +118,18 @@ export default function BenchmarkPage() {
           </div>
         )}
 
+        {!!result?.n_fallback && (
+          <div className="mb-6 rounded-lg bg-amber-900/30 p-4 text-amber-300">
+            {result.n_fallback} image(s) hit the vision fallback and were excluded from the metrics.
+          </div>
+        )}
+
+        {!!result?.n_skipped && (
+          <div className="mb-6 rounded-lg bg-amber-900/30 p-4 text-amber-300">
+            {result.n_skipped} image(s) could not be read and were skipped.
+          </div>
+        )}
+
         {result?.metrics && (
           <div className="space-y-6">
             <div className="rounded-xl border border-slate-700 bg-slate-900/50 p-6">
@@ -147,8 +159,44 @@ export default function BenchmarkPage() {
                 Evaluated on {result.metrics.n_samples} images ({result.metrics.n_melanoma} melanoma, {result.metrics.n_non_melanoma} non-melanoma).
                 TP={result.metrics.tp} TN={result.metrics.tn} FP={result.metrics.fp} FN={result.metrics.fn}
               </p>
+              {result.metrics.ci95?.auc && (
+                <p className="mt-1 text-sm text-slate-500">
+                  95% bootstrap CI: AUC {result.metrics.ci95.auc[0].toFixed(3)}–{result.metrics.ci95.auc[1].toFixed(3)}
+                </p>
+              )}
             </div>
 
+            {result.metrics.roc_curve && result.metrics.pr_curve && (
+              <div className="rounded-xl border border-slate-700 bg-slate-900/50 p-6">
+                <h2 className="mb-4 text-lg font-semibold text-slate-200">Threshold sweep</h2>
+                <div className="grid gap-6 md:grid-cols-2">
+                  <CurveChart
+                    title={`ROC (AUC ${result.metrics.auc.toFixed(3)})`}
+                    xLabel="False positive rate"
+                    yLabel="True positive rate"
+                    xs={result.metrics.roc_curve.fpr}
+                    ys={result.metrics.roc_curve.tpr}
+                    diagonal
+                  />
+                  <CurveChart
+                    title={`Precision-recall (AP ${(result.metrics.average_precision ?? 0).toFixed(3)})`}
+                    xLabel="Recall"
+                    yLabel="Precision"
+                    xs={result.metrics.pr_curve.recall}
+                    ys={result.metrics.pr_curve.precision}
+                  />
+                </div>
+                <p className="mt-4 text-sm text-slate-500">
+                  {result.metrics.best_f1 && (
+                    <>Best F1 {result.metrics.best_f1.f1.toFixed(3)} at threshold {result.metrics.best_f1.threshold.toFixed(3)}. </>
+                  )}
+                  {result.metrics.youden && (
+                    <>Youden J {result.metrics.youden.j.toFixed(3)} at threshold {result.metrics.youden.threshold.toFixed(3)}.</>
+                  )}
+                </p>
+              </div>
+            )}
+
             <div>
               <button
                 onClick={() => setShowSamples(!showSamples)}
@@ -222,3 +270,35 @@ function MetricCard({
     </div>
   );
 }
+
+function CurveChart({
+  title,
+  xLabel,
+  yLabel,
+  xs,
+  ys,
+  diagonal = false,
+}: {
+  title: string;
+  xLabel: string;
+  yLabel: string;
+  xs: number[];
+  ys: number[];
+  diagonal?: boolean;
+}) {
+  const size = 200;
+  const points = xs.map((x, i) => `${(x * size).toFixed(1)},${((1 - ys[i]) * size).toFixed(1)}`).join(" ");
+  return (
+    <div>
+      <div className="mb-2 text-sm text-slate-400">{title}</div>
+      <svg viewBox={`-8 -8 ${size + 16} ${size + 16}`} className="w-full max-w-xs" role="img" aria-label={title}>
+        <rect x={0} y={0} width={size} height={size} className="fill-slate-800 stroke-slate-700" />
+        {diagonal && <line x1={0} y1={size} x2={size} y2={0} className="stroke-slate-600" strokeDasharray="4 4" />}
+        <polyline points={points} fill="none" className="stroke-cyan-400" strokeWidth={2} />
+      </svg>
+      <div className="mt-1 text-xs text-slate-500">
+        x: {xLabel} · y: {yLabel}
+      </div>
+    </div>
+  );
+}
@@ -3,7 +3,7 @@
 import { use, useEffect, useState } from "react";
 import Link from "next/link";
 import { useRouter } from "next/navigation";
-import { createCase, getCase, getRandomHamImage, postCaseChat, runCase, getDemoExplanation, getPipelineSteps, type CaseData, type RunResult, type PipelineStep } from "@/lib/api";
+import { createCase, getCase, getRandomHamImage, streamCaseChat, runCase, runCaseStream, refreshCaseReasoning, getDemoExplanation, getPipelineSteps, type CaseData, type RunResult, type PipelineStep } from "@/lib/api";
 import { getErrorMessage } from "@/lib/error-utils";
 import { buildDagFromResult, buildSkeletonDag } from "@/lib/dag-data";
 import { DagCanvas } from "@/components/dag-canvas";
@@ -18,6 +18,8 @@ export default function CasePage({ params }: { params: Promise<{ id: string }> }
   const [caseData, setCaseData] = useState<CaseData | null>(null);
   const [loading, setLoading] = useState(true);
   const [running, setRunning] = useState(false);
+  const [refreshing, setRefreshing] = useState(false);
+  const [writingReasoning, setWritingReasoning] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [tab, setTab] = useState<Tab>("dag");
   const [lambda, setLambda] = useState(0.5);
@@ -50,12 +52,43 @@ export default function CasePage({ params }: { params: Promise<{ id: string }> }
     setRunning(true);
     setError(null);
     try {
-      await runCase(id, lambda, conservative);
+      // With a previous result, only rescore (the narrative is kept and flagged reasoning_stale).
+      // Scores are shown as soon as fusion is done; the narrative follows.
+      const incremental = !!caseData?.result;
+      await runCaseStream(id, lambda, conservative, incremental, {
+        onScores: (scores) => {
+          setCaseData((prev) =>
+            prev
+              ? {
+                  ...prev,
+                  result: incremental
+                    ? { ...prev.result, ...scores }
+                    : { ...scores, node_reasoning: {}, clinician_report: "", patient_summary: "" },
+                }
+              : prev
+          );
+          if (!incremental) setWritingReasoning(true);
+        },
+      });
       await loadCase();
     } catch (e) {
       setError(String(e));
     } finally {
       setRunning(false);
+      setWritingReasoning(false);
+    }
+  };
+
+  const handleRefreshReasoning = async () => {
+    setRefreshing(true);
+    setError(null);
+    try {
+      await refreshCaseReasoning(id);
+      await loadCase();
+    } catch (e) {
+      setError(String(e));
+    } finally {
+      setRefreshing(false);
     }
   };
 
@@ -159,6 +192,27 @@ export default function CasePage({ params }: { params: Promise<{ id: string }> }
           </div>
         )}
 
+        {writingReasoning && (
+          <div className="mb-4 rounded-lg border border-cyan-500/30 bg-cyan-500/10 px-4 py-3 text-sm text-cyan-200" role="status">
+            Scores are ready. Writing the clinical reasoning...
+          </div>
+        )}
+
+        {result?.reasoning_stale && (
+          <div className="mb-4 flex flex-wrap items-center justify-between gap-3 rounded-lg border border-amber-500/30 bg-amber-500/10 px-4 py-3">
+            <p className="text-sm text-amber-200">
+              Scores were updated without re-running the AI reasoning; explanations and reports are from the previous run.
+            </p>
+            <button
+              onClick={handleRefreshReasoning}
+              disabled={refreshing || running}
+              className="rounded-lg border border-amber-500/50 px-4 py-1.5 text-sm font-medium text-amber-200 disabled:opacity-50 disabled:cursor-not-allowed hover:bg-amber-500/20"
+            >
+              {refreshing ? "Refreshing..." : "Refresh reasoning"}
+            </button>
+          </div>
+        )}
+
         {tab === "dag" && (
           <DagTab result={result} onRun={handleRun} running={running} lambda={lambda} setLambda={setLambda} conservative={conservative} setConservative={setConservative} pipelineSteps={pipelineSteps} />
         )}
@@ -350,6 +404,19 @@ function DagTab({
       {result && (
         <div className="rounded-xl border border-slate-700 bg-slate-900/50 p-4">
           <h3 className="text-sm font-semibold text-slate-300 mb-2">Summary</h3>
+          {result.fallbacks && Object.keys(result.fallbacks).length > 0 && (
+            <p className="mb-3 rounded-lg bg-amber-900/30 p-2 text-xs text-amber-300">
+              Model unavailable for {Object.entries(result.fallbacks)
+                .map(([stage, f]) => `${stage} (${f.reason})`)
+                .join(", ")}; local fallback output shown.
+            </p>
+          )}
+          {result.prescreen && (
+            <p className="mb-3 rounded-lg bg-slate-800 p-2 text-xs text-slate-400">
+              Vision stage resolved by the local pre-screen as {result.prescreen.decision} (score{" "}
+              {result.prescreen.score.toFixed(2)}); no vision model call was made.
+            </p>
+          )}
           <div className="grid grid-cols-2 md:grid-cols-3 gap-4 text-sm">
             <div>
               <p className="text-slate-500">Clinician Report</p>
@@ -685,6 +752,8 @@ function ChatTab({
   const [input, setInput] = useState("");
   const [sending, setSending] = useState(false);
   const [chatError, setChatError] = useState<string | null>(null);
+  // Question being answered and the reply streamed so far (until the case reloads)
+  const [pending, setPending] = useState<{ question: string; reply: string } | null>(null);
   const chatHistory = caseData?.chat_history || [];
   const hasResult = !!caseData?.result;
 
@@ -694,13 +763,17 @@ function ChatTab({
     setSending(true);
     setChatError(null);
     setInput("");
+    setPending({ question: msg, reply: "" });
     try {
-      await postCaseChat(caseId, msg);
+      await streamCaseChat(caseId, msg, (text) =>
+        setPending((p) => (p ? { ...p, reply: p.reply + text } : p))
+      );
       onMessage();
     } catch (e) {
       setChatError(String(e));
       setInput(msg);
     } finally {
+      setPending(null);
       setSending(false);
     }
   };
@@ -729,7 +802,7 @@ function ChatTab({
         <p className="text-sm text-slate-500">Ask follow-up questions about this case. Gemini has full context.</p>
       </div>
       <div className="flex-1 overflow-y-auto p-4 space-y-4 min-h-[300px] max-h-[400px]">
-        {chatHistory.length === 0 ? (
+        {chatHistory.length === 0 && !pending ? (
           <p className="text-slate-500 text-sm">No messages yet. Ask a question below.</p>
         ) : (
           chatHistory.map((m, i) => (
@@ -752,6 +825,22 @@ function ChatTab({
             </div>
           ))
         )}
+        {pending && (
+          <>
+            <div className="flex justify-end">
+              <div className="max-w-[85%] rounded-lg px-4 py-2 text-sm bg-cyan-600 text-white">
+                <span className="text-xs opacity-75 block mb-1">You</span>
+                {pending.question}
+              </div>
+            </div>
+            <div className="flex justify-start">
+              <div className="max-w-[85%] rounded-lg px-4 py-2 text-sm bg-slate-700 text-slate-200">
+                <span className="text-xs opacity-75 block mb-1">Assistant</span>
+                {pending.reply || "..."}
+              </div>
+            </div>
+          </>
+        )}
       </div>
       {chatError && (
         <div className="px-4 py-2 bg-red-900/30 text-red-300 text-sm">
@@ -6,6 +6,7 @@ import {
   createCase,
   getRandomHamImage,
   getHamStatus,
+  hamImageUrl,
   type HamImageResponse,
   type HamStatus,
 } from "@/lib/api";
@@ -169,7 +170,7 @@ export default function NewCasePage() {
                   Selected: {selectedHamImage.image_id} (Type: {selectedHamImage.dx})
                 </p>
                 <img
-                  src={`data:${selectedHamImage.mime_type};base64,${selectedHamImage.image_base64}`}
+                  src={hamImageUrl(selectedHamImage.thumbnail_url)}
                   alt="Selected lesion"
                   className="mt-2 max-h-48 rounded-lg border border-slate-600 object-contain"
                 />
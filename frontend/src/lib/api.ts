@@ -52,14 +52,20 @@ export async function createCase(formData: CreateCaseFormData): Promise<{ case_i
 export async function runCase(
   id: string,
   lambda: number = 0.5,
-  conservative: boolean = false
+  conservative: boolean = false,
+  incremental: boolean = false,
+  fusedCall?: boolean
 ): Promise<RunResult> {
   return fetchApi<RunResult>(`/cases/${id}/run`, {
     method: "POST",
-    body: JSON.stringify({ lambda_: lambda, conservative }),
+    body: JSON.stringify({ lambda_: lambda, conservative, incremental, fused_call: fusedCall }),
   });
 }
 
+export async function refreshCaseReasoning(id: string): Promise<RunResult> {
+  return fetchApi<RunResult>(`/cases/${id}/reasoning`, { method: "POST" });
+}
+
 export async function getCase(id: string): Promise<CaseData> {
   return fetchApi<CaseData>(`/cases/${id}`);
 }
@@ -71,6 +77,150 @@ export async function postCaseChat(id: string, message: string): Promise<{ reply
   });
 }
 
+/**
+ * POST to a Server-Sent Events endpoint and dispatch each event as it arrives.
+ * Rejects on HTTP errors and on an "error" event.
+ */
+async function streamSse(
+  path: string,
+  body: unknown,
+  onEvent: (event: string, data: any) => void
+): Promise<void> {
+  const res = await fetch(`${BASE}${path}`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+    body: JSON.stringify(body),
+  });
+  if (!res.ok || !res.body) {
+    const err = await res.json().catch(() => ({ detail: res.statusText }));
+    throw new Error(err.detail || String(err) || res.statusText);
+  }
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) >= 0) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = "message";
+      const data: string[] = [];
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data.push(line.slice(5).trimStart());
+      }
+      const parsed = JSON.parse(data.join("\n") || "null");
+      if (event === "error") throw new Error(parsed?.detail || "Stream failed");
+      onEvent(event, parsed);
+    }
+  }
+}
+
+/** Streaming chat: onToken receives reply text as it is generated; resolves with the full (saved) reply. */
+export async function streamCaseChat(
+  id: string,
+  message: string,
+  onToken: (text: string) => void
+): Promise<{ reply: string }> {
+  let reply = "";
+  await streamSse(`/cases/${id}/chat/stream`, { message }, (event, data) => {
+    if (event === "token") onToken(data.text);
+    if (event === "done") reply = data.reply;
+  });
+  return { reply };
+}
+
+/**
+ * Streaming run: onScores fires once fusion is done (before the narrative), onToken with raw
+ * reasoning text chunks; resolves with the final (saved) result.
+ */
+export async function runCaseStream(
+  id: string,
+  lambda: number,
+  conservative: boolean,
+  incremental: boolean = false,
+  handlers: { onScores?: (scores: RunResult) => void; onToken?: (text: string) => void } = {}
+): Promise<RunResult> {
+  let result: RunResult | null = null;
+  await streamSse(`/cases/${id}/run/stream`, { lambda_: lambda, conservative, incremental }, (event, data) => {
+    if (event === "scores") handlers.onScores?.(data);
+    if (event === "token") handlers.onToken?.(data.text);
+    if (event === "result") result = data;
+  });
+  if (!result) throw new Error("Run stream ended without a result");
+  return result;
+}
+
+export interface BatchCaseResult {
+  key: string;
+  case_id: string;
+  status: "done" | "error";
+  p_health?: number;
+  p_vision?: number;
+  p_fused?: number;
+  abstain?: boolean;
+  guardrail_reason?: string;
+  next_steps?: string[];
+  fallbacks?: Record<string, FallbackInfo>;
+  prescreen?: PrescreenInfo | null;
+  error?: string;
+}
+
+export interface BatchJob {
+  job_id: string;
+  status: "queued" | "running" | "done" | "failed" | "cancelled";
+  params: { lambda_: number; conservative: boolean; fused_call: boolean };
+  total: number;
+  completed: number;
+  failed: number;
+  created_at: number;
+  finished_at: number | null;
+  ingest_errors: { key: string; error: string }[];
+  results: BatchCaseResult[];
+}
+
+/**
+ * Create and run many cases at once: a zip archive (one folder per patient) or a list of
+ * images and wearables CSVs named by patient (patient01.jpg + patient01.csv).
+ */
+export async function createBatch(
+  upload: { archive: File } | { files: File[] },
+  lambda: number = 0.5,
+  conservative: boolean = false
+): Promise<{ job_id: string; case_ids: Record<string, string>; ingest_errors: { key: string; error: string }[] }> {
+  const body = new FormData();
+  if ("archive" in upload) body.append("archive", upload.archive);
+  else upload.files.forEach((f) => body.append("files", f));
+  body.append("lambda_", String(lambda));
+  body.append("conservative", String(conservative));
+  const res = await fetch(`${BASE}/batches`, { method: "POST", body });
+  if (!res.ok) {
+    const err = await res.json().catch(() => ({ detail: res.statusText }));
+    throw new Error(err.detail?.message || err.detail || String(err) || res.statusText);
+  }
+  return res.json();
+}
+
+export async function getBatch(jobId: string): Promise<BatchJob> {
+  return fetchApi<BatchJob>(`/batches/${jobId}`);
+}
+
+/** Per-case batch results as they finish (GET Server-Sent Events). Returns a function that stops listening. */
+export function followBatch(
+  jobId: string,
+  handlers: { onCase?: (result: BatchCaseResult) => void; onDone?: (job: Omit<BatchJob, "results">) => void }
+): () => void {
+  const source = new EventSource(`${BASE}/batches/${jobId}/stream`);
+  source.addEventListener("case", (e) => handlers.onCase?.(JSON.parse((e as MessageEvent).data)));
+  source.addEventListener("done", (e) => {
+    source.close();
+    handlers.onDone?.(JSON.parse((e as MessageEvent).data));
+  });
+  return () => source.close();
+}
+
 export interface HamRandomParams {
   dx?: string;
   label?: string;
@@ -81,8 +231,14 @@ export interface HamImageResponse {
   image_id: string;
   dx: string;
   binary_label_mel: number;
-  image_base64: string;
-  mime_type: string;
+  /** Backend-relative path; resolve with hamImageUrl. Served with HTTP caching headers. */
+  image_url: string;
+  thumbnail_url: string;
+}
+
+/** Absolute URL for an image path returned by the backend (e.g. image_url / thumbnail_url). */
+export function hamImageUrl(path: string): string {
+  return `${BASE}${path}`;
 }
 
 export async function getRandomHamImage(params: HamRandomParams): Promise<HamImageResponse> {
@@ -102,6 +258,9 @@ export interface BenchmarkParams {
   n_sample?: number;
   lambda_?: number;
   seed?: number | null;
+  concurrency?: number;
+  max_rps?: number | null;
+  stratified?: boolean;
 }
 
 export interface BenchmarkMetrics {
@@ -116,6 +275,19 @@ export interface BenchmarkMetrics {
   tn: number;
   fp: number;
   fn: number;
+  threshold?: number;
+  average_precision?: number;
+  roc_curve?: { fpr: number[]; tpr: number[]; thresholds: number[] };
+  pr_curve?: { recall: number[]; precision: number[]; thresholds: number[] };
+  best_f1?: { threshold: number; f1: number; precision: number; recall: number };
+  youden?: { threshold: number; j: number; sensitivity: number; specificity: number };
+  ci95?: {
+    auc: [number, number] | null;
+    accuracy: [number, number] | null;
+    sensitivity: [number, number] | null;
+    specificity: [number, number] | null;
+    n_bootstrap: number;
+  };
 }
 
 export interface BenchmarkSample {
@@ -126,6 +298,12 @@ export interface BenchmarkSample {
   p_fused?: number;
   predicted?: number;
   correct?: boolean;
+  /** Set when the vision model was unavailable; the sample is excluded from metrics. */
+  fallback?: string;
+  /** Set when the local pre-screen resolved the image without a vision call. */
+  prescreen?: "benign" | "suspicious";
+  /** Set when the image file could not be read; the sample was not evaluated. */
+  skipped?: boolean;
   error?: string;
 }
 
@@ -135,6 +313,57 @@ export interface BenchmarkResult {
   samples: BenchmarkSample[];
   n_requested: number;
   n_evaluated: number;
+  n_fallback?: number;
+  n_skipped?: number;
+  n_prescreened?: number;
+  concurrency?: number;
+  elapsed_s?: number;
+  images_per_s?: number | null;
+}
+
+export interface Job<T = unknown> {
+  id: string;
+  kind: "run" | "benchmark" | "batch";
+  params: Record<string, unknown>;
+  status: "queued" | "running" | "done" | "failed" | "cancelled";
+  progress: { done: number; total: number };
+  result?: T | null;
+  error: string | null;
+  cancel_requested: boolean;
+  created_at: number;
+  started_at: number | null;
+  finished_at: number | null;
+}
+
+/** Queue a benchmark in the background; poll getJob for progress and the result. */
+export async function submitBenchmarkJob(params: BenchmarkParams = {}): Promise<Job<BenchmarkResult>> {
+  return fetchApi<Job<BenchmarkResult>>("/benchmark/ham/jobs", {
+    method: "POST",
+    body: JSON.stringify({
+      n_sample: params.n_sample ?? 30,
+      lambda_: params.lambda_ ?? 0,
+      seed: params.seed ?? 42,
+      concurrency: params.concurrency ?? 4,
+      max_rps: params.max_rps ?? null,
+      stratified: params.stratified ?? true,
+    }),
+  });
+}
+
+/** Queue a pipeline run in the background (the result is also saved on the case). */
+export async function submitRunJob(id: string, lambda: number = 0.5, conservative: boolean = false): Promise<Job<RunResult>> {
+  return fetchApi<Job<RunResult>>(`/cases/${id}/run/jobs`, {
+    method: "POST",
+    body: JSON.stringify({ lambda_: lambda, conservative }),
+  });
+}
+
+export async function getJob<T = unknown>(jobId: string): Promise<Job<T>> {
+  return fetchApi<Job<T>>(`/jobs/${jobId}`);
+}
+
+export async function cancelJob(jobId: string): Promise<Job> {
+  return fetchApi<Job>(`/jobs/${jobId}/cancel`, { method: "POST" });
 }
 
 export interface PipelineStep {
@@ -169,6 +398,9 @@ export async function runBenchmark(params: BenchmarkParams = {}): Promise<Benchm
       n_sample: params.n_sample ?? 30,
       lambda_: params.lambda_ ?? 0,
       seed: params.seed ?? 42,
+      concurrency: params.concurrency ?? 4,
+      max_rps: params.max_rps ?? null,
+      stratified: params.stratified ?? true,
     }),
   });
 }
@@ -224,4 +456,57 @@ export interface RunResult {
   node_reasoning: Record<string, string>;
   clinician_report: string;
   patient_summary: string;
+  lambda_?: number;
+  conservative?: boolean;
+  reasoning_stale?: boolean;
+  /** Present for fused-call runs: the model's stated numbers vs the local scores. */
+  reasoning_check?: ReasoningCheck;
+  timings?: PipelineTimings;
+  /** Stages served from a local fallback instead of the model, keyed by stage. */
+  fallbacks?: Record<string, FallbackInfo>;
+  /** Set when the local pre-screen resolved the vision stage without a model call. */
+  prescreen?: PrescreenInfo | null;
+}
+
+export interface PrescreenInfo {
+  decision: "benign" | "suspicious";
+  score: number;
+  /** [benign upper bound, suspicious lower bound]; null = band disabled */
+  band: [number | null, number | null];
+}
+
+export interface FallbackInfo {
+  reason: "timeout" | "cancelled" | "rate_limited" | "circuit_open" | "error" | string;
+  error: string | null;
+}
+
+export interface ReasoningCheck {
+  mode: "fused";
+  stated_p_fused: number | null;
+  stated_abstain: boolean | null;
+  consistent: boolean;
+}
+
+export interface StageTiming {
+  start_ms: number;
+  end_ms: number;
+  duration_ms: number;
+  kind: "async" | "thread" | "inline";
+  deps: string[];
+}
+
+export interface CallSpan {
+  /** e.g. "llm:vision" */
+  name: string;
+  duration_ms: number;
+  stage?: string;
+  outcome?: "ok" | "timeout" | "error" | "cancelled";
+}
+
+export interface PipelineTimings {
+  wall_ms: number;
+  stages: Record<string, StageTiming>;
+  critical_path: string[];
+  /** External calls made during the run (LLM, blob store), in completion order. */
+  calls?: CallSpan[];
 }
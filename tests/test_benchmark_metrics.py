@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from backend.benchmark import compute_metrics
+
+
+def brute_auc(y, p):
+    pos = [s for s, t in zip(p, y) if t == 1]
+    neg = [s for s, t in zip(p, y) if t == 0]
+    if not pos or not neg:
+        return float("nan")
+    wins = sum(1.0 if a > b else 0.5 if a == b else 0.0 for a in pos for b in neg)
+    return wins / (len(pos) * len(neg))
+
+
+def sample(n, seed, levels=None):
+    rng = np.random.default_rng(seed)
+    y = (rng.random(n) < 0.3).astype(int)
+    p = np.clip(0.3 * y + rng.random(n) * 0.7, 0, 1)
+    if levels:
+        # Coarse scores, as LLM outputs are, so many ties
+        p = np.round(p * levels) / levels
+    return y.tolist(), p.tolist()
+
+
+@pytest.mark.parametrize("seed, levels", [(0, None), (1, 10), (2, 4)])
+def test_auc_matches_pairwise(seed, levels):
+    y, p = sample(120, seed, levels)
+    m = compute_metrics(y, p, n_bootstrap=0)
+    assert m["auc"] == round(brute_auc(y, p), 4)
+
+
+def test_confusion_counts():
+    y = [1, 1, 0, 0, 1, 0]
+    p = [0.9, 0.4, 0.6, 0.1, 0.5, 0.5]
+    m = compute_metrics(y, p, n_bootstrap=0)
+    assert (m["tp"], m["fn"], m["fp"], m["tn"]) == (2, 1, 2, 1)
+    assert m["sensitivity"] == round(2 / 3, 4)
+    assert m["specificity"] == round(1 / 3, 4)
+    assert m["accuracy"] == 0.5
+
+
+def test_single_class_has_no_curves():
+    m = compute_metrics([0, 0, 0], [0.1, 0.2, 0.3])
+    assert m["auc"] == 0.5
+    assert "roc_curve" not in m and "ci95" not in m
+    assert compute_metrics([], [])["auc"] == 0
+
+
+def test_best_thresholds_match_sweep():
+    y, p = sample(80, 3, levels=20)
+    m = compute_metrics(y, p, n_bootstrap=0)
+    yt, yp = np.array(y), np.array(p)
+    best_f1 = best_j = None
+    for t in sorted(set(p), reverse=True):
+        pred = yp >= t
+        tp = int(np.sum(pred & (yt == 1)))
+        fp = int(np.sum(pred & (yt == 0)))
+        fn = int(np.sum(~pred & (yt == 1)))
+        f1 = 2 * tp / (2 * tp + fp + fn)
+        j = tp / (tp + fn) - fp / int(np.sum(yt == 0))
+        if best_f1 is None or f1 > best_f1[1]:
+            best_f1 = (t, f1)
+        if best_j is None or j > best_j[1]:
+            best_j = (t, j)
+    assert m["best_f1"]["threshold"] == round(best_f1[0], 4)
+    assert m["best_f1"]["f1"] == round(best_f1[1], 4)
+    assert m["youden"]["threshold"] == round(best_j[0], 4)
+    assert m["youden"]["j"] == round(best_j[1], 4)
+    assert m["roc_curve"]["fpr"][0] == 0.0 and m["roc_curve"]["tpr"][-1] == 1.0
+
+
+def test_bootstrap_ci_matches_per_resample_loop():
+    y, p = sample(60, 4, levels=10)
+    n_bootstrap, seed = 50, 7
+    m = compute_metrics(y, p, n_bootstrap=n_bootstrap, seed=seed)
+
+    # Same resamples as compute_metrics, scored one at a time
+    idx = np.random.default_rng(seed).integers(0, len(y), size=(n_bootstrap, len(y)))
+    yt, yp = np.array(y), np.array(p)
+    aucs, accs, sens = [], [], []
+    for row in idx:
+        by, bp = yt[row], yp[row]
+        aucs.append(brute_auc(by.tolist(), bp.tolist()))
+        pred = bp >= 0.5
+        accs.append(np.mean(pred == by))
+        sens.append(np.sum(pred & (by == 1)) / np.sum(by == 1) if np.any(by == 1) else np.nan)
+
+    def ci(values):
+        values = np.array(values, dtype=float)
+        lo, hi = np.percentile(values[np.isfinite(values)], [2.5, 97.5])
+        return [round(float(lo), 4), round(float(hi), 4)]
+
+    assert m["ci95"]["n_bootstrap"] == n_bootstrap
+    assert m["ci95"]["auc"] == ci(aucs)
+    assert m["ci95"]["accuracy"] == ci(accs)
+    assert m["ci95"]["sensitivity"] == ci(sens)
+    assert m["ci95"]["auc"][0] <= m["auc"] <= m["ci95"]["auc"][1]
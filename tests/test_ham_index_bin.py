@@ -0,0 +1,67 @@
+import struct
+
+import pytest
+
+from backend.data_loader import BIN_MAGIC, HamIndexFile, write_ham_index_bin
+from backend.ham_index import HamIndex
+
+
+def make_rows(n=200):
+    dxs = ["mel", "nv", "bkl", None]
+    return [
+        {
+            "image_id": f"ISIC_{(n - i) * 7:07d}",
+            "dx": dxs[i % 4],
+            "age": None if i % 5 == 0 else str(20 + i % 60),
+            "sex": "" if i % 6 == 0 else ("male" if i % 2 else "female"),
+            "localization": "back",
+            "filepath": f"/data/HAM/ISIC_{(n - i) * 7:07d}.jpg",
+            "binary_label_mel": None if i % 9 == 0 else int(i % 4 == 0),
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def index_file(tmp_path):
+    rows = make_rows()
+    path = tmp_path / "ham_index.bin"
+    write_ham_index_bin(rows, path)
+    return rows, HamIndexFile(path)
+
+
+def test_round_trip_keeps_none_distinct(index_file):
+    rows, f = index_file
+    assert len(f) == len(rows)
+    assert f[:] == rows
+    assert f[-1] == rows[-1]
+    assert f[0]["age"] is None and f[0]["sex"] == "" and f[0]["binary_label_mel"] is None
+    assert f.dx_values() == [r["dx"] for r in rows]
+    assert f.binary_labels() == [r["binary_label_mel"] for r in rows]
+
+
+def test_find_by_binary_search(index_file):
+    rows, f = index_file
+    for i, row in enumerate(rows):
+        assert f.find(row["image_id"]) == i
+    assert f.find("ISIC_0000001") is None
+    assert f.find("ZZZ") is None
+    assert f.find("") is None
+
+
+def test_ham_index_over_file(index_file):
+    rows, f = index_file
+    index = HamIndex(f)
+    assert index.get(rows[10]["image_id"]) == rows[10]
+    assert index.get("missing") is None
+    assert len(index.candidates(binary_label=1)) == sum(r["binary_label_mel"] == 1 for r in rows)
+    # A missing dx counts as "unknown", as for JSON rows without the key
+    assert index.counts_by_class["unknown"] == sum(r["dx"] is None for r in rows)
+
+
+def test_rejects_other_format(tmp_path):
+    path = tmp_path / "old.bin"
+    path.write_bytes(struct.pack("<8sIIIII", b"OLHAMIX1", 0, 0, 0, 0, 0) + b"\0" * 8)
+    with pytest.raises(ValueError):
+        HamIndexFile(path)
+    assert BIN_MAGIC != b"OLHAMIX1"
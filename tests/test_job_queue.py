@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.job_queue import JobQueue, MemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(tmp_path / "jobs.sqlite")
+
+
+def test_claims_oldest_queued_job_of_kind(store):
+    first = store.create("run", {"n": 1})
+    store.create("benchmark", {})
+    second = store.create("run", {"n": 2})
+
+    claimed = store.claim_next(["run"])
+    assert claimed["id"] == first["id"]
+    assert claimed["status"] == "running" and claimed["params"] == {"n": 1}
+    assert store.claim_next(["run"])["id"] == second["id"]
+    assert store.claim_next(["run"]) is None
+    assert store.claim_next([]) is None
+    assert store.claim_next(["benchmark"])["kind"] == "benchmark"
+
+
+def test_cancel_queued_job_is_final(store):
+    job = store.create("run", {})
+    cancelled = store.request_cancel(job["id"])
+    assert cancelled["status"] == "cancelled"
+    assert cancelled["finished_at"] is not None
+    assert store.claim_next(["run"]) is None
+
+
+def test_cancel_running_job_only_flags_it(store):
+    job = store.create("run", {})
+    store.claim_next(["run"])
+    flagged = store.request_cancel(job["id"])
+    assert flagged["status"] == "running" and flagged["cancel_requested"]
+
+    store.finish(job["id"], "done", {"ok": True})
+    after = store.request_cancel(job["id"])
+    assert after["status"] == "done" and after["result"] == {"ok": True}
+    assert store.request_cancel("missing") is None
+
+
+def test_fail_stale_and_purge(store):
+    job = store.create("run", {})
+    store.claim_next(["run"])
+    assert store.fail_stale(time.time() + 1) == 1
+    failed = store.get(job["id"])
+    assert failed["status"] == "failed" and "Interrupted" in failed["error"]
+    assert store.purge(time.time() + 1) == 1
+    assert store.get(job["id"]) is None
+
+
+def test_sqlite_job_claimed_once_across_stores(tmp_path):
+    path = tmp_path / "jobs.sqlite"
+    stores = [SQLiteJobStore(path) for _ in range(4)]
+    ids = {stores[0].create("run", {"i": i})["id"] for i in range(40)}
+    claimed: list[str] = []
+    lock = threading.Lock()
+
+    def drain(store):
+        while (job := store.claim_next(["run"])) is not None:
+            with lock:
+                claimed.append(job["id"])
+
+    threads = [threading.Thread(target=drain, args=(s,)) for s in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed) == sorted(ids)
+
+
+async def _wait_for(queue, job_id, statuses=("done", "failed", "cancelled")):
+    for _ in range(200):
+        job = await queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job stayed {job['status']}")
+
+
+def test_queue_runs_and_cancels_jobs():
+    async def scenario():
+        started = asyncio.Event()
+
+        async def quick(job_id, params, progress):
+            progress(1, 1)
+            return {"doubled": params["x"] * 2}
+
+        async def slow(job_id, params, progress):
+            started.set()
+            await asyncio.sleep(30)
+
+        queue = JobQueue(MemoryJobStore(), workers=1, poll_s=0.02)
+        queue.register("quick", quick)
+        queue.register("slow", slow)
+        await queue.start()
+        try:
+            done = await _wait_for(queue, (await queue.submit("quick", {"x": 21}))["id"])
+            assert done["status"] == "done" and done["result"] == {"doubled": 42}
+            assert done["progress"] == {"done": 1, "total": 1}
+
+            running = await queue.submit("slow", {})
+            await asyncio.wait_for(started.wait(), 2)
+            # The only worker is busy, so this one stays queued and is cancelled outright
+            queued = await queue.submit("quick", {"x": 1})
+            assert (await queue.cancel(queued["id"]))["status"] == "cancelled"
+
+            await queue.cancel(running["id"])
+            assert (await _wait_for(queue, running["id"]))["status"] == "cancelled"
+            assert (await queue.get(queued["id"]))["result"] is None
+
+            with pytest.raises(ValueError):
+                await queue.submit("unknown", {})
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_incomplete_store_cannot_be_constructed():
+    from backend.job_queue import JobStore
+
+    class Partial(JobStore):
+        def create(self, kind, params):
+            return {}
+
+    with pytest.raises(TypeError):
+        Partial()
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from backend.llm_client import CircuitBreaker, CircuitOpenError, LLMBackend, LLMClient, TokenBucket
+
+
+class EchoBackend(LLMBackend):
+    name = "echo"
+
+    async def generate(self, stage, model, parts, timeout=None):
+        return "ok"
+
+    async def stream(self, stage, model, parts, timeout=None):
+        yield "ok"
+
+
+def half_open_client(bucket: TokenBucket) -> LLMClient:
+    breaker = CircuitBreaker(threshold=1, cooldown_s=0.0)
+    breaker.record_failure()
+    assert breaker.state == "open"
+    return LLMClient(EchoBackend(), bucket=bucket, breaker=breaker)
+
+
+def test_cancel_during_half_open_admit_releases_trial():
+    async def scenario():
+        bucket = TokenBucket(rate=1.0)
+        bucket.reserve()  # Drained: the next caller waits about a second for a token
+        client = half_open_client(bucket)
+
+        call = asyncio.create_task(client.generate("chat", ["hi"]))
+        await asyncio.sleep(0.05)
+        assert client.breaker.state == "half_open"
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+        client.bucket = TokenBucket()
+        assert await client.generate("chat", ["hi"]) == "ok"
+        assert client.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_half_open_admits_one_trial_at_a_time():
+    async def scenario():
+        bucket = TokenBucket(rate=1.0)
+        bucket.reserve()
+        client = half_open_client(bucket)
+
+        trial = asyncio.create_task(client.generate("chat", ["hi"]))
+        await asyncio.sleep(0.05)
+        with pytest.raises(CircuitOpenError):
+            await client.generate("chat", ["hi"])
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_backend_must_implement_stream():
+    class GenerateOnly(LLMBackend):
+        async def generate(self, stage, model, parts, timeout=None):
+            return "ok"
+
+    with pytest.raises(TypeError):
+        GenerateOnly()
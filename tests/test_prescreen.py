@@ -0,0 +1,58 @@
+import numpy as np
+
+from backend.prescreen import MIN_BAND_SAMPLES, Prescreen, choose_bands, fit_logistic
+
+
+def brute_bands(y, p, max_missed, min_ppv):
+    low = high = None
+    n_pos = y.sum()
+    for t in sorted(set(p.tolist())):
+        below = p <= t
+        if t < 0.5 and below.sum() >= MIN_BAND_SAMPLES and y[below].sum() <= max_missed * n_pos:
+            low = t
+    for t in sorted(set(p.tolist()), reverse=True):
+        above = p >= t
+        if t >= 0.5 and above.sum() >= MIN_BAND_SAMPLES and y[above].mean() >= min_ppv:
+            high = t
+    return low, high
+
+
+def test_fit_logistic_recovers_coefficients():
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(4000, 2))
+    z = -0.5 + x @ np.array([1.5, -2.0])
+    y = (rng.random(len(x)) < 1 / (1 + np.exp(-z))).astype(float)
+    intercept, weights = fit_logistic(x, y, l2=0.0)
+    assert abs(intercept + 0.5) < 0.15
+    np.testing.assert_allclose(weights, [1.5, -2.0], atol=0.2)
+
+
+def test_fit_logistic_separable_data_stays_finite():
+    x = np.array([[0.0], [0.1], [0.9], [1.0]] * 10)
+    y = np.array([0, 0, 1, 1] * 10, dtype=float)
+    intercept, weights = fit_logistic(x, y)
+    assert np.isfinite(intercept) and np.all(np.isfinite(weights))
+    assert weights[0] > 0
+
+
+def test_choose_bands_matches_brute_force():
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        y = (rng.random(300) < 0.2).astype(float)
+        p = np.round(np.clip(0.35 * y + rng.random(300) * 0.65, 0, 1), 2)
+        for max_missed, min_ppv in ((0.02, 0.7), (0.1, 0.5), (0.0, 0.9)):
+            assert choose_bands(y, p, max_missed, min_ppv) == brute_bands(y, p, max_missed, min_ppv)
+
+
+def test_choose_bands_disabled_below_min_samples():
+    y = np.array([0, 1] * (MIN_BAND_SAMPLES // 2 - 1), dtype=float)
+    p = np.where(y == 1, 0.9, 0.1)
+    assert choose_bands(y, p, max_missed=0.0, min_ppv=0.5) == (None, None)
+
+
+def test_decide_uses_bands():
+    screen = Prescreen(low=0.1, high=0.8)
+    assert screen.decide(0.1) == "benign"
+    assert screen.decide(0.5) is None
+    assert screen.decide(0.8) == "suspicious"
+    assert not Prescreen().active
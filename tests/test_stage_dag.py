@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from backend import metrics
+from backend.stage_dag import Stage, run_stages
+
+
+def test_runs_stages_in_dependency_order():
+    async def double(a):
+        return a * 2
+
+    stages = [
+        Stage("a", lambda: 3, kind="thread"),
+        Stage("b", double, deps=("a",), kind="async"),
+        Stage("c", lambda a, b: a + b, deps=("a", "b")),
+    ]
+    results, timings = asyncio.run(run_stages(stages))
+    assert results == {"a": 3, "b": 6, "c": 9}
+    assert set(timings["stages"]) == {"a", "b", "c"}
+
+
+def test_thread_stage_spans_are_collected():
+    def stage():
+        with metrics.IO_SECONDS.time("blob_get", op="blob_get"):
+            return 1
+
+    async def scenario():
+        with metrics.collect_spans() as spans:
+            await run_stages([Stage("image", stage, kind="thread")])
+        return spans
+
+    spans = asyncio.run(scenario())
+    assert [s["name"] for s in spans] == ["blob_get"]
+
+
+def test_stage_error_propagates():
+    def boom():
+        raise RuntimeError("bad image")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_stages([Stage("image", boom, kind="thread"), Stage("next", lambda image: image, deps=("image",))]))
+
+    with pytest.raises(ValueError):
+        asyncio.run(run_stages([Stage("x", lambda y: y, deps=("y",))]))
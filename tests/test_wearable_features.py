@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from backend.pipeline import extract_wearable_features
+from backend.wearable_features import epoch_seconds
+
+
+def test_epoch_seconds_iso_fast_path():
+    seconds, valid = epoch_seconds(pd.Series(["2024-01-15T08:00:00", "2024-01-15T09:30:00"]))
+    assert valid.all()
+    assert (seconds[1] - seconds[0]) == 5400
+
+
+def test_epoch_seconds_masks_nat():
+    seconds, valid = epoch_seconds(pd.Series(["2024-01-15T08:00:00", "NaT", "2024-01-15T10:00:00"]))
+    assert valid.tolist() == [True, False, True]
+    assert seconds[1] == 0
+    assert seconds[2] - seconds[0] == 7200
+
+
+def test_epoch_seconds_numeric_milliseconds():
+    seconds, valid = epoch_seconds(pd.Series([1_705_305_600_000, np.nan, 1_705_309_200_000]))
+    assert valid.tolist() == [True, False, True]
+    assert seconds[2] - seconds[0] == 3600
+
+
+def test_nat_row_does_not_skew_time_span():
+    csv = (
+        "timestamp,heart_rate,spo2,activity_level\n"
+        "2024-01-15T08:00:00,98,94,moderate\n"
+        "NaT,100,95,low\n"
+        "2024-01-15T10:00:00,105,92,high\n"
+    )
+    windowed = extract_wearable_features(csv)["features"]["windowed"]
+    assert windowed["time_span_hours"] == 2.0
+    assert windowed["n_bins"] == 2
@@ -2,8 +2,11 @@
 """
 Build HAM10000 index for OncoLens backend.
 Uses kagglehub to download/cache the dataset, loads metadata,
-scans for image files, and outputs backend/data/ham_index.json.
+scans for image files, and outputs backend/data/ham_index.json
+plus the compact memory-mapped backend/data/ham_index.bin.
 Does NOT copy images.
+
+  --from-json   Only rebuild ham_index.bin from an existing ham_index.json (no download).
 """
 import csv
 import json
@@ -15,11 +18,7 @@ from pathlib import Path
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
-try:
-    import kagglehub
-except ImportError:
-    print("Error: kagglehub not installed. Run: pip install kagglehub")
-    sys.exit(1)
+from backend.data_loader import INDEX_BIN_PATH, write_ham_index_bin
 
 # Config
 HAM_DATASET_ID = os.environ.get("HAM_DATASET_ID", "kmader/skin-cancer-mnist-ham10000")
@@ -72,7 +71,33 @@ def find_image_paths(dataset_dir: Path) -> dict[str, Path]:
     return id_to_path
 
 
+def write_binary_index(index: list[dict]) -> None:
+    """Write the columnar ham_index.bin next to the JSON index."""
+    write_ham_index_bin(index, INDEX_BIN_PATH)
+    print(f"Wrote {INDEX_BIN_PATH} ({INDEX_BIN_PATH.stat().st_size} bytes)")
+
+
+def rebuild_binary_from_json():
+    """Regenerate ham_index.bin from an existing ham_index.json."""
+    if not OUTPUT_PATH.exists():
+        print(f"Error: {OUTPUT_PATH} not found. Run without --from-json first.")
+        sys.exit(1)
+    with open(OUTPUT_PATH, encoding="utf-8") as f:
+        index = json.load(f)
+    write_binary_index(index)
+
+
 def main():
+    if "--from-json" in sys.argv[1:]:
+        rebuild_binary_from_json()
+        return
+
+    try:
+        import kagglehub
+    except ImportError:
+        print("Error: kagglehub not installed. Run: pip install kagglehub")
+        sys.exit(1)
+
     print("Building HAM index...")
     print(f"Dataset: {HAM_DATASET_ID}")
     print(f"Metadata: {METADATA_PATH}")
@@ -122,6 +147,7 @@ def main():
         json.dump(index, f, indent=2)
 
     print(f"Wrote {OUTPUT_PATH}")
+    write_binary_index(index)
 
     # Summary by class
     by_dx = {}